@@ -0,0 +1,304 @@
+"""
+Monthly partitioning and NDJSON archiving shared by the append-mostly log
+tables (AuditLog, Notification, SMSLog).
+
+MonthlyPartitions turns a table into native Postgres range partitions, one
+per calendar month of a time column, with a DEFAULT partition so inserts
+never fail. Postgres requires the partition key in every unique constraint,
+so the converted table's primary key is (id, <time column>); ids stay unique
+(UUIDs or the original identity sequence) and Django keeps treating id as
+the primary key. Each app declares its table in its own partitions module
+and exposes it through a PartitionsCommand.
+
+Expired rows are written as gzipped NDJSON to the default storage, one file
+per batch and calendar month of the time column:
+
+    archives/<label>/2025/03/20250901T023000-0001.ndjson.gz
+
+Files are written before anything is removed, so a crash in between can
+leave a row in two archives but never in none; the id makes duplicates easy
+to drop.
+"""
+import gzip
+import json
+import logging
+from datetime import datetime
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .search import create_search_index
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'RETENTION_BATCH_SIZE', 5000)
+ARCHIVE_PREFIX = getattr(settings, 'RETENTION_ARCHIVE_PREFIX', 'archives')
+MONTHS_AHEAD = 3
+
+
+def month_start(value):
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    return timezone.make_aware(datetime(value.year, value.month, 1))
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return timezone.make_aware(datetime(index // 12, index % 12 + 1, 1))
+
+
+class MonthlyPartitions:
+    """
+    Range partitions of `model`'s table by calendar month of `time_field`,
+    used when the `setting` flag is on and the database is Postgres.
+    `search_index` names the full-text index built from model.SEARCH_FIELDS.
+    """
+
+    def __init__(self, model, time_field, setting, search_index, months_ahead=MONTHS_AHEAD):
+        self.model = model
+        self.time_field = time_field
+        self.setting = setting
+        self.search_index = search_index
+        self.months_ahead = months_ahead
+        self.table = model._meta.db_table
+        self.default_partition = f"{self.table}_default"
+
+    def enabled(self):
+        return getattr(settings, self.setting, False) and connection.vendor == 'postgresql'
+
+    def partition_name(self, month):
+        return f"{self.table}_p{month:%Y_%m}"
+
+    def in_month(self, month):
+        """Rows of the month starting at `month`."""
+        return self.model.objects.filter(**{
+            f'{self.time_field}__gte': month, f'{self.time_field}__lt': add_months(month, 1),
+        })
+
+    def is_partitioned(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [self.table])
+            row = cursor.fetchone()
+        return bool(row) and row[0] == 'p'
+
+    def list_partitions(self):
+        """Returns [(name, month)] for the monthly partitions, oldest first."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT child.relname FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = %s
+                """,
+                [self.table]
+            )
+            names = [row[0] for row in cursor.fetchall()]
+        partitions = []
+        for name in names:
+            suffix = name[len(self.table) + 2:]
+            try:
+                month = timezone.make_aware(datetime.strptime(suffix, '%Y_%m'))
+            except ValueError:
+                continue
+            partitions.append((name, month))
+        return sorted(partitions, key=lambda p: p[1])
+
+    def create_partition(self, month):
+        name = self.partition_name(month)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{self.table}" FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)]
+            )
+        return name
+
+    def ensure_partitions(self, now=None, months_ahead=None):
+        """Creates the partitions for this month and the next `months_ahead`."""
+        months_ahead = self.months_ahead if months_ahead is None else months_ahead
+        current = month_start(now or timezone.now())
+        return [self.create_partition(add_months(current, offset)) for offset in range(months_ahead + 1)]
+
+    def expired_partitions(self, cutoff):
+        """Monthly partitions whose whole range is older than `cutoff`."""
+        return [(name, month) for name, month in self.list_partitions() if add_months(month, 1) <= cutoff]
+
+    def drop_partition(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS "{name}"')
+        logger.info(f"Dropped partition {name} of {self.table}")
+
+    def convert(self, now=None, months_ahead=None):
+        """
+        Rebuilds the table as a range-partitioned table, one partition per
+        month from the oldest row up to `months_ahead` months from now.
+        Takes an exclusive lock for the duration of the copy, so run it in a
+        maintenance window. Returns False if the table is already partitioned.
+        """
+        if self.is_partitioned():
+            return False
+        months_ahead = self.months_ahead if months_ahead is None else months_ahead
+        table, old, column = self.table, f"{self.table}_unpartitioned", self.time_field
+        # Integer ids come from an identity sequence that must survive the copy.
+        identity = isinstance(self.model._meta.pk, models.AutoField)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(f'SELECT MIN({column}), {"MAX(id)" if identity else "NULL"} FROM "{table}"')
+            oldest, max_id = cursor.fetchone()
+            cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+            cursor.execute(
+                f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS'
+                f'{" INCLUDING IDENTITY" if identity else ""}) PARTITION BY RANGE ({column})'
+            )
+            cursor.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, {column})')
+            cursor.execute(f'CREATE TABLE "{self.default_partition}" PARTITION OF "{table}" DEFAULT')
+
+            current = month_start(now or timezone.now())
+            month = month_start(oldest) if oldest else current
+            while month <= add_months(current, months_ahead):
+                self.create_partition(month)
+                month = add_months(month, 1)
+
+            cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+            if max_id:
+                cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", [table, max_id])
+            cursor.execute(f'DROP TABLE "{old}"')
+
+            # Dropping the old table took its indexes and foreign keys with it.
+            indexed = {tuple(index.fields) for index in self.model._meta.indexes}
+            for field in self.model._meta.concrete_fields:
+                if not isinstance(field, models.ForeignKey):
+                    continue
+                if field.db_index and (field.name,) not in indexed:
+                    cursor.execute(f'CREATE INDEX "{table}_{field.column}_idx" ON "{table}" ({field.column})')
+                cursor.execute(
+                    f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_{field.column}_fk" FOREIGN KEY ({field.column}) '
+                    f'REFERENCES "{field.related_model._meta.db_table}" (id) DEFERRABLE INITIALLY DEFERRED'
+                )
+            with connection.schema_editor() as schema_editor:
+                for index in self.model._meta.indexes:
+                    schema_editor.add_index(self.model, index)
+                create_search_index(schema_editor, self.model, self.search_index, self.model.SEARCH_FIELDS)
+        logger.info(f"Converted {table} to monthly range partitions")
+        return True
+
+
+def write_archive(label, rows, run_stamp, sequence, time_field='created_at'):
+    """Writes rows as gzipped NDJSON, one file per `time_field` month. Returns the paths."""
+    by_month = {}
+    for row in rows:
+        at = timezone.localtime(row[time_field])
+        by_month.setdefault(f"{at:%Y/%m}", []).append(row)
+
+    paths = []
+    for month, month_rows in sorted(by_month.items()):
+        body = ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in month_rows)
+        name = f"{ARCHIVE_PREFIX}/{label}/{month}/{run_stamp}-{sequence:04d}.ndjson.gz"
+        paths.append(default_storage.save(name, ContentFile(gzip.compress(body.encode('utf-8')))))
+    return paths
+
+
+def _after(order, row):
+    """Q for rows past `row` in `order` (a keyset over ascending fields)."""
+    after = Q(pk__in=[])
+    for i, field in enumerate(order):
+        after |= Q(**{f: row[f] for f in order[:i]}, **{f'{field}__gt': row[field]})
+    return after
+
+
+def export_rows(queryset, label, run_stamp, batch_size=BATCH_SIZE, order=('id',), time_field='created_at'):
+    """Archives queryset in `order` without deleting anything. Returns the row count."""
+    exported = 0
+    sequence = 0
+    last = None
+    while True:
+        page = queryset.filter(_after(order, last)) if last else queryset
+        rows = list(page.order_by(*order).values()[:batch_size])
+        if not rows:
+            break
+        sequence += 1
+        write_archive(label, rows, run_stamp, sequence, time_field)
+        last = rows[-1]
+        exported += len(rows)
+    return exported
+
+
+def archive_rows(model, expired, label, run_stamp, batch_size=BATCH_SIZE, order=('id',),
+                 time_field='created_at', before_delete=None):
+    """
+    Archives and deletes the rows of `model` matching `expired`, batch by
+    batch from the front of `order`. `before_delete(rows)` runs in the
+    delete's transaction. Returns the number of rows archived.
+    """
+    archived = 0
+    sequence = 0
+    while True:
+        rows = list(model.objects.filter(expired).order_by(*order).values()[:batch_size])
+        if not rows:
+            break
+        sequence += 1
+        write_archive(label, rows, run_stamp, sequence, time_field)
+        with transaction.atomic():
+            if before_delete:
+                before_delete(rows)
+            model.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+        if len(rows) < batch_size:
+            break
+    return archived
+
+
+def archive_partitions(partitions, cutoff, label, run_stamp, batch_size=BATCH_SIZE, order=('id',), before_drop=None):
+    """
+    Archives and drops whole monthly partitions older than `cutoff`.
+    `before_drop(queryset)` gets the month's rows in the drop's transaction.
+    Returns the number of rows archived.
+    """
+    archived = 0
+    for name, month in partitions.expired_partitions(cutoff):
+        in_month = partitions.in_month(month)
+        archived += export_rows(
+            in_month, label, f"{run_stamp}-{month:%Y%m}", batch_size, order, partitions.time_field
+        )
+        with transaction.atomic():
+            if before_drop:
+                before_drop(in_month)
+            partitions.drop_partition(name)
+    return archived
+
+
+class PartitionsCommand(BaseCommand):
+    """Base for the <app>_partitions management commands; set `partitions`."""
+    partitions = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['convert', 'ensure', 'status'])
+        parser.add_argument('--months-ahead', type=int, default=self.partitions.months_ahead)
+
+    def handle(self, *args, **options):
+        partitions = self.partitions
+        if connection.vendor != 'postgresql':
+            raise CommandError(f"Partitioning {partitions.table} needs PostgreSQL.")
+
+        action = options['action']
+        if action == 'convert':
+            if partitions.convert(months_ahead=options['months_ahead']):
+                self.stdout.write(self.style.SUCCESS(f"Converted {partitions.table} to monthly partitions."))
+                self.stdout.write(f"Set {partitions.setting}=True so the retention task maintains them.")
+            else:
+                self.stdout.write(self.style.WARNING(f"{partitions.table} is already partitioned."))
+            return
+
+        if not partitions.is_partitioned():
+            raise CommandError(f"{partitions.table} is not partitioned; run the 'convert' action first.")
+        if action == 'ensure':
+            created = partitions.ensure_partitions(months_ahead=options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS(f"Partitions present: {', '.join(created)}"))
+        else:
+            for name, month in partitions.list_partitions():
+                self.stdout.write(f"{name}  {month:%Y-%m}")
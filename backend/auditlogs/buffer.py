@@ -0,0 +1,91 @@
+"""
+Buffered audit log writes.
+
+Audit entries are recorded as unsaved AuditLog instances and handed to
+transaction.on_commit, so an entry only exists if the change it describes
+was committed (rolled-back savepoints drop their entries too). Committed
+entries are collected in the current audit batch and written with a single
+bulk_create when the batch closes:
+
+- AuditContextMiddleware opens a batch around every request,
+- Celery tasks and management commands can open one with `audit_batch()`,
+- outside any batch each entry is written as soon as it is committed.
+
+The open batch lives in a ContextVar, so concurrent async requests each
+collect into their own list; sync code run through sync_to_async sees the
+batch of the request that called it.
+"""
+import logging
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 500
+
+_entries = ContextVar('audit_batch_entries', default=None)
+
+
+def _write(entries):
+    from .models import AuditLog
+    if not entries:
+        return
+    try:
+        AuditLog.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+    except Exception as e:
+        logger.error(f"Failed to write {len(entries)} audit log entries: {e}")
+
+
+def _collect(entry):
+    entries = _entries.get()
+    if entries is None:
+        _write([entry])
+    else:
+        entries.append(entry)
+
+
+def record_audit(entry):
+    """Queues an unsaved AuditLog to be written once the current transaction commits."""
+    transaction.on_commit(lambda: _collect(entry))
+
+
+def flush_audit_batch():
+    """Writes the entries collected so far in the current batch."""
+    entries = _entries.get()
+    if entries:
+        pending = entries[:]
+        entries.clear()
+        _write(pending)
+
+
+class audit_batch:
+    """
+    Collects committed audit entries and writes them in one bulk_create on
+    exit. Nested batches join the outermost one. Usable as `async with` in
+    async code, where the write runs in a worker thread.
+    """
+    def __enter__(self):
+        self._owner = _entries.get() is None
+        if self._owner:
+            self._token = _entries.set([])
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _write(self._close())
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        entries = self._close()
+        if entries:
+            await sync_to_async(_write)(entries)
+
+    def _close(self):
+        if not self._owner:
+            return []
+        entries = _entries.get()
+        _entries.reset(self._token)
+        return entries
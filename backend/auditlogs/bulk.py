@@ -0,0 +1,100 @@
+"""
+Audited bulk ORM operations.
+
+bulk_create, QuerySet.update and QuerySet.delete bypass save() and delete(),
+so AuditableMixin never sees them. These helpers run the bulk operation and
+record one aggregated AuditLog for it, carrying the row count and the
+affected ids, through the same on-commit buffer as per-row entries:
+
+    audited_bulk_create(Notification, notifications, batch_size=500)
+    audited_update(user.notifications.filter(is_read=False), {'is_read': True})
+    audited_delete(RolePermission.objects.filter(role=role))
+"""
+import logging
+
+from django.db import transaction
+
+from .buffer import record_audit
+from .middleware import get_audit_actor
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Ids beyond this are summarized as "and N more" to keep details readable.
+MAX_LOGGED_IDS = 200
+
+
+def _format_ids(ids):
+    shown = ", ".join(str(pk) for pk in ids[:MAX_LOGGED_IDS])
+    if len(ids) > MAX_LOGGED_IDS:
+        shown += f" and {len(ids) - MAX_LOGGED_IDS} more"
+    return shown
+
+
+def record_bulk_audit(model, action, ids, summary, count=None):
+    """Records one AuditLog for a bulk operation on `model` affecting `ids`."""
+    ids = list(ids)
+    count = len(ids) if count is None else count
+    if not count:
+        return
+    try:
+        details = f"{summary} ({count} {model._meta.verbose_name_plural}"
+        details += f"; ids: {_format_ids(ids)})." if ids else ")."
+        record_audit(AuditLog(
+            action=action,
+            entity_type=model.__name__,
+            details=details,
+            **get_audit_actor()
+        ))
+    except Exception as e:
+        logger.error(f"Failed to record bulk audit log for {model.__name__}: {e}")
+
+
+def audited_bulk_create(model, objs, summary=None, **kwargs):
+    """model.objects.bulk_create(objs, **kwargs) with one CREATE entry."""
+    created = model.objects.bulk_create(objs, **kwargs)
+    # With ignore_conflicts the backend may not return primary keys.
+    ids = [obj.pk for obj in created if obj.pk is not None]
+    record_bulk_audit(
+        model, 'CREATE', ids, summary or f"BULK: Created {model._meta.verbose_name_plural}",
+        count=len(ids) if ids else len(created),
+    )
+    return created
+
+
+def audited_update(queryset, values, summary=None):
+    """
+    queryset.update(**values) with one UPDATE entry. The matching rows are
+    locked first so the logged ids are exactly the rows updated.
+    """
+    model = queryset.model
+    with transaction.atomic(using=queryset.db):
+        ids = list(queryset.select_for_update(of=('self',)).values_list('pk', flat=True))
+        if not ids:
+            return 0
+        count = model._base_manager.using(queryset.db).filter(pk__in=ids).update(**values)
+        fields = ", ".join(values)
+        record_bulk_audit(
+            model, 'UPDATE', ids, summary or f"BULK: Updated {fields} on {model._meta.verbose_name_plural}",
+            count=count,
+        )
+    return count
+
+
+def audited_delete(queryset, summary=None):
+    """
+    queryset.delete() with one DELETE entry; rows removed by cascade are
+    listed by model. Returns what QuerySet.delete() returns.
+    """
+    model = queryset.model
+    with transaction.atomic(using=queryset.db):
+        ids = list(queryset.select_for_update(of=('self',)).values_list('pk', flat=True))
+        if not ids:
+            return 0, {}
+        deleted, per_model = model._base_manager.using(queryset.db).filter(pk__in=ids).delete()
+        summary = summary or f"BULK: Deleted {model._meta.verbose_name_plural}"
+        cascaded = {label: n for label, n in per_model.items() if label != model._meta.label and n}
+        if cascaded:
+            summary += " with " + ", ".join(f"{n} {label}" for label, n in cascaded.items())
+        record_bulk_audit(model, 'DELETE', ids, summary, count=per_model.get(model._meta.label, len(ids)))
+    return deleted, per_model
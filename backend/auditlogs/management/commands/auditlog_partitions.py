@@ -0,0 +1,7 @@
+from auditlogs.archive import PartitionsCommand
+from auditlogs.partitions import auditlog_partitions
+
+
+class Command(PartitionsCommand):
+    help = 'Manage monthly range partitions of the audit log table (Postgres only)'
+    partitions = auditlog_partitions
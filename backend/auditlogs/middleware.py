@@ -1,9 +1,26 @@
-import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 
-_thread_locals = threading.local()
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .buffer import audit_batch
+
+# A ContextVar rather than a thread-local: under ASGI many requests share one
+# thread, each in its own asyncio task and so its own context, and sync code
+# run through sync_to_async gets a copy of the calling request's context.
+_current_request = ContextVar('audit_current_request', default=None)
 
 def get_current_request():
-    return getattr(_thread_locals, 'request', None)
+    return _current_request.get()
+
+@contextmanager
+def request_context(request):
+    """Makes `request` the current request (audit actor) inside the block."""
+    token = _current_request.set(request)
+    try:
+        yield request
+    finally:
+        _current_request.reset(token)
 
 def get_current_user():
     request = get_current_request()
@@ -19,13 +36,49 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
+def get_audit_actor():
+    """
+    AuditLog actor fields for the current request, or the 'System' actor
+    outside of one.
+    """
+    request = get_current_request()
+    if not request:
+        return {
+            'actor': None, 'actor_userid': 'System', 'actor_employee_id': None,
+            'actor_name': None, 'actor_email': None, 'ip_address': None,
+        }
+    user = request.user if request.user.is_authenticated else None
+    return {
+        'actor': user,
+        'actor_userid': user.username if user else 'Anonymous',
+        'actor_employee_id': getattr(user, 'employee_id', None) if user else None,
+        'actor_name': getattr(user, 'full_name', None) if user else None,
+        'actor_email': user.email if user else None,
+        'ip_address': get_client_ip(request),
+    }
+
 class AuditContextMiddleware:
+    """
+    Exposes the request to get_current_request/get_audit_actor and writes the
+    audit entries it commits in one batch. Works in sync and async chains.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        _thread_locals.request = request
-        response = self.get_response(request)
-        if hasattr(_thread_locals, 'request'):
-            del _thread_locals.request
-        return response
+        if self.async_mode:
+            return self.__acall__(request)
+        # Audit entries committed during the request are written together.
+        with request_context(request), audit_batch():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with request_context(request):
+            async with audit_batch():
+                return await self.get_response(request)
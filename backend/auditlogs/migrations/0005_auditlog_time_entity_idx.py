@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditlogs', '0004_remove_auditlog_auditlogs_a_entity__c9c27f_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='auditlogs_a_action_b1f2ec_idx',
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp', 'entity_type', 'action'], name='auditlog_time_entity_idx'),
+        ),
+    ]
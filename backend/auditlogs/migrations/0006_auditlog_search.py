@@ -0,0 +1,52 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:38
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+from auditlogs.search import create_search_index, drop_search_index
+
+SEARCH_INDEX = 'auditlog_search_idx'
+# Must match AuditLog.SEARCH_FIELDS.
+SEARCH_FIELDS = ('actor_userid', 'actor_employee_id', 'actor_name', 'actor_email', 'entity_type', 'details')
+
+
+def backfill_actor_names(apps, schema_editor):
+    AuditLog = apps.get_model('auditlogs', 'AuditLog')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    actor = User.objects.filter(pk=OuterRef('actor_id'))
+    AuditLog.objects.filter(actor__isnull=False).update(
+        actor_name=Subquery(actor.values('full_name')[:1]),
+        actor_email=Subquery(actor.values('email')[:1]),
+    )
+
+
+def add_search_index(apps, schema_editor):
+    create_search_index(schema_editor, apps.get_model('auditlogs', 'AuditLog'), SEARCH_INDEX, SEARCH_FIELDS)
+
+
+def remove_search_index(apps, schema_editor):
+    drop_search_index(schema_editor, SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auditlogs', '0005_auditlog_time_entity_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='actor_email',
+            field=models.CharField(blank=True, help_text="Snapshot of user's email", max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='actor_name',
+            field=models.CharField(blank=True, help_text="Snapshot of user's full name", max_length=255, null=True),
+        ),
+        migrations.RunPython(backfill_actor_names, migrations.RunPython.noop),
+        migrations.RunPython(add_search_index, remove_search_index),
+    ]
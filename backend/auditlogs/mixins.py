@@ -1,9 +1,12 @@
 from django.db.models.signals import post_save, post_delete
-from django.db import transaction
 import json
 from django.core.serializers.json import DjangoJSONEncoder
 from .models import AuditLog
-from .middleware import get_current_request, get_client_ip
+from .buffer import record_audit
+from .middleware import get_audit_actor
+
+# Stands in for the values of audit_log_exclude_fields in a change set.
+REDACTED = '[redacted]'
 
 class AuditableMixin:
     """
@@ -12,69 +15,121 @@ class AuditableMixin:
     Logs CREATION, UPDATE, DELETION.
     """
     audit_log_exclude_fields = ['password', 'last_login', 'is_superuser', 'is_staff', 'groups', 'user_permissions']
+    # Models whose audit details don't use the field diff (e.g. Notification)
+    # set this to False: no snapshot is taken when they are loaded and
+    # updates are logged without computing changes.
+    audit_track_changes = True
+
+    # (attnames, values) of the fields as loaded from the database, shared
+    # with the queryset row rather than copied into a dict per instance.
+    _audit_original = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if cls.audit_track_changes:
+            instance._audit_original = (field_names, values)
+        return instance
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Capture state only when needed to prevent recursion during bulk fetches
-        self._audit_original_state = None
+    @classmethod
+    def _audit_fields_by_attname(cls, include_excluded=False):
+        cache_name = '_audit_all_fields_cache' if include_excluded else '_audit_fields_cache'
+        fields = cls.__dict__.get(cache_name)
+        if fields is None:
+            fields = {
+                field.attname: field for field in cls._meta.concrete_fields
+                if include_excluded or field.name not in cls.audit_log_exclude_fields
+            }
+            setattr(cls, cache_name, fields)
+        return fields
 
     def _get_model_state(self):
         """
         Snapshot of current model state.
         """
-        state = {}
-        for field in self._meta.fields:
-            if field.name in self.audit_log_exclude_fields:
+        return {
+            field.name: field.value_from_object(self)
+            for field in self._audit_fields_by_attname().values()
+        }
+
+    def _get_changes(self, update_fields=None):
+        """
+        Changed fields since the instance was loaded, or None when there is
+        nothing to compare against (built in memory, or not tracked).
+        Changes to audit_log_exclude_fields (password, privileges) are
+        listed by name with their values redacted.
+        """
+        if self._audit_original is None:
+            return None
+        fields = self._audit_fields_by_attname(include_excluded=True)
+        changes = {}
+        for attname, old_val in zip(*self._audit_original):
+            field = fields.get(attname)
+            if field is None or (update_fields is not None and field.name not in update_fields):
                 continue
-            try:
-                # Use value_from_object to get raw value
-                val = field.value_from_object(self)
-                state[field.name] = val
-            except Exception:
-                pass
-        return state
-
-    def save(self, *args, **kwargs):
+            new_val = getattr(self, attname)
+            if new_val != old_val:
+                if field.name in self.audit_log_exclude_fields:
+                    changes[field.name] = {'old': REDACTED, 'new': REDACTED}
+                else:
+                    changes[field.name] = {'old': old_val, 'new': new_val}
+        return changes
+
+    def _reset_audit_original(self, update_fields=None):
+        if self._audit_original is None:
+            if self.audit_track_changes:
+                attnames = tuple(
+                    field.attname for field in self._meta.concrete_fields
+                    if field.attname in self.__dict__
+                )
+                self._audit_original = (attnames, tuple(getattr(self, name) for name in attnames))
+            return
+        attnames, values = self._audit_original
+        self._audit_original = (attnames, tuple(
+            getattr(self, name) if update_fields is None or name in update_fields else value
+            for name, value in zip(attnames, values)
+        ))
+
+    def save(self, *args, audit_diff=True, **kwargs):
+        """
+        Pass audit_diff=False for saves whose audit entry doesn't need the
+        list of changed fields.
+        """
         # We need to determine if this is a Create or Update
         is_new = self._state.adding
-        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # Normalized to attnames and field names for the diff and the reset.
+            names = set()
+            for name in update_fields:
+                field = self._meta.get_field(name)
+                names.update((field.name, field.attname))
+            update_fields = names
+
+        changes = None
+        if not is_new and audit_diff and self.audit_track_changes:
+            changes = self._get_changes(update_fields)
+            if changes is not None and not changes:
+                # Nothing changed: save without an audit entry.
+                super().save(*args, **kwargs)
+                return
+
         super().save(*args, **kwargs)
-        
-        self._log_change(is_new)
-        self._audit_original_state = self._get_model_state() # Reset state
+
+        if is_new:
+            changes = {}
+            if audit_diff and self.audit_track_changes:
+                changes = {k: {'old': None, 'new': v} for k, v in self._get_model_state().items() if v is not None}
+        self._log_change(is_new, changes or {})
+        self._reset_audit_original(update_fields)
 
     def delete(self, *args, **kwargs):
         self._log_delete()
         super().delete(*args, **kwargs)
 
-    def _log_change(self, is_new):
-        request = get_current_request()
-        if not request:
-            user = None
-            ip = None
-            actor_userid = 'System'
-            actor_employee_id = None
-        else:
-            user = request.user if request.user.is_authenticated else None
-            ip = get_client_ip(request)
-            actor_userid = user.username if user else 'Anonymous'
-            actor_employee_id = getattr(user, 'employee_id', None) if user else None
-
+    def _log_change(self, is_new, changes):
         try:
-            current_state = self._get_model_state()
             action = 'CREATE' if is_new else 'UPDATE'
-            changes = {}
-
-            if is_new:
-                changes = {k: {'old': None, 'new': v} for k, v in current_state.items() if v is not None}
-            else:
-                for field, new_val in current_state.items():
-                    old_val = self._audit_original_state.get(field) if self._audit_original_state else None
-                    if new_val != old_val:
-                        changes[field] = {'old': old_val, 'new': new_val}
-            
-            if not changes and not is_new:
-                return 
 
             details = ""
             if hasattr(self, 'get_audit_details'):
@@ -83,32 +138,16 @@ class AuditableMixin:
                 except Exception:
                     pass
 
-            with transaction.atomic():
-                AuditLog.objects.create(
-                    action=action,
-                    entity_type=self.__class__.__name__,
-                    actor=user,
-                    actor_userid=actor_userid,
-                    actor_employee_id=actor_employee_id,
-                    ip_address=ip,
-                    details=details
-                )
+            record_audit(AuditLog(
+                action=action,
+                entity_type=self.__class__.__name__,
+                details=details,
+                **get_audit_actor()
+            ))
         except Exception as e:
             print(f"Failed to write audit log: {e}")
 
     def _log_delete(self):
-        request = get_current_request()
-        if not request:
-            user = None
-            ip = None
-            actor_userid = 'System'
-            actor_employee_id = None
-        else:
-            user = request.user if request.user.is_authenticated else None
-            ip = get_client_ip(request)
-            actor_userid = user.username if user else 'Anonymous'
-            actor_employee_id = getattr(user, 'employee_id', None) if user else None
-
         try:
             details = ""
             if hasattr(self, 'get_audit_details'):
@@ -117,15 +156,11 @@ class AuditableMixin:
                 except Exception:
                     pass
 
-            with transaction.atomic():
-                AuditLog.objects.create(
-                    action='DELETE',
-                    entity_type=self.__class__.__name__,
-                    actor=user,
-                    actor_userid=actor_userid,
-                    actor_employee_id=actor_employee_id,
-                    ip_address=ip,
-                    details=details
-                )
+            record_audit(AuditLog(
+                action='DELETE',
+                entity_type=self.__class__.__name__,
+                details=details,
+                **get_audit_actor()
+            ))
         except Exception as e:
             print(f"Failed to write audit log (delete): {e}")
@@ -24,6 +24,8 @@ class AuditLog(models.Model):
     )
     actor_userid = models.CharField(max_length=255, blank=True, null=True, help_text="Snapshot of user's username/ID")
     actor_employee_id = models.CharField(max_length=100, blank=True, null=True, help_text="Snapshot of employee ID")
+    actor_name = models.CharField(max_length=255, blank=True, null=True, help_text="Snapshot of user's full name")
+    actor_email = models.CharField(max_length=255, blank=True, null=True, help_text="Snapshot of user's email")
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
@@ -32,12 +34,17 @@ class AuditLog(models.Model):
     status = models.CharField(max_length=20, default='SUCCESS')
     details = models.TextField(blank=True, null=True, help_text="Human readable description of the action")
 
+    # Columns of the full-text search vector (see auditlogs.search); the
+    # auditlog_search_idx GIN index is built from the same list.
+    SEARCH_FIELDS = ('actor_userid', 'actor_employee_id', 'actor_name', 'actor_email', 'entity_type', 'details')
+
     class Meta:
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['entity_type']),
-            models.Index(fields=['action']),
             models.Index(fields=['actor']),
+            # Time-bounded listing and filtering, and the retention scan.
+            models.Index(fields=['timestamp', 'entity_type', 'action'], name='auditlog_time_entity_idx'),
         ]
 
     def __str__(self):
@@ -0,0 +1,170 @@
+"""
+Count-free keyset pagination for the log tables.
+
+Page-number pagination runs a COUNT(*) over the whole filtered table and an
+OFFSET scan on every page, which on millions of audit rows means two full
+scans per request. KeysetPagination instead orders by a unique key, newest
+first, and hands out an opaque cursor holding the last row's key; the next
+page is "rows before that key", an index range scan whatever the depth.
+
+The total, when wanted, is approximate: pg_class.reltuples for an
+unfiltered table on Postgres, otherwise an exact count cached for a short
+while (see approximate_count).
+"""
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Below this many estimated rows an exact count is cheap and more useful.
+ESTIMATE_THRESHOLD = 100000
+
+
+def _estimated_rows(queryset):
+    """reltuples of the table, summed over its partitions if partitioned."""
+    table = queryset.model._meta.db_table
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT SUM(GREATEST(c.reltuples, 0)) FROM pg_class c
+            WHERE c.oid = to_regclass(%s)
+               OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))
+            """,
+            [table, table]
+        )
+        row = cursor.fetchone()
+    return int(row[0] or 0)
+
+
+def approximate_count(queryset):
+    """
+    Planner estimate for an unfiltered Postgres table; otherwise the exact
+    count, cached for AUDITLOG_COUNT_CACHE_SECONDS per distinct query.
+    """
+    if connections[queryset.db].vendor == 'postgresql' and not queryset.query.where:
+        estimate = _estimated_rows(queryset)
+        if estimate >= ESTIMATE_THRESHOLD:
+            return estimate
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    key = 'keyset-count:' + hashlib.md5(f"{sql}{params}".encode()).hexdigest()
+    total = cache.get(key)
+    if total is None:
+        total = queryset.order_by().count()
+        cache.set(key, total, getattr(settings, 'AUDITLOG_COUNT_CACHE_SECONDS', 60))
+    return total
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Forward-only keyset pagination, newest first. `ordering` names the key
+    fields, most significant first; the last must be unique (the pk).
+    ?include_total=1 adds an approximate 'count' to the response where
+    `supports_total` allows it.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('timestamp', 'pk')
+    supports_total = True
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def to_python(self, model, name, value):
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        return field.to_python(value)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [self.to_python(model, name, value) for name, value in zip(self.ordering, values)]
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, row):
+        values = []
+        for name in self.ordering:
+            value = getattr(row, name)
+            # Full microsecond precision: a truncated timestamp would skip rows.
+            values.append(value if isinstance(value, (int, float)) else
+                          value.isoformat() if isinstance(value, datetime) else str(value))
+        payload = json.dumps(values)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def after(self, queryset, position):
+        """Rows strictly after `position` in descending key order."""
+        keys = list(zip(self.ordering, position))
+        condition = Q()
+        for i, (name, value) in enumerate(keys):
+            equal = {key: key_value for key, key_value in keys[:i]}
+            condition |= Q(**equal, **{f'{name}__lt': value})
+        # The redundant bound on the leading key lets the planner range-scan its index.
+        first, value = keys[0]
+        return queryset.filter(condition, **{f'{first}__lte': value})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.total = None
+        if self.supports_total and request.query_params.get('include_total') in ('1', 'true', 'True'):
+            self.total = approximate_count(queryset)
+        size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = self.after(queryset, position)
+        rows = list(queryset.order_by(*[f'-{name}' for name in self.ordering])[:size + 1])
+        self.has_next = len(rows) > size
+        self.rows = rows[:size]
+        return self.rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.rows[-1]))
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link(), 'previous': None, 'results': data}
+        if self.total is not None:
+            response['count'] = self.total
+        return Response(response)
+
+
+class RankedKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination over ranked_search results: best match first, then
+    newest first among equal ranks.
+    """
+    time_field = 'timestamp'
+    # Ranked results have no cheap estimate; they are never counted.
+    supports_total = False
+
+    @property
+    def ordering(self):
+        return ('rank', self.time_field, 'pk')
+
+    def to_python(self, model, name, value):
+        if name == 'rank':
+            return float(value)
+        return super().to_python(model, name, value)
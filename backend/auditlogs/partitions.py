@@ -0,0 +1,15 @@
+"""
+Optional native Postgres range partitioning of the AuditLog table.
+
+With AUDITLOG_PARTITIONING enabled and the table converted (see the
+auditlog_partitions management command), audit entries live in one
+partition per calendar month of timestamp. Queries bounded by timestamp
+only touch the months they cover, and once a month is past
+AUDITLOG_RETENTION_DAYS the retention task exports it and drops the whole
+partition. Months are created ahead of time by that task; see
+auditlogs.archive for the mechanics.
+"""
+from .archive import MonthlyPartitions
+from .models import AuditLog
+
+auditlog_partitions = MonthlyPartitions(AuditLog, 'timestamp', 'AUDITLOG_PARTITIONING', 'auditlog_search_idx')
@@ -0,0 +1,61 @@
+"""
+Retention for AuditLog entries.
+
+Entries older than AUDITLOG_RETENTION_DAYS (None keeps them forever) are
+exported as gzipped NDJSON to the default storage, one file per batch and
+calendar month of timestamp:
+
+    archives/audit_logs/2024/03/20250901T030000-0001.ndjson.gz
+
+and then removed (see auditlogs.archive). With the table partitioned (see
+auditlogs.partitions) whole months are exported and their partitions
+dropped; otherwise rows are deleted batch by batch.
+
+Batches walk (timestamp, id) from the oldest entry, which the
+(timestamp, entity_type, action) index serves as a short range scan.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .archive import BATCH_SIZE, archive_partitions, archive_rows
+from .models import AuditLog
+from .partitions import auditlog_partitions
+
+logger = logging.getLogger(__name__)
+
+LABEL = 'audit_logs'
+ORDER = ('timestamp', 'id')
+
+
+def retention_days():
+    return getattr(settings, 'AUDITLOG_RETENTION_DAYS', 730)
+
+
+def archive_expired(now=None, batch_size=BATCH_SIZE):
+    """
+    Archives and removes every AuditLog entry past the retention window.
+    Returns the number of entries archived.
+    """
+    now = now or timezone.now()
+    days = retention_days()
+    partitioned = auditlog_partitions.enabled() and auditlog_partitions.is_partitioned()
+    if partitioned:
+        auditlog_partitions.ensure_partitions(now)
+    if days is None:
+        return 0
+
+    run_stamp = f"{timezone.localtime(now):%Y%m%dT%H%M%S}"
+    cutoff = now - timedelta(days=days)
+    archived = 0
+    if partitioned:
+        archived += archive_partitions(auditlog_partitions, cutoff, LABEL, run_stamp, batch_size, ORDER)
+    # Rows of the partly expired month (or all of them, unpartitioned).
+    archived += archive_rows(
+        AuditLog, Q(timestamp__lt=cutoff), LABEL, run_stamp, batch_size, ORDER, time_field='timestamp'
+    )
+    logger.info(f"Archived {archived} audit log entries")
+    return archived
@@ -0,0 +1,80 @@
+"""
+Full-text search over the log tables (AuditLog, SMSLog, Notification).
+
+On Postgres each table has a GIN expression index over
+to_tsvector('simple', <its SEARCH_FIELDS>), created by a migration with
+create_search_index, and ranked_search filters with the very same
+SearchVector so the planner uses that index instead of scanning with
+icontains. Every search term must match as a prefix ("ram 9801" finds
+"Ramesh" with phone 98010...), and rows are ranked with ts_rank. The
+'simple' configuration does no stemming, which suits names, ids and phone
+numbers better than a language dictionary.
+
+Searches read denormalized columns (actor_name on AuditLog, recipient_name
+on SMSLog), so no join to the user table is needed.
+
+Elsewhere (SQLite under tests) every term is an icontains match on the same
+columns and all rows rank equally.
+
+Audit log and notification results are paged with
+auditlogs.pagination.RankedKeysetPagination on (rank, time, id), newest
+first among equal ranks; SMS log search keeps page numbers and a count.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+
+SEARCH_CONFIG = 'simple'
+MAX_TERMS = 8
+
+# Characters with a meaning in tsquery syntax.
+_TSQUERY_SPECIAL = re.compile(r"[&|!:*()<>'\\]")
+
+
+def fts_enabled():
+    return connection.vendor == 'postgresql'
+
+
+def search_vector(*fields):
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector(*fields, config=SEARCH_CONFIG)
+
+
+def create_search_index(schema_editor, model, name, fields):
+    """Creates the GIN index ranked_search relies on (Postgres only)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.indexes import GinIndex
+    schema_editor.add_index(model, GinIndex(search_vector(*fields), name=name))
+
+
+def drop_search_index(schema_editor, name):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def search_terms(text):
+    terms = (_TSQUERY_SPECIAL.sub('', term) for term in (text or '').lower().split())
+    return [term for term in terms if term][:MAX_TERMS]
+
+
+def ranked_search(queryset, fields, text):
+    """
+    Rows of queryset matching every term of text in `fields`, annotated with
+    `rank` (higher is better).
+    """
+    terms = search_terms(text)
+    if fts_enabled() and terms:
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        vector = search_vector(*fields)
+        query = SearchQuery(' & '.join(f"{term}:*" for term in terms), search_type='raw', config=SEARCH_CONFIG)
+        return queryset.alias(search=vector).filter(search=query).annotate(rank=SearchRank(vector, query))
+
+    matches = Q()
+    for term in terms:
+        term_matches = Q()
+        for field in fields:
+            term_matches |= Q(**{f'{field}__icontains': term})
+        matches &= term_matches
+    return queryset.filter(matches).annotate(rank=Value(0.0, output_field=FloatField()))
@@ -6,9 +6,13 @@ class AuditLogSerializer(serializers.ModelSerializer):
     actor_full_name = serializers.SerializerMethodField()
     
     def get_actor_email(self, obj):
+        if obj.actor_email:
+            return obj.actor_email
         return obj.actor.email if obj.actor else "N/A"
-        
+
     def get_actor_full_name(self, obj):
+        if obj.actor_name:
+            return obj.actor_name
         return obj.actor.full_name if obj.actor else "System/Deleted"
     
     class Meta:
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+
+@shared_task
+def archive_expired_audit_logs():
+    """
+    Daily retention run: exports AuditLog entries past AUDITLOG_RETENTION_DAYS
+    to storage and removes them (or drops whole monthly partitions when the
+    table is partitioned).
+    """
+    from .retention import archive_expired
+    return archive_expired()
@@ -0,0 +1,373 @@
+import asyncio
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db import transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from org.models import WorkingOffice
+from .buffer import audit_batch
+from .bulk import audited_bulk_create, audited_delete, audited_update
+from .models import AuditLog
+
+
+class AuditBufferTest(TestCase):
+    def office_logs(self):
+        return AuditLog.objects.filter(entity_type='WorkingOffice', action='CREATE')
+
+    def test_batch_writes_committed_entries_in_one_insert(self):
+        batch = audit_batch().__enter__()
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkingOffice.objects.create(name="Audit A")
+            try:
+                with transaction.atomic():
+                    WorkingOffice.objects.create(name="Audit B")
+                    raise ValueError("rolled back")
+            except ValueError:
+                pass
+            WorkingOffice.objects.create(name="Audit C")
+        self.assertEqual(self.office_logs().count(), 0)
+
+        with self.assertNumQueries(1):
+            batch.__exit__(None, None, None)
+        # The entry for the rolled-back savepoint is dropped.
+        self.assertEqual(self.office_logs().count(), 2)
+
+    def test_entries_outside_a_batch_are_written_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkingOffice.objects.create(name="Audit D")
+            self.assertEqual(self.office_logs().count(), 0)
+        self.assertEqual(self.office_logs().count(), 1)
+
+
+class AuditSnapshotTest(TestCase):
+    def test_update_diffs_fields_changed_since_load(self):
+        office = WorkingOffice.objects.create(name="Snapshot")
+        office = WorkingOffice.objects.get(pk=office.pk)
+        self.assertIsNotNone(office._audit_original)
+
+        office.name = "Snapshot renamed"
+        self.assertEqual(office._get_changes(), {'name': {'old': "Snapshot", 'new': "Snapshot renamed"}})
+        with self.captureOnCommitCallbacks(execute=True):
+            office.save()
+            # Saved values become the new baseline; an unchanged save logs nothing.
+            self.assertEqual(office._get_changes(), {})
+            office.save()
+        self.assertEqual(AuditLog.objects.filter(entity_type='WorkingOffice', action='UPDATE').count(), 1)
+
+    def test_password_and_privilege_changes_are_logged_redacted(self):
+        from users.models import User
+
+        user = User.objects.create_user(
+            username='secure', email='secure@example.com', employee_id='SEC-1', password='x', full_name='Secure'
+        )
+        user = User.objects.get(pk=user.pk)
+        AuditLog.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            user.set_password('new-password')
+            self.assertEqual(user._get_changes(), {'password': {'old': '[redacted]', 'new': '[redacted]'}})
+            user.save()
+            user.is_superuser = True
+            user.is_staff = True
+            user.save()
+        details = list(AuditLog.objects.filter(entity_type='User', action='UPDATE').values_list('details', flat=True))
+        self.assertEqual(len(details), 2)
+        self.assertTrue(any('password' in d for d in details))
+        self.assertTrue(any('is_superuser' in d and 'is_staff' in d for d in details))
+        self.assertFalse(any('new-password' in d or 'pbkdf2' in d for d in details))
+
+    def test_untracked_models_skip_the_snapshot(self):
+        from notification_service.models import Notification
+        from users.models import User
+
+        user = User.objects.create_user(
+            username='snapshot', email='snapshot@example.com', employee_id='SNAP-1', password='x'
+        )
+        notification = Notification.objects.create(user=user, title="t", message="m")
+        notification = Notification.objects.get(pk=notification.pk)
+        self.assertIsNone(notification._audit_original)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.is_read = True
+            notification.save(update_fields=['is_read'])
+        self.assertTrue(AuditLog.objects.filter(entity_type='Notification', action='UPDATE').exists())
+
+
+class AuditedBulkTest(TestCase):
+    def test_bulk_operations_log_one_entry_each(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            offices = audited_bulk_create(WorkingOffice, [WorkingOffice(name=f"Bulk {i}") for i in range(3)])
+            ids = [office.id for office in offices]
+            updated = audited_update(WorkingOffice.objects.filter(id__in=ids), {'name': "Bulk renamed"})
+            deleted, _ = audited_delete(WorkingOffice.objects.filter(id__in=ids[:2]))
+        self.assertEqual((updated, deleted), (3, 2))
+        self.assertEqual(WorkingOffice.objects.filter(name="Bulk renamed").count(), 1)
+
+        logs = {log.action: log for log in AuditLog.objects.filter(entity_type='WorkingOffice')}
+        self.assertEqual(set(logs), {'CREATE', 'UPDATE', 'DELETE'})
+        self.assertIn(f"ids: {ids[0]}, {ids[1]}, {ids[2]}", logs['UPDATE'].details)
+        self.assertIn(f"2 working offices; ids: {ids[0]}, {ids[1]}", logs['DELETE'].details)
+        self.assertEqual(logs['CREATE'].actor_userid, 'System')
+
+
+class AuditRetentionTest(TestCase):
+    def test_expired_entries_are_exported_and_deleted(self):
+        import gzip, json, os, tempfile
+        from datetime import timedelta
+        from django.test import override_settings
+        from django.utils import timezone
+        from .retention import archive_expired
+
+        now = timezone.now()
+        AuditLog.objects.all().delete()
+        AuditLog.objects.bulk_create([
+            AuditLog(action='LOGIN', entity_type='User', details=details, timestamp=now - timedelta(days=age))
+            for details, age in [("old", 40), ("older", 45), ("recent", 5)]
+        ])
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root, AUDITLOG_RETENTION_DAYS=30
+        ):
+            self.assertEqual(archive_expired(now, batch_size=1), 2)
+            rows = []
+            for directory, _, files in os.walk(os.path.join(media_root, 'archives', 'audit_logs')):
+                for name in files:
+                    with gzip.open(os.path.join(directory, name), 'rt') as f:
+                        rows += [json.loads(line) for line in f]
+
+        self.assertEqual(sorted(row['details'] for row in rows), ["old", "older"])
+        self.assertEqual(list(AuditLog.objects.values_list('details', flat=True)), ["recent"])
+
+    def test_export_walks_ties_in_the_time_column_once(self):
+        import gzip, json, os, tempfile
+        from django.test import override_settings
+        from django.utils import timezone
+        from .archive import export_rows
+
+        now = timezone.now()
+        AuditLog.objects.all().delete()
+        AuditLog.objects.bulk_create([
+            AuditLog(action='LOGIN', entity_type='User', details=str(i), timestamp=now) for i in range(3)
+        ])
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            exported = export_rows(
+                AuditLog.objects.all(), 'audit_logs', 'run', batch_size=2, order=('timestamp', 'id'), time_field='timestamp'
+            )
+            rows = []
+            for directory, _, files in os.walk(media_root):
+                for name in files:
+                    with gzip.open(os.path.join(directory, name), 'rt') as f:
+                        rows += [json.loads(line) for line in f]
+
+        self.assertEqual(exported, 3)
+        self.assertEqual(sorted(row['details'] for row in rows), ["0", "1", "2"])
+        # Export alone never deletes.
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_date_filters_are_timestamp_ranges(self):
+        from datetime import date, datetime, time
+        from django.utils import timezone
+        from .views import AuditLogFilter
+
+        AuditLog.objects.all().delete()
+        AuditLog.objects.bulk_create([
+            AuditLog(action='LOGIN', entity_type='User', details=str(day),
+                     timestamp=timezone.make_aware(datetime.combine(date(2025, 3, day), time(23, 59))))
+            for day in (1, 2, 3)
+        ])
+        filterset = AuditLogFilter({'start_date': '2025-03-02', 'end_date': '2025-03-02'}, queryset=AuditLog.objects.all())
+        self.assertEqual(list(filterset.qs.values_list('details', flat=True)), ["2"])
+        self.assertIn('"auditlogs_auditlog"."timestamp" >=', str(filterset.qs.query))
+
+
+class AuditSearchTest(TestCase):
+    def test_ranked_search_pages_by_keyset_over_denormalized_columns(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+        from users.models import User
+
+        admin = User.objects.create_user(
+            username='searcher', email='searcher@example.com', employee_id='SRCH-1', password='x',
+            full_name='Search Admin', is_superuser=True
+        )
+        now = timezone.now()
+        AuditLog.objects.all().delete()
+        AuditLog.objects.bulk_create([
+            AuditLog(action='UPDATE', entity_type='Duty', actor_name=name, details=f"entry {i}",
+                     timestamp=now - timedelta(minutes=i))
+            for i, name in enumerate(["Ramesh Thapa", "Ramesh Thapa", "Ramesh Karki", "Sita Thapa", "Ramesh Thapa"])
+        ])
+
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/v1/auditlogs/', {'search': 'rames thap', 'page_size': 2})
+        self.assertNotIn('count', response.data)
+        seen = [row['details'] for row in response.data['results']]
+        while response.data['next']:
+            response = client.get(response.data['next'])
+            seen += [row['details'] for row in response.data['results']]
+        self.assertEqual(seen, ["entry 0", "entry 1", "entry 4"])
+
+    def test_sms_logs_copy_recipient_names_for_search(self):
+        from notification_service.models import SMSLog
+        from users.models import User
+
+        user = User.objects.create_user(
+            username='recipient', email='recipient@example.com', employee_id='RCPT-1', password='x',
+            full_name='Hari Prasad'
+        )
+        SMSLog.objects.bulk_create([SMSLog(user=user, phone='9800000001', message='m', reminder_type='BULK')])
+        log = SMSLog.objects.get(reminder_type='BULK')
+        self.assertEqual((log.recipient_name, log.recipient_username), ('Hari Prasad', 'recipient'))
+
+    def test_sms_log_search_keeps_page_numbers_and_count(self):
+        from notification_service.models import SMSLog
+        from rest_framework.test import APIClient
+        from users.models import User
+
+        admin = User.objects.create_user(
+            username='smsadmin', email='smsadmin@example.com', employee_id='SMSA-1', password='x',
+            full_name='Gita Sharma', is_staff=True
+        )
+        SMSLog.objects.bulk_create([
+            SMSLog(user=admin, phone=f'98000000{i:02d}', message=f'duty {i}', reminder_type=f'SEARCH-{i}')
+            for i in range(20)
+        ])
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/v1/notifications/sms-logs/', {'search': 'gita', 'page': 2})
+        self.assertEqual(response.data['count'], 20)
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class AuditLogListTest(TestCase):
+    def test_list_pages_by_keyset_with_optional_total(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+        from users.models import User
+
+        admin = User.objects.create_user(
+            username='lister', email='lister@example.com', employee_id='LIST-1', password='x',
+            full_name='List Admin', is_superuser=True
+        )
+        AuditLog.objects.all().delete()
+        now = timezone.now()
+        # Two entries share a timestamp; the id breaks the tie.
+        AuditLog.objects.bulk_create([
+            AuditLog(action='LOGIN', entity_type='User', details=f"entry {i}", actor=admin,
+                     timestamp=now - timedelta(microseconds=min(i, 3)))
+            for i in range(5)
+        ])
+
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get('/api/v1/auditlogs/', {'page_size': 2, 'include_total': 1})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(response.data['results'][0]['actor_full_name'], 'List Admin')
+        seen = [row['id'] for row in response.data['results']]
+        while response.data['next']:
+            response = client.get(response.data['next'])
+            seen += [row['id'] for row in response.data['results']]
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(set(seen), {str(pk) for pk in AuditLog.objects.values_list('id', flat=True)})
+
+
+class AuditLogExportTest(TestCase):
+    def test_export_streams_filtered_rows(self):
+        import json
+        from rest_framework.test import APIClient
+        from users.models import User
+
+        admin = User.objects.create_user(
+            username='exporter', email='exporter@example.com', employee_id='EXP-1', password='x',
+            is_superuser=True
+        )
+        AuditLog.objects.all().delete()
+        AuditLog.objects.bulk_create(
+            [AuditLog(action='LOGIN', entity_type='User', details=f"login {i}") for i in range(3)]
+            + [AuditLog(action='DELETE', entity_type='Duty', details='=HYPERLINK("x")')]
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        response = client.get('/api/v1/auditlogs/export/', {'action': 'LOGIN'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertTrue(lines[0].startswith('timestamp,actor_userid'))
+        self.assertEqual(len(lines), 4)
+
+        response = client.get('/api/v1/auditlogs/export/', {'entity_type': 'Duty', 'export_format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['action'] for row in rows], ['DELETE'])
+
+        # Formula-looking cells are neutralised in CSV.
+        response = client.get('/api/v1/auditlogs/export/', {'entity_type': 'Duty'})
+        self.assertIn(b"'=HYPERLINK", b''.join(response.streaming_content))
+
+        self.assertEqual(client.get('/api/v1/auditlogs/export/', {'export_format': 'xml'}).status_code, 400)
+
+
+class RequestContextIsolationTest(SimpleTestCase):
+    """Concurrent async requests on one event loop must not see each other's context."""
+
+    def make_request(self, name):
+        request = RequestFactory().get('/api/v1/', REMOTE_ADDR='10.0.0.1')
+        request.user = SimpleNamespace(
+            is_authenticated=True, username=name, email=f'{name}@example.com', employee_id=name, full_name=name
+        )
+        return request
+
+    async def test_concurrent_requests_see_their_own_actor_and_batch(self):
+        from notification_service.signals import _skip_duty_notifications, suppress_duty_notifications
+        from . import buffer
+        from .middleware import AuditContextMiddleware, get_audit_actor, get_current_request
+
+        async def view(request):
+            name = request.user.username
+            # Only the first request suppresses duty notifications.
+            suppress = suppress_duty_notifications() if name == 'user0' else nullcontext()
+            with suppress:
+                await asyncio.sleep(0.01)
+                buffer._collect(name)
+                await asyncio.sleep(0.01)
+                actor = await sync_to_async(get_audit_actor)()
+                return {
+                    'request': get_current_request() is request,
+                    'actor': actor['actor_userid'],
+                    'suppressed': _skip_duty_notifications.get(),
+                }
+
+        middleware = AuditContextMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with patch.object(buffer, '_write') as write:
+            results = await asyncio.gather(*[middleware(self.make_request(f'user{i}')) for i in range(10)])
+
+        for i, result in enumerate(results):
+            self.assertEqual(result, {'request': True, 'actor': f'user{i}', 'suppressed': i == 0})
+        # Each request wrote exactly its own entries.
+        self.assertEqual(sorted(call.args[0] for call in write.call_args_list), sorted([f'user{i}'] for i in range(10)))
+        self.assertIsNone(get_current_request())
+        self.assertFalse(_skip_duty_notifications.get())
+        self.assertIsNone(buffer._entries.get())
+
+    def test_sync_middleware_clears_context(self):
+        from .middleware import AuditContextMiddleware, get_current_request
+
+        request = self.make_request('sync')
+        middleware = AuditContextMiddleware(lambda r: get_current_request())
+        self.assertFalse(iscoroutinefunction(middleware))
+        self.assertIs(middleware(request), request)
+        self.assertIsNone(get_current_request())
+
+    def test_nested_suppression_restores_outer_state(self):
+        from notification_service.signals import _skip_duty_notifications, suppress_duty_notifications
+
+        with suppress_duty_notifications():
+            with suppress_duty_notifications():
+                pass
+            self.assertTrue(_skip_duty_notifications.get())
+        self.assertFalse(_skip_duty_notifications.get())
@@ -1,7 +1,14 @@
-from rest_framework import viewsets, permissions, filters
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as django_filters
+from .export import export_response, requested_format
 from .models import AuditLog
+from .pagination import KeysetPagination, RankedKeysetPagination
+from .search import ranked_search
 from .serializers import AuditLogSerializer
 
 class IsSuperAdmin(permissions.BasePermission):
@@ -13,43 +20,78 @@ class IsSuperAdmin(permissions.BasePermission):
             return False
         return bool(request.user.is_superuser or request.user.role == 'SUPERADMIN')
 
-from rest_framework.pagination import PageNumberPagination
-
-class AuditLogPagination(PageNumberPagination):
+class AuditLogPagination(KeysetPagination):
     page_size = 20
-    page_size_query_param = 'page_size'
     max_page_size = 100
+    ordering = ('timestamp', 'pk')
+
+def day_start(value):
+    return timezone.make_aware(datetime.combine(value, time.min))
 
 class AuditLogFilter(django_filters.FilterSet):
-    start_date = django_filters.DateFilter(field_name="timestamp__date", lookup_expr='gte')
-    end_date = django_filters.DateFilter(field_name="timestamp__date", lookup_expr='lte')
+    # Range predicates on timestamp itself (not timestamp__date) so the
+    # timestamp index and partition pruning apply.
+    start_date = django_filters.DateFilter(method='filter_start_date')
+    end_date = django_filters.DateFilter(method='filter_end_date')
+
+    def filter_start_date(self, queryset, name, value):
+        return queryset.filter(timestamp__gte=day_start(value))
+
+    def filter_end_date(self, queryset, name, value):
+        return queryset.filter(timestamp__lt=day_start(value + timedelta(days=1)))
 
     class Meta:
         model = AuditLog
         fields = ['action', 'entity_type', 'status', 'actor_userid', 'actor_employee_id', 'start_date', 'end_date']
 
+AUDITLOG_EXPORT_COLUMNS = [
+    ('timestamp', 'timestamp'),
+    ('actor_userid', 'actor_userid'),
+    ('actor_employee_id', 'actor_employee_id'),
+    ('actor_name', 'actor_name'),
+    ('actor_email', 'actor_email'),
+    ('action', 'action'),
+    ('entity_type', 'entity_type'),
+    ('status', 'status'),
+    ('ip_address', 'ip_address'),
+    ('details', 'details'),
+]
+
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = AuditLog.objects.all().order_by('-timestamp')
+    # Only the serialized columns; actor names come from the snapshot columns
+    # and the joined user is just the fallback for entries without them.
+    queryset = AuditLog.objects.select_related('actor').only(
+        'id', 'timestamp', 'actor_id', 'actor_userid', 'actor_employee_id', 'actor_name', 'actor_email',
+        'action', 'entity_type', 'ip_address', 'status', 'details', 'actor__full_name', 'actor__email',
+    ).order_by('-timestamp', '-id')
     serializer_class = AuditLogSerializer
     permission_classes = [permissions.IsAuthenticated, IsSuperAdmin]
     pagination_class = AuditLogPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    
+    filter_backends = [DjangoFilterBackend]
+
     filterset_class = AuditLogFilter
-    # Enhanced search to include actor's name/email and user details
-    search_fields = [
-        'actor_userid', 
-        'actor_employee_id', 
-        'entity_type', 
-        'details',
-        'actor__first_name',
-        'actor__last_name',
-        'actor__full_name',
-        'actor__email'
-    ]
+
+    def search_text(self):
+        return self.request.query_params.get('search', '').strip() if self.request else ''
+
+    @property
+    def paginator(self):
+        # ?search= results are ranked and paged by keyset instead of page number.
+        if not hasattr(self, '_paginator'):
+            self._paginator = RankedKeysetPagination() if self.search_text() else self.pagination_class()
+        return self._paginator
 
     def get_queryset(self):
-        print("DEBUG: AuditLogViewSet.get_queryset called")
         qs = super().get_queryset()
-        print(f"DEBUG: Found {qs.count()} logs")
+        search = self.search_text()
+        if search:
+            # Full-text search over denormalized actor columns, no joins.
+            qs = ranked_search(qs, AuditLog.SEARCH_FIELDS, search)
         return qs
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Streams every entry matching the list filters as CSV or NDJSON (?export_format=)."""
+        export_format = requested_format(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(queryset, AUDITLOG_EXPORT_COLUMNS, export_format, 'audit-logs')
@@ -1,13 +1,38 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 from django.conf import settings
 from rest_framework.exceptions import PermissionDenied
 from django.middleware.csrf import CsrfViewMiddleware
+from users.identity import cached_user
 
 class CSRFCheck(CsrfViewMiddleware):
     def _reject(self, request, reason):
         return reason
 
 class CookieJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        """JWTAuthentication.get_user, resolving the user from the identity cache."""
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        try:
+            user = cached_user(user_id)
+        except (self.user_model.DoesNotExist, ValueError):
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+        return user
+
     def authenticate(self, request):
         header = self.get_header(request)
         is_cookie = False
@@ -1,3 +1,5 @@
+import hashlib
+import json
 import time
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -11,6 +13,7 @@ from django.conf import settings
 from django.core import signing
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from users.identity import me_snapshot
 from users.models import Permission, Role, RolePermission, UserPermission
 from otp_service.models import OTPRequest
 from .serializers import TokenObtainPair2FASerializer
@@ -18,6 +21,64 @@ from .permissions import validate_raw_mobile_token, MOBILE_SESSION_LIFETIME
 
 User = get_user_model()
 
+def build_me_payload(user):
+    """Identity, permissions and manageable offices of user, as returned by /me."""
+    full_name = getattr(user, "full_name", None)
+    if not full_name:
+        full_name = f"{user.first_name} {user.last_name}".strip()
+
+    role = getattr(user, "role", None)
+    permissions = []
+    try:
+        if role == "SUPERADMIN":
+            permissions = list(Permission.objects.filter(is_active=True).values_list("slug", flat=True))
+        else:
+            role_obj = Role.objects.filter(slug=role, is_active=True).first()
+            if role_obj:
+                role_perm_slugs = list(
+                    RolePermission.objects.filter(role=role_obj).select_related("permission").values_list("permission__slug", flat=True)
+                )
+                permissions = role_perm_slugs
+            direct_perm_slugs = list(
+                UserPermission.objects.filter(user=user).select_related("permission").values_list("permission__slug", flat=True)
+            )
+            seen = set()
+            merged = []
+            for slug in permissions + direct_perm_slugs:
+                if slug not in seen:
+                    seen.add(slug)
+                    merged.append(slug)
+            permissions = merged
+    except Exception:
+        permissions = []
+
+    # Relative here; MeView makes it absolute for the requesting host.
+    image_url = user.image.url if user.image else None
+
+    try:
+        from users.permissions import get_manageable_office_ids
+        manageable_office_ids = sorted(get_manageable_office_ids(user))
+    except Exception:
+        manageable_office_ids = []
+
+    return {
+        "id": user.id,
+        "username": user.username,
+        "full_name": full_name,
+        "email": user.email,
+        "employee_id": getattr(user, "employee_id", None),
+        "role": role,
+        "position_name": user.position.name if user.position else None,
+        "office_name": user.office.name if user.office else None,
+        "image": image_url,
+        "office_id": getattr(user, "office_id", None),
+        "position_id": getattr(user, "position_id", None),
+        "phone_number": user.phone_number,
+        "secondary_offices": list(user.secondary_offices.values_list('id', flat=True)) if hasattr(user, 'secondary_offices') else [],
+        "manageable_office_ids": manageable_office_ids,
+        "permissions": permissions,
+    }
+
 class MeView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -26,63 +87,19 @@ class MeView(APIView):
         security=[{'Bearer': []}],
     )
     def get(self, request):
-        user = request.user
-        full_name = getattr(user, "full_name", None)
-        if not full_name:
-            full_name = f"{user.first_name} {user.last_name}".strip()
-
-        role = getattr(user, "role", None)
-        permissions = []
-        try:
-            if role == "SUPERADMIN":
-                permissions = list(Permission.objects.filter(is_active=True).values_list("slug", flat=True))
-            else:
-                role_obj = Role.objects.filter(slug=role, is_active=True).first()
-                if role_obj:
-                    role_perm_slugs = list(
-                        RolePermission.objects.filter(role=role_obj).select_related("permission").values_list("permission__slug", flat=True)
-                    )
-                    permissions = role_perm_slugs
-                direct_perm_slugs = list(
-                    UserPermission.objects.filter(user=user).select_related("permission").values_list("permission__slug", flat=True)
-                )
-                seen = set()
-                merged = []
-                for slug in permissions + direct_perm_slugs:
-                    if slug not in seen:
-                        seen.add(slug)
-                        merged.append(slug)
-                permissions = merged
-        except Exception:
-            permissions = []
-
-        image_url = None
-        if user.image:
-            image_url = request.build_absolute_uri(user.image.url)
-
-        try:
-            from users.permissions import get_manageable_office_ids
-            manageable_office_ids = sorted(get_manageable_office_ids(user))
-        except Exception:
-            manageable_office_ids = []
-
-        return Response({
-            "id": user.id,
-            "username": user.username,
-            "full_name": full_name,
-            "email": user.email,
-            "employee_id": getattr(user, "employee_id", None),
-            "role": role,
-            "position_name": user.position.name if user.position else None,
-            "office_name": user.office.name if user.office else None,
-            "image": image_url,
-            "office_id": getattr(user, "office_id", None),
-            "position_id": getattr(user, "position_id", None),
-            "phone_number": user.phone_number,
-            "secondary_offices": list(user.secondary_offices.values_list('id', flat=True)) if hasattr(user, 'secondary_offices') else [],
-            "manageable_office_ids": manageable_office_ids,
-            "permissions": permissions,
-        })
+        data = dict(me_snapshot(request.user, build_me_payload))
+        if data["image"]:
+            data["image"] = request.build_absolute_uri(data["image"])
+
+        # Clients revalidate with If-None-Match and get a bodiless 304 while nothing changed.
+        etag = '"%s"' % hashlib.md5(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+        if etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
 
 class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
@@ -257,12 +257,82 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL')
 
 # NTC OTP Settings
 NTC_OTP_URL = os.environ.get('NTC_OTP_URL')
+# OTP request token buckets as (capacity, seconds per refilled token), per
+# user and per client IP. OTPRequest rows older than OTP_RETENTION_HOURS are
+# purged by the sweep-otp-requests beat task.
+OTP_RATE_LIMITS = {
+    'user': (int(os.environ.get('OTP_USER_BURST', 3)), int(os.environ.get('OTP_USER_REFILL_SECONDS', 30))),
+    'ip': (int(os.environ.get('OTP_IP_BURST', 20)), int(os.environ.get('OTP_IP_REFILL_SECONDS', 10))),
+}
+OTP_RETENTION_HOURS = int(os.environ.get('OTP_RETENTION_HOURS', 24))
 
 # NTC SMS Settings
 NTC_SMS_URL = os.environ.get('NTC_SMS_URL', 'http://10.26.192.122:42399/updatedsmssender-1.0-SNAPSHOT/updatedsmssender/')
 NTC_SMS_USERNAME = os.environ.get('NTC_SMS_USERNAME', 'NtcSmsSender')
 NTC_SMS_PASSWORD = os.environ.get('NTC_SMS_PASSWORD', '')
 NTC_SMS_SYSTEM_ID = os.environ.get('NTC_SMS_SYSTEM_ID', '1')
+# Gateway client tuning: pooled keep-alive connections per process, token
+# bucket matching the gateway's accepted send rate, and the circuit breaker
+# that stops hammering the gateway while it is failing. The bucket and the
+# breaker live in the default cache, so the rate is the total across every
+# web process and Celery worker.
+NTC_SMS_POOL_SIZE = int(os.environ.get('NTC_SMS_POOL_SIZE', 10))
+NTC_SMS_RATE_PER_SECOND = float(os.environ.get('NTC_SMS_RATE_PER_SECOND', 10))
+NTC_SMS_BURST = int(os.environ.get('NTC_SMS_BURST', 20))
+NTC_SMS_TIMEOUT = int(os.environ.get('NTC_SMS_TIMEOUT', 10))
+NTC_SMS_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('NTC_SMS_CIRCUIT_FAILURE_THRESHOLD', 5))
+NTC_SMS_CIRCUIT_RESET_SECONDS = int(os.environ.get('NTC_SMS_CIRCUIT_RESET_SECONDS', 30))
+# 'ntc' talks to the NTC SMS/OTP gateways; 'simulated' answers locally with
+# the latency, error rate and rate limit below (load tests, development).
+SMS_GATEWAY_BACKEND = os.environ.get('SMS_GATEWAY_BACKEND', 'ntc')
+SMS_SIMULATOR = {
+    'latency_ms': float(os.environ.get('SMS_SIMULATOR_LATENCY_MS', 80)),
+    'jitter_ms': float(os.environ.get('SMS_SIMULATOR_JITTER_MS', 40)),
+    'error_rate': float(os.environ.get('SMS_SIMULATOR_ERROR_RATE', 0)),
+    'reject_rate': float(os.environ.get('SMS_SIMULATOR_REJECT_RATE', 0)),
+    'rate_per_second': float(os.environ.get('SMS_SIMULATOR_RATE_PER_SECOND', 0)) or None,
+    'otp_code': os.environ.get('SMS_SIMULATOR_OTP_CODE', '123456'),
+}
+# Bounded in-process runner behind notification_service.utils.run_in_background:
+# worker threads, queue depth before falling back to Celery / backpressure,
+# and how long shutdown waits for queued work.
+BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', 4))
+BACKGROUND_QUEUE_SIZE = int(os.environ.get('BACKGROUND_QUEUE_SIZE', 100))
+BACKGROUND_SUBMIT_TIMEOUT = float(os.environ.get('BACKGROUND_SUBMIT_TIMEOUT', 2))
+BACKGROUND_DRAIN_TIMEOUT = float(os.environ.get('BACKGROUND_DRAIN_TIMEOUT', 20))
+# SMS outbox dispatcher: rows claimed per batch and delivery attempts before
+# a row is marked 'error'.
+SMS_OUTBOX_BATCH_SIZE = int(os.environ.get('SMS_OUTBOX_BATCH_SIZE', 200))
+SMS_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('SMS_OUTBOX_MAX_ATTEMPTS', 5))
+# Per-duty assignment notifications for the same user and chart are
+# coalesced for this many seconds into one SMS (0 sends each on commit).
+ASSIGNMENT_COALESCE_SECONDS = int(os.environ.get('ASSIGNMENT_COALESCE_SECONDS', 0 if 'test' in sys.argv else 60))
+# Retention windows in days per Notification.notification_type and per
+# SMSLog.reminder_type prefix; 'default' covers the rest and None keeps rows
+# forever. Expired rows are archived as gzipped NDJSON under
+# RETENTION_ARCHIVE_PREFIX in the default storage, then deleted.
+NOTIFICATION_RETENTION_DAYS = {
+    'default': 180,
+    'REMINDER': 60,
+    'ASSIGNMENT': 365,
+}
+SMSLOG_RETENTION_DAYS = {
+    'default': 365,
+    '1_HOUR': 90,
+    'DAILY': 90,
+}
+RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', 5000))
+RETENTION_ARCHIVE_PREFIX = os.environ.get('RETENTION_ARCHIVE_PREFIX', 'archives')
+# Monthly range partitions for notifications (Postgres only), set up with
+# `manage.py notification_partitions convert`. Expired months are dropped whole.
+NOTIFICATION_PARTITIONING = os.getenv('NOTIFICATION_PARTITIONING', 'False') == 'True'
+# Audit log entries older than this many days are archived the same way
+# (empty or 0 keeps them forever). AUDITLOG_PARTITIONING uses monthly partitions,
+# set up with `manage.py auditlog_partitions convert`.
+AUDITLOG_RETENTION_DAYS = int(os.environ.get('AUDITLOG_RETENTION_DAYS', 730) or 0) or None
+AUDITLOG_PARTITIONING = os.getenv('AUDITLOG_PARTITIONING', 'False') == 'True'
+# How long the audit log list caches its approximate total per filter.
+AUDITLOG_COUNT_CACHE_SECONDS = int(os.environ.get('AUDITLOG_COUNT_CACHE_SECONDS', 60))
 
 # Mobile API Token
 MOBILE_API_TOKEN = os.environ.get('MOBILE_API_TOKEN')
@@ -334,6 +404,10 @@ SIMPLE_JWT = {
     'TOKEN_USER_CLASS': None,
     'JTI_CLAIM': 'jti',
 }
+# How long token authentication and /me may serve a user's cached identity.
+# Entries are invalidated on User.save and role/permission changes; the TTL
+# only bounds changes made without signals (queryset updates, raw SQL).
+USER_IDENTITY_CACHE_SECONDS = int(os.environ.get('USER_IDENTITY_CACHE_SECONDS', 300))
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Bearer': {
@@ -378,6 +452,14 @@ if os.getenv('USE_INMEMORY_CHANNEL_LAYER') == 'True' or not os.getenv('REDIS_HOS
             "BACKEND": "channels.layers.InMemoryChannelLayer"
         }
     }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    # Presence lives in the cache; a per-process cache can't see sockets held
+    # by other processes, so broadcasts go to every user.
+    NOTIFICATION_PRESENCE_TRACKING = False
 else:
     CHANNEL_LAYERS = {
         'default': {
@@ -387,6 +469,14 @@ else:
             },
         },
     }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_URL', f"redis://{os.environ.get('REDIS_HOST', '127.0.0.1')}:6379/1"),
+        }
+    }
+    # Skip WebSocket pushes to users with no open NotificationConsumer.
+    NOTIFICATION_PRESENCE_TRACKING = True
 
 # Celery Configuration
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', f"redis://{os.environ.get('REDIS_HOST', '127.0.0.1')}:6379/0")
@@ -398,12 +488,35 @@ CELERY_RESULT_SERIALIZER = 'json'
 from celery.schedules import crontab
 
 CELERY_BEAT_SCHEDULE = {
-    'send-duty-reminders-every-1-minute': {
-        'task': 'notification_service.tasks.send_duty_reminders',
+    # Reminders are materialized as ScheduledReminder rows when duties, charts
+    # or office settings change; the poller only touches rows that are due.
+    'dispatch-due-reminders-every-1-minute': {
+        'task': 'notification_service.tasks.dispatch_due_reminders',
         'schedule': crontab(minute='*'),  # Every 1 minute
     },
-    'send-daily-duty-reminders-every-1-minute': {
-        'task': 'notification_service.tasks.send_daily_duty_reminders',
-        'schedule': crontab(minute='*'),  # Every 1 minute
+    'materialize-upcoming-reminders-hourly': {
+        'task': 'notification_service.tasks.materialize_upcoming_reminders',
+        'schedule': crontab(minute=5),  # Every hour, safety net for signal-less writes
+    },
+    # Sweeps the SMS outbox for retries and rows left pending by a restart.
+    'dispatch-sms-outbox-every-1-minute': {
+        'task': 'notification_service.tasks.dispatch_sms_outbox',
+        'schedule': crontab(minute='*'),
+    },
+    'flush-assignment-notifications-every-1-minute': {
+        'task': 'notification_service.tasks.flush_assignment_notifications',
+        'schedule': crontab(minute='*'),
+    },
+    'archive-expired-notifications-daily': {
+        'task': 'notification_service.tasks.archive_expired_notifications',
+        'schedule': crontab(hour=2, minute=30),
+    },
+    'archive-expired-audit-logs-daily': {
+        'task': 'auditlogs.tasks.archive_expired_audit_logs',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'sweep-otp-requests-every-15-minutes': {
+        'task': 'otp_service.tasks.sweep_otp_requests',
+        'schedule': crontab(minute='*/15'),
     },
 }
@@ -140,7 +140,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 from notification_service.signals import suppress_duty_notifications
-from notification_service.utils import send_bulk_assignment_notification
+from notification_service.utils import notify_chart_assignees
 
 
 class ScheduleView(viewsets.ModelViewSet):
@@ -615,14 +615,8 @@ class DutyChartViewSet(viewsets.ModelViewSet):
                         user_duties[d.user_id].append(d.date)
                 
                 if user_duties:
-                    def trigger_approval_sms():
-                        users = {u.id: u for u in User.objects.filter(id__in=user_duties.keys())}
-                        for u_id, dates in user_duties.items():
-                            target_user = users.get(u_id)
-                            if not target_user: continue
-                            send_bulk_assignment_notification([target_user], chart)
-                    
-                    transaction.on_commit(trigger_approval_sms)
+                    assignee_ids = list(user_duties.keys())
+                    transaction.on_commit(lambda: notify_chart_assignees(chart, assignee_ids))
 
                 # Notify pool members upon approval
                 pool_members = list(chart.pool_members.all())
@@ -1062,17 +1056,17 @@ class DutyViewSet(viewsets.ModelViewSet):
                             logger.info(f"Skipping bulk notifications for Chart {chart.id}: Status is {chart.status}")
                             return
 
+                        date_ranges = {}
                         for u_id, dates in assigned_data.items():
-                            target_user = users_map.get(u_id)
-                            if not target_user: continue
+                            if u_id not in users_map: continue
                             
                             dates.sort()
                             if len(dates) == 1:
-                                date_str = str(dates[0])
+                                date_ranges[u_id] = str(dates[0])
                             else:
-                                date_str = f"{dates[0]} to {dates[-1]}"
+                                date_ranges[u_id] = f"{dates[0]} to {dates[-1]}"
                             
-                            send_bulk_assignment_notification([target_user], chart, date_range_str=date_str)
+                        notify_chart_assignees(chart, date_ranges.keys(), date_ranges=date_ranges)
                     
                     transaction.on_commit(trigger_bulk_sms)
 
@@ -2548,7 +2542,7 @@ class DutyChartImportView(APIView):
                     # Send single SMS per employee after all duties are saved
                     # ONLY if the chart is APPROVED
                     if chart.status == 'approved':
-                        transaction.on_commit(lambda: send_bulk_assignment_notification(assigned_users, chart))
+                        transaction.on_commit(lambda: notify_chart_assignees(chart, [u.id for u in assigned_users]))
                     else:
                         logger.info(f"Skipping bulk notifications for imported Chart {chart.id}: Status is {chart.status}")
 
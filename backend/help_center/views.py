@@ -53,32 +53,25 @@ def _check_manage_permission(user):
 
 def _notify_document_upload(document):
     """
-    Notifies all active users on their dashboard that a new Help Center
-    document was uploaded. Runs in a background thread so the upload
-    request is not blocked by the fan-out.
+    Notifies all users on their dashboard that a new Help Center document
+    was uploaded, as a single broadcast notice rather than a row per user.
     """
-    def fan_out():
-        try:
-            from django.contrib.auth import get_user_model
-            from notification_service.utils import create_bulk_dashboard_notifications
-
-            User = get_user_model()
-            uploader = document.uploaded_by
-            uploader_name = getattr(uploader, 'full_name', None) or getattr(uploader, 'username', 'an administrator')
-            doc_type = document.get_document_type_display()
-
-            create_bulk_dashboard_notifications(
-                User.objects.filter(is_active=True),
-                title=f"New {doc_type} in Help Center",
-                message=f'"{document.title}" has been uploaded to the Help Center by {uploader_name}.',
-                notification_type='DOCUMENT',
-                link='/help-center'
-            )
-        except Exception as e:
-            logger.error(f"Failed to notify users about Help Center upload '{document.title}': {e}")
-
-    from notification_service.utils import run_in_background
-    run_in_background(fan_out)
+    try:
+        from notification_service.utils import create_broadcast_notice
+
+        uploader = document.uploaded_by
+        uploader_name = getattr(uploader, 'full_name', None) or getattr(uploader, 'username', 'an administrator')
+        doc_type = document.get_document_type_display()
+
+        create_broadcast_notice(
+            title=f"New {doc_type} in Help Center",
+            message=f'"{document.title}" has been uploaded to the Help Center by {uploader_name}.',
+            notification_type='DOCUMENT',
+            link='/help-center',
+            created_by=uploader
+        )
+    except Exception as e:
+        logger.error(f"Failed to notify users about Help Center upload '{document.title}': {e}")
 
 
 class HelpDocumentViewSet(viewsets.ModelViewSet):
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification, SMSLog
+from .models import Notification, BroadcastNotice, SMSLog, ScheduledReminder, AssignmentEvent
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
@@ -7,8 +7,26 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ('notification_type', 'is_read', 'created_at')
     search_fields = ('user__username', 'title', 'message')
 
+@admin.register(BroadcastNotice)
+class BroadcastNoticeAdmin(admin.ModelAdmin):
+    list_display = ('title', 'notification_type', 'created_by', 'created_at')
+    list_filter = ('notification_type', 'created_at')
+    search_fields = ('title', 'message')
+
 @admin.register(SMSLog)
 class SMSLogAdmin(admin.ModelAdmin):
-    list_display = ('phone', 'status', 'created_at')
+    list_display = ('phone', 'status', 'attempts', 'next_attempt_at', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('phone', 'message', 'response_raw')
+
+@admin.register(ScheduledReminder)
+class ScheduledReminderAdmin(admin.ModelAdmin):
+    list_display = ('duty', 'user', 'reminder_type', 'due_at', 'status')
+    list_filter = ('reminder_type', 'status')
+    raw_id_fields = ('duty', 'user')
+
+@admin.register(AssignmentEvent)
+class AssignmentEventAdmin(admin.ModelAdmin):
+    list_display = ('duty', 'user', 'duty_chart', 'due_at', 'status')
+    list_filter = ('status',)
+    raw_id_fields = ('duty', 'user', 'duty_chart')
@@ -6,3 +6,5 @@ class NotificationServiceConfig(AppConfig):
 
     def ready(self):
         import notification_service.signals
+        from .background import install_shutdown_hooks
+        install_shutdown_hooks()
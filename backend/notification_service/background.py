@@ -0,0 +1,258 @@
+"""
+Process-wide bounded runner for fire-and-forget work.
+
+run_in_background used to start one daemon thread per call, so a burst
+(approving a large chart, a Help Center upload) could spawn hundreds of
+threads, each opening its own Postgres connection. Instead, a fixed set of
+long-lived worker threads consumes a bounded queue:
+
+- worker threads keep their DB connection between tasks (subject to
+  CONN_MAX_AGE and health checks, exactly like request threads),
+- when the queue is full the caller either hands the work to Celery (if it
+  supplied a fallback) or waits briefly and, failing that, runs the task
+  itself, so load turns into backpressure instead of unbounded threads,
+- per-task timing and error counters are kept for diagnostics,
+- on SIGTERM or interpreter exit queued work is drained before the
+  process goes away.
+"""
+import atexit
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class TaskStats:
+    """Call counts, errors and timings (milliseconds) keyed by task name."""
+
+    def __init__(self):
+        self._stats = {}
+        self._counts = {'submitted': 0, 'fallback': 0, 'caller_ran': 0}
+        self._lock = threading.Lock()
+
+    def count(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def record(self, name, elapsed_ms, failed):
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            entry['calls'] += 1
+            entry['errors'] += int(failed)
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+    def snapshot(self):
+        with self._lock:
+            tasks = {
+                name: {
+                    'calls': s['calls'],
+                    'errors': s['errors'],
+                    'avg_ms': round(s['total_ms'] / s['calls'], 1),
+                    'max_ms': round(s['max_ms'], 1),
+                }
+                for name, s in self._stats.items()
+            }
+            return {**self._counts, 'tasks': tasks}
+
+
+class BackgroundRunner:
+    def __init__(self, workers=4, queue_size=100, submit_timeout=2.0):
+        self.workers = workers
+        self.submit_timeout = submit_timeout
+        self.stats = TaskStats()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            workers=getattr(settings, 'BACKGROUND_WORKERS', 4),
+            queue_size=getattr(settings, 'BACKGROUND_QUEUE_SIZE', 100),
+            submit_timeout=getattr(settings, 'BACKGROUND_SUBMIT_TIMEOUT', 2.0),
+        )
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work, name=f"background-{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                name, task = item
+                close_old_connections()
+                self._run(name, task)
+                close_old_connections()
+            finally:
+                self._queue.task_done()
+
+    def _run(self, name, task):
+        started = time.monotonic()
+        failed = False
+        try:
+            task()
+        except Exception:
+            failed = True
+            logger.exception(f"Background task {name} failed")
+        finally:
+            self.stats.record(name, (time.monotonic() - started) * 1000, failed)
+
+    def submit(self, task, fallback=None, name=None):
+        """
+        Queues task() for a worker thread. When the queue is full, fallback()
+        is called instead if given (typically a Celery .delay()); otherwise
+        the caller waits up to submit_timeout for room and then runs the task
+        itself.
+        """
+        name = name or getattr(task, '__qualname__', repr(task))
+        self.stats.count('submitted')
+        if self._closed:
+            self.stats.count('caller_ran')
+            self._run(name, task)
+            return
+        self._start_workers()
+        try:
+            self._queue.put_nowait((name, task))
+            return
+        except queue.Full:
+            pass
+
+        if fallback is not None:
+            try:
+                fallback()
+                self.stats.count('fallback')
+                logger.warning(f"Background queue full, handed {name} to Celery")
+                return
+            except Exception as e:
+                logger.warning(f"Celery fallback for {name} failed, queueing locally: {e}")
+
+        try:
+            self._queue.put((name, task), timeout=self.submit_timeout)
+        except queue.Full:
+            logger.warning(f"Background queue full, running {name} in the caller")
+            self.stats.count('caller_ran')
+            self._run(name, task)
+
+    def drain(self, timeout=None):
+        """
+        Stops accepting work, lets the workers finish what is queued and
+        waits up to `timeout` seconds for them. Later submits run inline.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+        try:
+            for _ in threads:
+                # Waits while the queue is full; the workers are still consuming.
+                self._queue.put(_STOP, timeout=remaining())
+        except queue.Full:
+            pass
+        for thread in threads:
+            thread.join(remaining())
+        pending = self._queue.qsize()
+        if pending:
+            logger.warning(f"Background runner stopped with {pending} queued tasks not run")
+        logger.info(f"Background runner drained: {self.stats.snapshot()}")
+
+    def wait_idle(self):
+        """Blocks until every task queued so far has finished."""
+        self._queue.join()
+
+    def snapshot(self):
+        return {**self.stats.snapshot(), 'queue_depth': self.queue_depth, 'workers': len(self._threads)}
+
+
+_runner = None
+_runner_lock = threading.Lock()
+_hooks_installed = False
+
+
+def _drain_timeout():
+    return getattr(settings, 'BACKGROUND_DRAIN_TIMEOUT', 20)
+
+
+def install_shutdown_hooks():
+    """
+    Drains the runner (if one was started) at exit and on SIGTERM, chaining
+    to the previous SIGTERM handler. Called from AppConfig.ready(), which runs
+    on the main thread: signal handlers cannot be installed from the worker
+    threads (Daphne, thread pools) that usually create the runner.
+    """
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    _hooks_installed = True
+    atexit.register(lambda: _runner and _runner.drain(_drain_timeout()))
+
+    if threading.current_thread() is not threading.main_thread():
+        logger.warning("Background runner shutdown hooks installed off the main thread; SIGTERM will not drain it")
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def on_sigterm(signum, frame):
+        if _runner is not None:
+            _runner.drain(_drain_timeout())
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    try:
+        signal.signal(signal.SIGTERM, on_sigterm)
+    except ValueError:
+        pass
+
+
+def get_background_runner():
+    """Returns the process-wide runner, creating it on first use."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = BackgroundRunner.from_settings()
+    return _runner
+
+
+def submit(task, fallback=None, name=None):
+    """
+    Runs task() on the shared background runner. Runs synchronously under
+    tests, where worker threads would not see the in-memory test database.
+    """
+    if 'test' in sys.argv:
+        task()
+        return
+    get_background_runner().submit(task, fallback=fallback, name=name)
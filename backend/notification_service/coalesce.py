@@ -0,0 +1,184 @@
+"""
+Coalescing of per-duty assignment notifications.
+
+Filling a chart cell by cell saves duties one at a time and used to send one
+SMS and one dashboard notification per duty. Now the post_save signal only
+records an AssignmentEvent. Events for the same (user, duty_chart) share the
+due_at of the first one, ASSIGNMENT_COALESCE_SECONDS after it; once that has
+passed they are announced together in a single message covering the dates,
+worded like the chart-level assignment SMS. A window of 0 announces on
+commit, as before.
+
+A flush is scheduled with Celery when a window opens, and the every-minute
+sweep picks up anything a lost task left behind.
+"""
+import logging
+import sys
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import AssignmentEvent, SMSLog
+from .outbox import wake_sms_dispatcher
+from .utils import chart_assignment_message, create_personalized_dashboard_notifications
+
+try:
+    import nepali_datetime
+except ImportError:
+    nepali_datetime = None
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+
+def coalesce_window():
+    return timedelta(seconds=getattr(settings, 'ASSIGNMENT_COALESCE_SECONDS', 60))
+
+
+def buffer_assignment(duty):
+    """
+    Records that duty.user was assigned duty. Returns False if this
+    assignment was already recorded (the duty was only re-saved).
+    """
+    now = timezone.now()
+    window = coalesce_window()
+    open_window = (
+        AssignmentEvent.objects.filter(user_id=duty.user_id, duty_chart_id=duty.duty_chart_id, status='buffered')
+        .order_by('due_at')
+        .values_list('due_at', flat=True)
+        .first()
+    )
+    try:
+        with transaction.atomic():
+            AssignmentEvent.objects.create(
+                user_id=duty.user_id,
+                duty=duty,
+                duty_chart_id=duty.duty_chart_id,
+                due_at=open_window or now + window,
+            )
+    except IntegrityError:
+        logger.debug(f"Assignment of duty {duty.id} to user {duty.user_id} already recorded")
+        return False
+
+    if not window:
+        flush_due_assignments(now)
+    elif open_window is None:
+        _schedule_flush(window)
+    return True
+
+
+def _schedule_flush(window):
+    if 'test' in sys.argv:
+        return
+    try:
+        from .tasks import flush_assignment_notifications
+        flush_assignment_notifications.apply_async(countdown=window.total_seconds() + 1)
+    except Exception as e:
+        logger.warning(f"Could not schedule assignment flush, the periodic sweep will send it: {e}")
+
+
+def _bs_date(date):
+    try:
+        return nepali_datetime.date.from_datetime_date(date).strftime("%Y-%m-%d")
+    except Exception:
+        return str(date)
+
+
+def assignment_message(user, duties):
+    """One SMS for a user's coalesced duties in a chart, oldest first."""
+    full_name = getattr(user, 'full_name', user.username)
+    first = duties[0]
+    chart_name = first.duty_chart.name if first.duty_chart and first.duty_chart.name else "Duty Chart"
+    office_name = first.office.name if first.office else "Unknown Office"
+
+    if len(duties) == 1:
+        duty_name = first.schedule.name if first.schedule else "Duty"
+        return f'Dear {full_name}, You have been assigned to duty chart "{chart_name}" at "{office_name}" for the "{duty_name}" on {_bs_date(first.date)}. Please visit https://dutychart.ntc.net.np for the detail.'
+
+    shift_names = sorted({duty.schedule.name for duty in duties if duty.schedule and duty.schedule.name})
+    shift_str = ", ".join(shift_names) if shift_names else "Duty"
+    first_date, last_date = _bs_date(first.date), _bs_date(duties[-1].date)
+    period = first_date if first_date == last_date else f"{first_date} to {last_date}"
+    return chart_assignment_message(full_name, chart_name, shift_str, office_name, period)
+
+
+def _announceable(event):
+    duty = event.duty
+    if duty.user_id != event.user_id or not duty.schedule:
+        return False
+    return not duty.duty_chart or duty.duty_chart.status == 'approved'
+
+
+def flush_due_assignments(now=None, limit=FLUSH_BATCH_SIZE):
+    """
+    Announces every buffered assignment whose window has closed: one
+    dashboard notification and at most one SMS per (user, duty_chart).
+    Returns the number of messages queued.
+    """
+    now = now or timezone.now()
+    queued = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                AssignmentEvent.objects.select_for_update(skip_locked=True)
+                .filter(status='buffered', due_at__lte=now)
+                .order_by('due_at')
+                .values_list('id', flat=True)[:limit]
+            )
+            if not ids:
+                break
+            events = list(
+                AssignmentEvent.objects.filter(id__in=ids).select_related(
+                    'user', 'duty__schedule', 'duty__office', 'duty__duty_chart'
+                )
+            )
+            queued += _announce(events)
+        if len(ids) < limit:
+            break
+    return queued
+
+
+def _announce(events):
+    groups, dropped = {}, []
+    for event in events:
+        if _announceable(event):
+            groups.setdefault((event.user_id, event.duty_chart_id), []).append(event)
+        else:
+            # Reassigned, unscheduled or the chart left 'approved' during the window.
+            dropped.append(event.id)
+
+    notifications, sms_logs = [], []
+    for group in groups.values():
+        group.sort(key=lambda e: (e.duty.date, e.duty_id))
+        user = group[0].user
+        duties = [event.duty for event in group]
+        message = assignment_message(user, duties)
+        notifications.append((user, "New Duty Assignment", message))
+        if getattr(user, 'phone_number', None):
+            # Anchored to the first duty so the (user, duty, reminder_type)
+            # constraint still guards against a double send.
+            sms_logs.append(SMSLog(
+                user=user,
+                duty=duties[0],
+                phone=user.phone_number,
+                message=message,
+                reminder_type='ASSIGNMENT',
+                status='pending'
+            ))
+        else:
+            logger.warning(f"User {user.username} has no phone number for SMS notification.")
+
+    create_personalized_dashboard_notifications(notifications, notification_type='ASSIGNMENT', link='/my-duties')
+    if sms_logs:
+        SMSLog.objects.bulk_create(sms_logs, batch_size=500, ignore_conflicts=True)
+        wake_sms_dispatcher()
+
+    sent = [event.id for group in groups.values() for event in group]
+    if sent:
+        AssignmentEvent.objects.filter(id__in=sent).update(status='sent')
+    if dropped:
+        AssignmentEvent.objects.filter(id__in=dropped).update(status='dropped')
+    return len(notifications)
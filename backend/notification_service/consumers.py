@@ -1,6 +1,12 @@
 import json
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .counters import unread_total
+from .presence import user_connected, user_disconnected
+from .utils import BROADCAST_GROUP
+
 class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope["user"]
@@ -16,8 +22,14 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.group_name,
                 self.channel_name
             )
+            # System-wide notices are sent once to this shared group
+            await self.channel_layer.group_add(BROADCAST_GROUP, self.channel_name)
             
             await self.accept()
+            await sync_to_async(user_connected)(self.user.id)
+            # Clients rely on pushes instead of polling unread_count.
+            count = await database_sync_to_async(unread_total)(self.user)
+            await self.send(text_data=json.dumps({"type": "unread_count", "count": count}))
 
     async def disconnect(self, close_code):
         # Leave room group
@@ -26,6 +38,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.group_name,
                 self.channel_name
             )
+            await self.channel_layer.group_discard(BROADCAST_GROUP, self.channel_name)
+            await sync_to_async(user_disconnected)(self.user.id)
 
     # Receive message from room group
     async def notification_message(self, event):
@@ -33,3 +47,6 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
         # Send message to WebSocket
         await self.send(text_data=json.dumps(message))
+
+    async def unread_count_message(self, event):
+        await self.send(text_data=json.dumps({"type": "unread_count", "count": event["count"]}))
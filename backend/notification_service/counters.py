@@ -0,0 +1,138 @@
+"""
+Unread notification counters pushed over the notification WebSocket.
+
+Personal unread counts live in NotificationCounter and are adjusted with
+atomic F() updates in the same transaction that creates or reads
+notifications. Unread broadcast notices are few and are added on top when
+a total is needed. After commit the new totals are pushed to the affected
+users' sockets (skipping users with none, see presence.py), and
+NotificationConsumer sends the current total once on connect, so clients
+never have to poll unread_count.
+"""
+import logging
+from collections import Counter
+
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import NotificationCounter, BroadcastNotice, BroadcastNoticeRead
+from .presence import online_user_ids
+
+logger = logging.getLogger(__name__)
+
+
+def _ensure_counters(user_ids):
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+        batch_size=1000
+    )
+
+
+def increment_unread(user_ids):
+    """
+    Adds one unread notification per occurrence of each user id and pushes
+    the new totals after commit.
+    """
+    per_user = Counter(user_ids)
+    if not per_user:
+        return
+    _ensure_counters(per_user)
+    by_amount = {}
+    for user_id, amount in per_user.items():
+        by_amount.setdefault(amount, []).append(user_id)
+    # Bulk fan-outs give every user the same amount: usually one UPDATE.
+    for amount, ids in by_amount.items():
+        NotificationCounter.objects.filter(user_id__in=ids).update(unread=F('unread') + amount)
+    push_unread_counts(per_user)
+
+
+def decrement_unread(user_id, amount=1):
+    NotificationCounter.objects.filter(user_id=user_id).update(unread=Greatest(F('unread') - amount, 0))
+    push_unread_counts([user_id])
+
+
+def decrement_unread_many(per_user):
+    """Takes {user_id: amount} unread notifications away, e.g. after archiving."""
+    per_user = {user_id: amount for user_id, amount in per_user.items() if amount}
+    if not per_user:
+        return
+    by_amount = {}
+    for user_id, amount in per_user.items():
+        by_amount.setdefault(amount, []).append(user_id)
+    for amount, ids in by_amount.items():
+        NotificationCounter.objects.filter(user_id__in=ids).update(unread=Greatest(F('unread') - amount, 0))
+    push_unread_counts(per_user)
+
+
+def reset_unread(user_id):
+    NotificationCounter.objects.filter(user_id=user_id).update(unread=0)
+    push_unread_counts([user_id])
+
+
+def unread_totals(users):
+    """
+    Returns {user_id: personal unread + unread visible broadcasts} for the
+    given users in three queries regardless of how many users there are.
+    """
+    users = list(users)
+    if not users:
+        return {}
+    user_ids = [u.id for u in users]
+    personal = dict(
+        NotificationCounter.objects.filter(user_id__in=user_ids).values_list('user_id', 'unread')
+    )
+
+    joined = [u.date_joined for u in users if getattr(u, 'date_joined', None)]
+    notices = BroadcastNotice.objects.all()
+    if joined and len(joined) == len(users):
+        notices = notices.filter(created_at__gte=min(joined))
+    notices = list(notices.values_list('id', 'created_at'))
+    read = set()
+    if notices:
+        read = set(
+            BroadcastNoticeRead.objects.filter(
+                user_id__in=user_ids, notice_id__in=[notice_id for notice_id, _ in notices]
+            ).values_list('user_id', 'notice_id')
+        )
+
+    totals = {}
+    for user in users:
+        date_joined = getattr(user, 'date_joined', None)
+        broadcasts = sum(
+            1 for notice_id, created_at in notices
+            if (date_joined is None or created_at >= date_joined) and (user.id, notice_id) not in read
+        )
+        totals[user.id] = personal.get(user.id, 0) + broadcasts
+    return totals
+
+
+def unread_total(user):
+    return unread_totals([user])[user.id]
+
+
+def push_unread_counts(user_ids):
+    """Pushes fresh unread totals to the users' sockets once the transaction commits."""
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: _push(user_ids))
+
+
+def _push(user_ids):
+    from django.contrib.auth import get_user_model
+    from .utils import send_group_messages
+    try:
+        if not get_channel_layer():
+            return
+        online = online_user_ids(user_ids)
+        if not online:
+            return
+        users = get_user_model().objects.filter(id__in=online).only('id', 'date_joined')
+        send_group_messages([
+            (f"user_{user_id}", {"type": "unread_count_message", "count": count})
+            for user_id, count in unread_totals(users).items()
+        ])
+    except Exception as e:
+        logger.error(f"Failed to push unread counts to {len(user_ids)} users: {e}")
@@ -0,0 +1,91 @@
+"""
+A user's notification feed: their personal Notification rows merged with
+the system-wide BroadcastNotice rows they can see.
+
+A broadcast is visible to users who joined before it was posted, and it
+counts as unread until the user has a BroadcastNoticeRead row for it.
+"""
+from django.db.models import BooleanField, Exists, OuterRef, Q, Value
+
+from .models import Notification, BroadcastNotice, BroadcastNoticeRead
+
+# Annotated columns (is_read for broadcasts, is_broadcast) must come last:
+# Django emits annotations after model fields, and UNION matches by position.
+FEED_FIELDS = ('id', 'title', 'message', 'notification_type', 'link', 'created_at', 'is_read', 'is_broadcast')
+
+
+def visible_broadcasts(user):
+    qs = BroadcastNotice.objects.all()
+    if getattr(user, 'date_joined', None):
+        qs = qs.filter(created_at__gte=user.date_joined)
+    return qs
+
+
+def unread_broadcasts(user):
+    return visible_broadcasts(user).exclude(reads__user=user)
+
+
+def _after(position, is_broadcast):
+    """
+    Keyset filter for one side of the feed: rows that sort after `position`
+    (created_at, is_broadcast, id) in newest-first order.
+    """
+    created_at, position_is_broadcast, position_id = position
+    if is_broadcast == position_is_broadcast:
+        return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=position_id)
+    # Broadcasts sort before personal rows with the same timestamp.
+    if is_broadcast:
+        return Q(created_at__lt=created_at)
+    return Q(created_at__lte=created_at)
+
+
+def notification_feed(user, after=None, unread_only=False):
+    """
+    Personal notifications and visible broadcasts as one queryset of
+    FEED_FIELDS tuples, newest first on (created_at, is_broadcast, id).
+
+    `after` is the (created_at, is_broadcast, id) of the last row already
+    seen; the keyset filter is applied to each side before the UNION so
+    every page is an index range scan on (user, created_at) no matter how
+    deep it is. Only the feed columns are selected.
+    """
+    personal = Notification.objects.filter(user=user)
+    if unread_only:
+        personal = personal.filter(is_read=False)
+    broadcasts = unread_broadcasts(user) if unread_only else visible_broadcasts(user)
+    if after is not None:
+        personal = personal.filter(_after(after, False))
+        broadcasts = broadcasts.filter(_after(after, True))
+
+    personal = (
+        personal
+        .annotate(is_broadcast=Value(False, output_field=BooleanField()))
+        .values_list(*FEED_FIELDS)
+        .order_by()
+    )
+    broadcasts = (
+        broadcasts
+        .annotate(
+            is_read=Exists(BroadcastNoticeRead.objects.filter(notice=OuterRef('pk'), user=user)),
+            is_broadcast=Value(True, output_field=BooleanField()),
+        )
+        .values_list(*FEED_FIELDS)
+        .order_by()
+    )
+    return personal.union(broadcasts, all=True).order_by('-created_at', '-is_broadcast', '-id')
+
+
+def feed_position(row):
+    """The keyset position of a feed row dict, for use as `after`."""
+    return row['created_at'], row['is_broadcast'], row['id']
+
+
+def feed_rows(rows):
+    return [dict(zip(FEED_FIELDS, row)) for row in rows]
+
+
+def mark_broadcasts_read(user, notices):
+    BroadcastNoticeRead.objects.bulk_create(
+        [BroadcastNoticeRead(notice=notice, user=user) for notice in notices],
+        ignore_conflicts=True,
+    )
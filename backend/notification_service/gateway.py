@@ -0,0 +1,446 @@
+"""
+Client for the NTC SMS gateway.
+
+Every SMS path (assignment, bulk, pool, status and reminders) goes through
+one process-wide client that:
+
+- reuses keep-alive connections from a bounded requests.Session pool,
+- throttles sends with a token bucket sized to the gateway's capacity,
+- short-circuits with a circuit breaker while the gateway keeps failing,
+- records per-call latency so throughput problems are visible.
+
+The client built from settings keeps the bucket, the breaker and the metrics
+in the default cache, so every web process and Celery worker shares one send
+rate, one view of the gateway's health and one set of figures. Clients built
+directly keep them in process (tests, one-off scripts).
+
+SMS_GATEWAY_BACKEND = 'simulated' swaps the network for the local
+simulator (see simulator.py) without changing any of the above.
+
+Credentials are only ever sent to the gateway, never logged.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.cache import cache
+
+from .ratelimit import take_token
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SMS_URL = "http://10.26.192.122:42399/updatedsmssender-1.0-SNAPSHOT/updatedsmssender/"
+
+DELIVERY_SENT = 'sent'
+DELIVERY_FAILED = 'failed'
+DELIVERY_RETRY = 'retry'
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens are added per second up to
+    `capacity`. acquire() blocks until a token is available or the timeout
+    elapses.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds, then lets a single trial call through
+    (half-open). A success closes it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return self.CLOSED
+        if now - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Gives back a half-open trial slot that ended without a call."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket whose tokens live in the default cache (see ratelimit.py), so
+    all processes draw from one bucket. Falls back to a process-local bucket
+    while the cache is unreachable.
+    """
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = int(capacity)
+        self._fallback = TokenBucket(rate, capacity)
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                allowed, wait_ms = take_token(self.name, self.capacity, 1000 / self.rate)
+            except Exception as e:
+                logger.warning(f"Shared SMS rate limiter unavailable, limiting per process: {e}")
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                return self._fallback.acquire(timeout=remaining)
+            if allowed:
+                return True
+            wait = wait_ms / 1000
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class SharedCircuitBreaker:
+    """
+    CircuitBreaker whose failure count, open time and half-open trial slot
+    live in the default cache, so one process's failures open the circuit for
+    all of them and only one process sends the trial call. The trial slot
+    expires after `reset_timeout` in case its holder dies mid-call. While the
+    cache is unreachable the circuit is treated as closed.
+    """
+
+    CLOSED = CircuitBreaker.CLOSED
+    OPEN = CircuitBreaker.OPEN
+    HALF_OPEN = CircuitBreaker.HALF_OPEN
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures_key = f'{name}:failures'
+        self._opened_key = f'{name}:opened-at'
+        self._trial_key = f'{name}:trial'
+
+    @property
+    def state(self):
+        try:
+            opened_at = cache.get(self._opened_key)
+        except Exception:
+            return self.CLOSED
+        if opened_at is None:
+            return self.CLOSED
+        if time.time() - opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            try:
+                return cache.add(self._trial_key, 1, timeout=self.reset_timeout)
+            except Exception:
+                return True
+        return False
+
+    def release(self):
+        try:
+            cache.delete(self._trial_key)
+        except Exception:
+            pass
+
+    def record_success(self):
+        try:
+            cache.delete_many([self._failures_key, self._opened_key, self._trial_key])
+        except Exception as e:
+            logger.warning(f"Could not reset shared SMS circuit breaker: {e}")
+
+    def record_failure(self):
+        try:
+            cache.add(self._failures_key, 0, timeout=None)
+            failures = cache.incr(self._failures_key)
+            cache.delete(self._trial_key)
+            if failures >= self.failure_threshold or cache.get(self._opened_key) is not None:
+                cache.set(self._opened_key, time.time(), timeout=None)
+        except Exception as e:
+            logger.warning(f"Could not record failure on shared SMS circuit breaker: {e}")
+
+
+class GatewayMetrics:
+    """Counters and a rolling window of call latencies (milliseconds)."""
+
+    def __init__(self, window=1000):
+        self._latencies = deque(maxlen=window)
+        self._counts = {'sent': 0, 'failed': 0, 'error': 0, 'rejected': 0, 'throttled': 0}
+        self._lock = threading.Lock()
+
+    def record(self, outcome, latency_ms=None):
+        with self._lock:
+            self._counts[outcome] = self._counts.get(outcome, 0) + 1
+            if latency_ms is not None:
+                self._latencies.append(latency_ms)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self._counts)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 1)
+
+        return {
+            **counts,
+            'latency_ms': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+        }
+
+
+class SharedGatewayMetrics:
+    """
+    GatewayMetrics kept in the default cache so the figures cover every
+    process that sends. Latencies are counted in fixed buckets; the reported
+    percentiles are the upper bound (milliseconds) of the bucket they fall in.
+    """
+    OUTCOMES = ('sent', 'failed', 'error', 'rejected', 'throttled')
+    LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, name):
+        self.name = name
+
+    def _incr(self, key):
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+    def record(self, outcome, latency_ms=None):
+        try:
+            self._incr(f'{self.name}:count:{outcome}')
+            if latency_ms is not None:
+                bound = next((b for b in self.LATENCY_BUCKETS_MS if latency_ms <= b), self.LATENCY_BUCKETS_MS[-1])
+                self._incr(f'{self.name}:latency:{bound}')
+        except Exception as e:
+            logger.warning(f"Could not record SMS gateway metrics: {e}")
+
+    def snapshot(self):
+        count_keys = {f'{self.name}:count:{outcome}': outcome for outcome in self.OUTCOMES}
+        latency_keys = {f'{self.name}:latency:{bound}': bound for bound in self.LATENCY_BUCKETS_MS}
+        values = cache.get_many([*count_keys, *latency_keys])
+        histogram = [(bound, values.get(key, 0)) for key, bound in latency_keys.items()]
+        total = sum(count for _, count in histogram)
+
+        def percentile(p):
+            if not total:
+                return None
+            seen = 0
+            for bound, count in histogram:
+                seen += count
+                if seen > total * p:
+                    return bound
+            return self.LATENCY_BUCKETS_MS[-1]
+
+        return {
+            **{outcome: values.get(key, 0) for key, outcome in count_keys.items()},
+            'latency_ms': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+        }
+
+
+class SMSGatewayClient:
+    def __init__(self, base_url, username, password, system_id, pool_size=10,
+                 rate_per_second=10, burst=20, timeout=10,
+                 failure_threshold=5, reset_timeout=30, acquire_timeout=30, shared_state=False):
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.system_id = system_id
+        self.timeout = timeout
+        self.acquire_timeout = acquire_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        if shared_state:
+            self.rate_limiter = SharedTokenBucket('sms-gateway:bucket', rate_per_second, burst)
+            self.circuit = SharedCircuitBreaker('sms-gateway:circuit', failure_threshold, reset_timeout)
+            self.metrics = SharedGatewayMetrics('sms-gateway:metrics')
+        else:
+            self.rate_limiter = TokenBucket(rate_per_second, burst)
+            self.circuit = CircuitBreaker(failure_threshold, reset_timeout)
+            self.metrics = GatewayMetrics()
+
+    @classmethod
+    def from_settings(cls):
+        from .simulator import simulation_enabled, mount_simulator
+        client = cls(
+            base_url=getattr(settings, "NTC_SMS_URL", DEFAULT_SMS_URL),
+            username=getattr(settings, "NTC_SMS_USERNAME", "NtcSmsSender"),
+            password=getattr(settings, "NTC_SMS_PASSWORD", ""),
+            system_id=getattr(settings, "NTC_SMS_SYSTEM_ID", "1"),
+            pool_size=getattr(settings, "NTC_SMS_POOL_SIZE", 10),
+            rate_per_second=getattr(settings, "NTC_SMS_RATE_PER_SECOND", 10),
+            burst=getattr(settings, "NTC_SMS_BURST", 20),
+            timeout=getattr(settings, "NTC_SMS_TIMEOUT", 10),
+            failure_threshold=getattr(settings, "NTC_SMS_CIRCUIT_FAILURE_THRESHOLD", 5),
+            reset_timeout=getattr(settings, "NTC_SMS_CIRCUIT_RESET_SECONDS", 30),
+            shared_state=True,
+        )
+        if simulation_enabled():
+            mount_simulator(client.session)
+        return client
+
+    def deliver(self, phone, message):
+        """
+        Sends one SMS and classifies the outcome. Returns (status, response_text)
+        where status is one of:
+
+        - DELIVERY_SENT: accepted by the gateway,
+        - DELIVERY_FAILED: rejected by the gateway (retrying will not help),
+        - DELIVERY_RETRY: transient (network error, 5xx, circuit open, throttled).
+
+        Never raises for gateway or network failures.
+        """
+        if not self.circuit.allow():
+            self.metrics.record('rejected')
+            return DELIVERY_RETRY, "Gateway circuit open: SMS gateway is failing, send skipped."
+
+        if not self.rate_limiter.acquire(timeout=self.acquire_timeout):
+            # Not a gateway failure: hand back any half-open trial slot.
+            self.circuit.release()
+            self.metrics.record('throttled')
+            return DELIVERY_RETRY, "Gateway rate limit: timed out waiting for send capacity."
+
+        params = {
+            "username": self.username,
+            "password": self.password,
+            "cellNo": phone,
+            "message": message,
+            "encoding": "E",
+            "systemId": self.system_id,
+        }
+        started = time.monotonic()
+        try:
+            response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+        except Exception as e:
+            latency_ms = (time.monotonic() - started) * 1000
+            self.circuit.record_failure()
+            self.metrics.record('error', latency_ms)
+            logger.warning(f"SMS gateway error for {phone} after {latency_ms:.0f}ms: {e}")
+            return DELIVERY_RETRY, str(e)
+
+        latency_ms = (time.monotonic() - started) * 1000
+        # NTC Gateway returns '0' for success. Other codes (like -33) are failures.
+        if response.status_code == 200 and response.text.strip() == "0":
+            self.circuit.record_success()
+            self.metrics.record('sent', latency_ms)
+            logger.debug(f"SMS gateway accepted message for {phone} in {latency_ms:.0f}ms")
+            return DELIVERY_SENT, response.text
+
+        if response.status_code >= 500:
+            self.circuit.record_failure()
+            self.metrics.record('error', latency_ms)
+            logger.warning(f"SMS gateway unavailable for {phone} (HTTP {response.status_code}) in {latency_ms:.0f}ms")
+            return DELIVERY_RETRY, f"HTTP {response.status_code}: {response.text}"
+
+        # The gateway answered; a rejected message is not an outage.
+        self.circuit.record_success()
+        self.metrics.record('failed', latency_ms)
+        logger.warning(f"SMS gateway rejected message for {phone} (HTTP {response.status_code}) in {latency_ms:.0f}ms")
+        if response.status_code == 200:
+            return DELIVERY_FAILED, f"Gateway Error: {response.text}"
+        return DELIVERY_FAILED, f"HTTP {response.status_code}: {response.text}"
+
+    def send(self, phone, message):
+        """
+        Sends one SMS. Returns (success: bool, response_text: str); never
+        raises for gateway or network failures.
+        """
+        status, response_text = self.deliver(phone, message)
+        return status == DELIVERY_SENT, response_text
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sms_gateway():
+    """Returns the process-wide SMS gateway client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SMSGatewayClient.from_settings()
+    return _client
+
+
+def reset_sms_gateway():
+    """Drops the shared client so the next call picks up changed settings."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.session.close()
+        _client = None
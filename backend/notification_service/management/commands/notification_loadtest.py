@@ -0,0 +1,264 @@
+import json
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.utils import timezone
+
+from duties.models import Duty, DutyChart, Schedule
+from org.models import WorkingOffice
+from notification_service.background import get_background_runner
+from notification_service.gateway import get_sms_gateway, reset_sms_gateway
+from notification_service.models import Notification, OfficeNotificationSetting, ScheduledReminder, SMSLog
+from notification_service.outbox import dispatch_sms_outbox
+from notification_service.scheduler import dispatch_due_reminders
+
+User = get_user_model()
+
+
+class QueryCounter:
+    """Counts queries on every DB connection, including background worker threads."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def _wrap(self, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def install(self):
+        connection_created.connect(self._wrap, weak=False)
+        for conn in connections.all():
+            self._wrap(conn)
+
+    def uninstall(self):
+        connection_created.disconnect(self._wrap)
+        for conn in connections.all():
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None}
+    return {
+        f"p{int(p * 100)}": round(values[min(len(values) - 1, int(len(values) * p))], 1)
+        for p in (0.50, 0.95, 0.99)
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the notification pipeline: generates offices, users and charts, then measures '
+        'chart approval, bulk upsert and reminder dispatch against the simulated SMS gateway'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offices', type=int, default=5)
+        parser.add_argument('--users-per-office', type=int, default=20)
+        parser.add_argument('--days', type=int, default=14, help='Duty days per chart')
+        parser.add_argument('--upsert-days', type=int, default=7, help='Extra days added through bulk upsert')
+        parser.add_argument('--real-gateway', action='store_true',
+                            help='Use the configured gateway instead of forcing the simulator')
+        parser.add_argument('--use-broker', action='store_true',
+                            help='Leave Celery tasks to the workers instead of running them in-process')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated data')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        from config.celery import app
+
+        # Requests go through the API test client, which calls itself 'testserver'.
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if options['real_gateway']:
+            self.stdout.write(self.style.WARNING('Sending through the configured gateway: real SMS may go out.'))
+        else:
+            overrides['SMS_GATEWAY_BACKEND'] = 'simulated'
+
+        eager = app.conf.task_always_eager
+        app.conf.task_always_eager = not options['use_broker']
+        counter = QueryCounter()
+        stamp = timezone.localtime().strftime('%Y%m%d%H%M%S')
+        try:
+            with override_settings(**overrides):
+                reset_sms_gateway()
+                counter.install()
+                report = self.run(options, stamp, counter)
+        finally:
+            counter.uninstall()
+            app.conf.task_always_eager = eager
+            reset_sms_gateway()
+            if not options['keep']:
+                self.cleanup(stamp)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, default=str))
+            return
+        self.print_report(report)
+
+    def run(self, options, stamp, counter):
+        data = self.generate(options, stamp)
+        report = {'dataset': {
+            'offices': len(data['offices']),
+            'users': len(data['users']),
+            'duties': Duty.objects.filter(duty_chart__in=data['charts']).count(),
+        }}
+
+        from rest_framework.test import APIClient
+        client = APIClient()
+        client.force_authenticate(data['admin'])
+
+        report['approve'] = self.measure(counter, [
+            lambda chart=chart: client.post(f'/api/v1/duty-charts/{chart.id}/approve/', {}, format='json')
+            for chart in data['charts']
+        ])
+
+        first_day = timezone.localdate() + timedelta(days=1 + options['days'])
+        requests = []
+        for office, chart, schedule in zip(data['offices'], data['charts'], data['schedules']):
+            payload = [
+                {'user': user.id, 'office': office.id, 'schedule': schedule.id, 'duty_chart': chart.id,
+                 'date': str(first_day + timedelta(days=day))}
+                for user in data['users_by_office'][office.id]
+                for day in range(options['upsert_days'])
+            ]
+            requests.append(lambda payload=payload: client.post('/api/v1/duties/bulk-upsert/', payload, format='json'))
+        report['bulk_upsert'] = self.measure(counter, requests)
+
+        # Make every materialized reminder due now, then run one dispatch tick.
+        ScheduledReminder.objects.filter(
+            duty__duty_chart__in=data['charts'], status='scheduled', expires_at__gt=timezone.now()
+        ).update(due_at=timezone.now())
+        report['reminders'] = self.measure(counter, [dispatch_due_reminders])
+
+        report['gateway'] = get_sms_gateway().metrics.snapshot()
+        report['background'] = get_background_runner().snapshot()
+        return report
+
+    def measure(self, counter, operations):
+        """
+        Runs the operations one after another and waits for the work they
+        hand off (background runner, SMS outbox) before stopping the clock.
+        """
+        sms_before = get_sms_gateway().metrics.snapshot()['sent']
+        notifications_before = Notification.objects.count()
+        queries_before = counter.count
+        latencies, failures = [], 0
+
+        started = time.monotonic()
+        for operation in operations:
+            op_started = time.monotonic()
+            response = operation()
+            latencies.append((time.monotonic() - op_started) * 1000)
+            if getattr(response, 'status_code', 200) >= 400:
+                failures += 1
+                self.stderr.write(f"Request failed ({response.status_code}): {getattr(response, 'data', '')}")
+        get_background_runner().wait_idle()
+        dispatch_sms_outbox()
+        elapsed = time.monotonic() - started
+
+        sms_sent = get_sms_gateway().metrics.snapshot()['sent'] - sms_before
+        return {
+            'operations': len(operations),
+            'failures': failures,
+            'seconds': round(elapsed, 2),
+            'operations_per_second': round(len(operations) / elapsed, 2) if elapsed else None,
+            'latency_ms': percentiles(latencies),
+            'queries': counter.count - queries_before,
+            'sms_sent': sms_sent,
+            'sms_per_second': round(sms_sent / elapsed, 2) if elapsed else None,
+            'notifications': Notification.objects.count() - notifications_before,
+        }
+
+    def generate(self, options, stamp):
+        prefix = f"LOADTEST-{stamp}"
+        start = timezone.localdate() + timedelta(days=1)
+        admin = User.objects.create_user(
+            username=f"{prefix}-admin", employee_id=f"{prefix}-admin", email=f"{prefix}-admin@loadtest.invalid",
+            full_name="Load Test Admin", password=None, is_superuser=True, is_activated=True,
+        )
+
+        offices = WorkingOffice.objects.bulk_create(
+            [WorkingOffice(name=f"{prefix} Office {i}") for i in range(options['offices'])]
+        )
+        users = User.objects.bulk_create([
+            User(
+                username=f"{prefix}-{office.id}-{n}", employee_id=f"{prefix}-{office.id}-{n}",
+                email=f"{prefix}-{office.id}-{n}@loadtest.invalid", full_name=f"Load Test {office.id}/{n}",
+                phone_number=f"98{office.id % 100:02d}{n:06d}", office=office, is_activated=True,
+            )
+            for office in offices
+            for n in range(options['users_per_office'])
+        ], batch_size=1000)
+        users_by_office = {}
+        for user in users:
+            users_by_office.setdefault(user.office_id, []).append(user)
+
+        schedules = Schedule.objects.bulk_create([
+            Schedule(name=f"{prefix} Shift", office=office, start_time='10:30', end_time='17:00',
+                     shift_type='Shift', status='office_schedule')
+            for office in offices
+        ])
+        OfficeNotificationSetting.objects.bulk_create([
+            OfficeNotificationSetting(office=office, schedule_configs={str(schedule.id): {'enabled': True}})
+            for office, schedule in zip(offices, schedules)
+        ])
+        charts = DutyChart.objects.bulk_create([
+            DutyChart(office=office, name=f"{prefix} Chart", effective_date=start, status='draft', created_by=admin)
+            for office in offices
+        ])
+        # bulk_create skips signals: the draft chart gets no notifications or reminders yet.
+        Duty.objects.bulk_create([
+            Duty(user=user, office=office, schedule=schedule, duty_chart=chart, date=start + timedelta(days=day))
+            for office, schedule, chart in zip(offices, schedules, charts)
+            for user in users_by_office[office.id]
+            for day in range(options['days'])
+        ], batch_size=1000)
+
+        return {
+            'admin': admin, 'offices': offices, 'users': users, 'users_by_office': users_by_office,
+            'schedules': schedules, 'charts': charts,
+        }
+
+    def cleanup(self, stamp):
+        prefix = f"LOADTEST-{stamp}"
+        user_ids = list(User.objects.filter(employee_id__startswith=prefix).values_list('id', flat=True))
+        SMSLog.objects.filter(user_id__in=user_ids).delete()
+        WorkingOffice.objects.filter(name__startswith=prefix).delete()
+        User.objects.filter(id__in=user_ids).delete()
+
+    def print_report(self, report):
+        dataset = report['dataset']
+        self.stdout.write(
+            f"Dataset: {dataset['offices']} offices, {dataset['users']} users, {dataset['duties']} duties"
+        )
+        header = f"{'phase':<12}{'ops':>6}{'sec':>9}{'ops/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}" \
+                 f"{'queries':>10}{'sms':>8}{'sms/s':>9}{'notifs':>8}"
+        self.stdout.write(header)
+        for phase in ('approve', 'bulk_upsert', 'reminders'):
+            r = report[phase]
+            latency = r['latency_ms']
+            self.stdout.write(
+                f"{phase:<12}{r['operations']:>6}{r['seconds']:>9}{r['operations_per_second']!s:>9}"
+                f"{latency['p50']!s:>10}{latency['p95']!s:>10}{latency['p99']!s:>10}"
+                f"{r['queries']:>10}{r['sms_sent']:>8}{r['sms_per_second']!s:>9}{r['notifications']:>8}"
+            )
+        gateway = report['gateway']
+        self.stdout.write(
+            f"Gateway: {gateway['sent']} sent, {gateway['failed']} rejected, {gateway['error']} errors, "
+            f"{gateway['throttled']} throttled, latency {gateway['latency_ms']}"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Background runner: {report['background']}"))
@@ -0,0 +1,7 @@
+from auditlogs.archive import PartitionsCommand
+from notification_service.partitions import notification_partitions
+
+
+class Command(PartitionsCommand):
+    help = 'Manage monthly range partitions of the notification table (Postgres only)'
+    partitions = notification_partitions
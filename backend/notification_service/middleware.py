@@ -1,12 +1,11 @@
 from urllib.parse import parse_qs
-from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
 from rest_framework_simplejwt.tokens import AccessToken
+from users.identity import cached_user
 import logging
 
-User = get_user_model()
 logger = logging.getLogger(__name__)
 
 @database_sync_to_async
@@ -15,7 +14,8 @@ def get_user_from_token(token_string):
         # Validate token using SimpleJWT
         access_token = AccessToken(token_string)
         user_id = access_token['user_id']
-        return User.objects.get(id=user_id)
+        # Reconnect storms resolve from the identity cache, not the database.
+        return cached_user(user_id)
     except Exception as e:
         logger.error(f"WebSocket Auth Error: {str(e)}")
         return AnonymousUser()
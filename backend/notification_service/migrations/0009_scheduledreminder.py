@@ -0,0 +1,42 @@
+# Generated by Django 4.2.11 on 2026-10-19 04:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('duties', '0009_merge_20260611_1557'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notification_service', '0008_alter_notification_notification_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reminder_type', models.CharField(help_text='Matches SMSLog.reminder_type (e.g., 1_HOUR, DAILY_10AM)', max_length=50)),
+                ('due_at', models.DateTimeField(help_text='Earliest time the reminder may be sent')),
+                ('expires_at', models.DateTimeField(help_text='Reminder is dropped if not sent by this time')),
+                ('template', models.TextField()),
+                ('advance_days', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('claimed', 'Claimed'), ('sent', 'Sent'), ('skipped', 'Skipped')], default='scheduled', max_length=20)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('duty', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_reminders', to='duties.duty')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_reminders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['due_at'],
+                'indexes': [models.Index(condition=models.Q(('status__in', ['scheduled', 'claimed'])), fields=['due_at'], name='sched_reminder_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='scheduledreminder',
+            constraint=models.UniqueConstraint(fields=('duty', 'reminder_type'), name='unique_scheduled_reminder_per_duty'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification_service', '0009_scheduledreminder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smslog',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='smslog',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='smslog',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='Earliest retry time for a pending SMS', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='smslog',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'sending'])), fields=['created_at'], name='smslog_outbox_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_unread_counters(apps, schema_editor):
+    Notification = apps.get_model('notification_service', 'Notification')
+    NotificationCounter = apps.get_model('notification_service', 'NotificationCounter')
+    counts = (
+        Notification.objects.filter(is_read=False)
+        .values('user_id')
+        .annotate(unread=models.Count('id'))
+        .order_by()
+    )
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=row['user_id'], unread=row['unread']) for row in counts],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_add_create_child_office_chart_permission'),
+        ('notification_service', '0011_broadcastnotice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_unread_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_announced_assignments(apps, schema_editor):
+    # Duties announced by the old per-duty SMS must not be announced again.
+    SMSLog = apps.get_model('notification_service', 'SMSLog')
+    AssignmentEvent = apps.get_model('notification_service', 'AssignmentEvent')
+    announced = (
+        SMSLog.objects.filter(reminder_type='ASSIGNMENT', duty__isnull=False, user__isnull=False)
+        .values_list('user_id', 'duty_id', 'duty__duty_chart_id', 'created_at')
+    )
+    AssignmentEvent.objects.bulk_create(
+        [
+            AssignmentEvent(user_id=user_id, duty_id=duty_id, duty_chart_id=chart_id, due_at=created_at, status='sent')
+            for user_id, duty_id, chart_id, created_at in announced.iterator(chunk_size=2000)
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('duties', '0009_merge_20260611_1557'),
+        ('notification_service', '0013_notification_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssignmentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_at', models.DateTimeField(help_text='End of the coalescing window for this user and chart')),
+                ('status', models.CharField(choices=[('buffered', 'Buffered'), ('sent', 'Sent'), ('dropped', 'Dropped')], default='buffered', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('duty', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='duties.duty')),
+                ('duty_chart', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='duties.dutychart')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['due_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'buffered')), fields=['due_at'], name='assignment_event_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='assignmentevent',
+            constraint=models.UniqueConstraint(fields=('user', 'duty'), name='unique_assignment_event_per_duty'),
+        ),
+        migrations.RunPython(backfill_announced_assignments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:38
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+from auditlogs.search import create_search_index, drop_search_index
+
+# Must match SMSLog.SEARCH_FIELDS and Notification.SEARCH_FIELDS.
+SEARCH_INDEXES = [
+    ('SMSLog', 'smslog_search_idx', ('phone', 'recipient_name', 'recipient_username', 'message')),
+    ('Notification', 'notification_search_idx', ('title', 'message')),
+]
+
+
+def backfill_recipients(apps, schema_editor):
+    SMSLog = apps.get_model('notification_service', 'SMSLog')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    recipient = User.objects.filter(pk=OuterRef('user_id'))
+    SMSLog.objects.filter(user__isnull=False).update(
+        recipient_name=Subquery(recipient.values('full_name')[:1]),
+        recipient_username=Subquery(recipient.values('username')[:1]),
+    )
+
+
+def add_search_indexes(apps, schema_editor):
+    for model_name, name, fields in SEARCH_INDEXES:
+        create_search_index(schema_editor, apps.get_model('notification_service', model_name), name, fields)
+
+
+def remove_search_indexes(apps, schema_editor):
+    for _, name, _ in SEARCH_INDEXES:
+        drop_search_index(schema_editor, name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notification_service', '0014_assignmentevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smslog',
+            name='recipient_name',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='smslog',
+            name='recipient_username',
+            field=models.CharField(blank=True, max_length=150, null=True),
+        ),
+        migrations.RunPython(backfill_recipients, migrations.RunPython.noop),
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+# Rows queued by a running outbox in the last hour are left for the dispatcher.
+GRACE = timedelta(hours=1)
+
+
+def expire_pre_outbox_rows(apps, schema_editor):
+    """
+    SMSLog rows left 'pending' or 'sending' by the pre-outbox code were never
+    meant to be retried. The outbox dispatcher claims every pending row, so
+    without this it would text all of them on its first run after deploy.
+    """
+    SMSLog = apps.get_model('notification_service', 'SMSLog')
+    SMSLog.objects.filter(
+        status__in=['pending', 'sending'],
+        claimed_at__isnull=True,
+        attempts=0,
+        created_at__lt=timezone.now() - GRACE,
+    ).update(status='failed', response_raw='Not sent: left pending before the SMS outbox was introduced')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification_service', '0015_log_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(expire_pre_outbox_rows, migrations.RunPython.noop),
+    ]
@@ -18,10 +18,23 @@ class Notification(AuditableMixin, models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Audit details don't list changed fields; mark_read skips the diff.
+    audit_track_changes = False
+
+    # Columns of the full-text search vector; notification_search_idx is built from them.
+    SEARCH_FIELDS = ('title', 'message')
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'notification_type', 'created_at']),
+            # Keyset-paginated inbox: (user, created_at, id) newest first.
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_inbox_idx'),
+            models.Index(
+                fields=['user', 'created_at'],
+                name='notification_unread_idx',
+                condition=models.Q(is_read=False),
+            ),
         ]
 
     def __str__(self):
@@ -31,16 +44,87 @@ class Notification(AuditableMixin, models.Model):
         fullname = getattr(self.user, 'full_name', self.user.username)
         return f"NOTIFICATION: {action.capitalize()}d notification for {fullname}."
 
+class NotificationCounter(models.Model):
+    """
+    Per-user count of unread personal notifications, adjusted atomically with
+    F() expressions whenever notifications are created or read so the bell
+    never has to COUNT(*) the notification table.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter'
+    )
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+class BroadcastNotice(models.Model):
+    """
+    A system-wide notice (changelog, Help Center upload) stored once and
+    shown to every user who joined before it was posted. Read state is kept
+    sparsely in BroadcastNoticeRead, only for users who dismissed it.
+    """
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES, default='SYSTEM')
+    link = models.CharField(max_length=255, blank=True, null=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Broadcast - {self.title}"
+
+
+class BroadcastNoticeRead(models.Model):
+    notice = models.ForeignKey(BroadcastNotice, on_delete=models.CASCADE, related_name='reads')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='broadcast_reads')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['notice', 'user'], name='unique_broadcast_read_per_user')
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} read {self.notice_id}"
+
+
+class SMSLogQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.fill_recipient()
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class SMSLog(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='sms_logs')
+    # Snapshots of the recipient for search without joining the user table.
+    recipient_name = models.CharField(max_length=255, blank=True, null=True)
+    recipient_username = models.CharField(max_length=150, blank=True, null=True)
     duty = models.ForeignKey('duties.Duty', on_delete=models.SET_NULL, null=True, blank=True, related_name='sms_logs_for_duty')
     phone = models.CharField(max_length=20)
     message = models.TextField()
     status = models.CharField(max_length=50, default='pending')
     reminder_type = models.CharField(max_length=50, default='GENERAL', help_text="Type of reminder (e.g., 1_HOUR, DAILY, ASSIGNMENT)")
     response_raw = models.TextField(blank=True, null=True)
+    # Outbox bookkeeping: 'pending' rows are claimed and sent by the SMS dispatcher.
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True, help_text="Earliest retry time for a pending SMS")
+    claimed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = SMSLogQuerySet.as_manager()
+
+    # Columns of the full-text search vector; smslog_search_idx is built from them.
+    SEARCH_FIELDS = ('phone', 'recipient_name', 'recipient_username', 'message')
+
     class Meta:
         ordering = ['-created_at']
         constraints = [
@@ -49,10 +133,27 @@ class SMSLog(models.Model):
                 name='unique_sms_reminder_per_duty'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                name='smslog_outbox_idx',
+                condition=models.Q(status__in=['pending', 'sending']),
+            ),
+        ]
 
     def __str__(self):
         return f"To {self.phone} - {self.status}"
 
+    def fill_recipient(self):
+        """Copies the recipient's names from an already loaded user."""
+        if self.recipient_username is None and self.user_id and SMSLog.user.is_cached(self):
+            self.recipient_name = getattr(self.user, 'full_name', None)
+            self.recipient_username = self.user.username
+
+    def save(self, *args, **kwargs):
+        self.fill_recipient()
+        super().save(*args, **kwargs)
+
 
 class OfficeNotificationSetting(AuditableMixin, models.Model):
     office = models.OneToOneField('org.WorkingOffice', on_delete=models.CASCADE, related_name='notification_setting')
@@ -78,3 +179,90 @@ class OfficeNotificationSetting(AuditableMixin, models.Model):
         return f"NOTIFICATION_SETTING: {action.capitalize()}d notification settings for {office_name}."
 
 
+
+
+class ScheduledReminder(models.Model):
+    """
+    A reminder SMS materialized ahead of time for a single duty.
+
+    Rows are (re)computed when a duty is saved, its chart is approved or the
+    office's notification settings change, so the every-minute poller only
+    has to look at rows whose due_at has passed.
+    """
+    STATUS_CHOICES = (
+        ('scheduled', 'Scheduled'),
+        ('claimed', 'Claimed'),
+        ('sent', 'Sent'),
+        ('skipped', 'Skipped'),
+    )
+
+    duty = models.ForeignKey('duties.Duty', on_delete=models.CASCADE, related_name='scheduled_reminders')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='scheduled_reminders')
+    reminder_type = models.CharField(max_length=50, help_text="Matches SMSLog.reminder_type (e.g., 1_HOUR, DAILY_10AM)")
+    due_at = models.DateTimeField(help_text="Earliest time the reminder may be sent")
+    expires_at = models.DateTimeField(help_text="Reminder is dropped if not sent by this time")
+    template = models.TextField()
+    advance_days = models.IntegerField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['due_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['duty', 'reminder_type'],
+                name='unique_scheduled_reminder_per_duty'
+            )
+        ]
+        indexes = [
+            # Only pending rows are ever polled, so keep the index to those.
+            models.Index(
+                fields=['due_at'],
+                name='sched_reminder_due_idx',
+                condition=models.Q(status__in=['scheduled', 'claimed']),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.reminder_type} for duty {self.duty_id} at {self.due_at} ({self.status})"
+
+
+class AssignmentEvent(models.Model):
+    """
+    A single duty assignment waiting to be announced.
+
+    Editing a chart cell by cell saves one duty at a time; instead of one SMS
+    per duty, events are buffered per (user, duty_chart) until due_at and
+    then announced together in one message. Rows are kept once announced so
+    re-saving a duty never announces it twice.
+    """
+    STATUS_CHOICES = (
+        ('buffered', 'Buffered'),
+        ('sent', 'Sent'),
+        ('dropped', 'Dropped'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    duty = models.ForeignKey('duties.Duty', on_delete=models.CASCADE, related_name='+')
+    duty_chart = models.ForeignKey('duties.DutyChart', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    due_at = models.DateTimeField(help_text="End of the coalescing window for this user and chart")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='buffered')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['due_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'duty'], name='unique_assignment_event_per_duty')
+        ]
+        indexes = [
+            models.Index(
+                fields=['due_at'],
+                name='assignment_event_due_idx',
+                condition=models.Q(status='buffered'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Assignment of duty {self.duty_id} to {self.user_id} ({self.status})"
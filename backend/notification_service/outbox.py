@@ -0,0 +1,179 @@
+"""
+Durable SMS outbox.
+
+Request handlers and periodic tasks never talk to the SMS gateway directly:
+they insert SMSLog rows with status 'pending' and wake the dispatcher. The
+dispatcher claims pending rows in batches with SELECT ... FOR UPDATE SKIP
+LOCKED, sends them through a bounded thread pool (the gateway client's own
+connection pool, rate limiter and circuit breaker still apply) and records
+every outcome with one bulk_update. Transient failures are retried with
+exponential backoff; a worker that dies mid-batch leaves its rows in
+'sending', and they are reclaimed once the claim times out.
+
+Because the queue is the table, nothing is lost on a restart: the periodic
+sweep picks up whatever is still pending.
+"""
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .gateway import get_sms_gateway, DELIVERY_SENT, DELIVERY_FAILED, DELIVERY_RETRY
+from .models import SMSLog
+
+logger = logging.getLogger(__name__)
+
+# Rows claimed per round trip; the dispatcher keeps claiming until fewer are returned.
+DISPATCH_BATCH_SIZE = getattr(settings, 'SMS_OUTBOX_BATCH_SIZE', 200)
+MAX_ATTEMPTS = getattr(settings, 'SMS_OUTBOX_MAX_ATTEMPTS', 5)
+RETRY_BASE_DELAY = timedelta(seconds=30)
+RETRY_MAX_DELAY = timedelta(minutes=30)
+# A claim older than this is assumed to belong to a crashed dispatcher.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+_executor = None
+_executor_lock = threading.Lock()
+_wake = threading.local()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'NTC_SMS_POOL_SIZE', 10),
+                    thread_name_prefix='sms-outbox',
+                )
+    return _executor
+
+
+def retry_delay(attempts):
+    """Backoff before the next try after `attempts` failed deliveries."""
+    delay = RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0))
+    return min(delay, RETRY_MAX_DELAY)
+
+
+def enqueue_sms(user, phone, message, reminder_type='GENERAL', duty=None):
+    """
+    Inserts a pending SMSLog row and wakes the dispatcher once the current
+    transaction commits. Returns the row.
+    """
+    log = SMSLog.objects.create(
+        user=user,
+        duty=duty,
+        phone=phone,
+        message=message,
+        reminder_type=reminder_type,
+        status='pending'
+    )
+    wake_sms_dispatcher()
+    return log
+
+
+def wake_sms_dispatcher():
+    """
+    Asks for a dispatch run after the current transaction commits. Calls made
+    inside one transaction (e.g. approving a chart) are coalesced into a
+    single run. If the broker is unreachable the rows stay pending and the
+    periodic sweep sends them. Runs synchronously under tests, like
+    run_in_background.
+    """
+    _wake.pending = True
+    transaction.on_commit(_run_wake)
+
+
+def _run_wake():
+    if not getattr(_wake, 'pending', False):
+        return
+    _wake.pending = False
+    if 'test' in sys.argv:
+        dispatch_sms_outbox()
+        return
+    try:
+        from .tasks import dispatch_sms_outbox as dispatch_task
+        dispatch_task.delay()
+    except Exception as e:
+        logger.warning(f"Could not wake SMS dispatcher, pending SMS will go out on the next sweep: {e}")
+
+
+def claim_outbox_batch(now=None, limit=DISPATCH_BATCH_SIZE):
+    """
+    Atomically claims up to `limit` sendable rows and returns them. Rows
+    locked by another dispatcher are skipped rather than waited on.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            SMSLog.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pending', next_attempt_at__isnull=True)
+                | Q(status='pending', next_attempt_at__lte=now)
+                | Q(status='sending', claimed_at__lt=now - CLAIM_TIMEOUT)
+            )
+            .order_by('created_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            SMSLog.objects.filter(id__in=ids).update(status='sending', claimed_at=now)
+    if not ids:
+        return []
+    return list(SMSLog.objects.filter(id__in=ids).only('id', 'phone', 'message', 'attempts'))
+
+
+def _deliver(log):
+    try:
+        return get_sms_gateway().deliver(log.phone, log.message)
+    except Exception as e:
+        logger.exception(f"Unexpected error sending SMS {log.id}")
+        return DELIVERY_RETRY, str(e)
+
+
+def _send_batch(logs, now):
+    """Sends claimed rows through the worker pool and records the outcomes."""
+    results = _get_executor().map(_deliver, logs)
+    sent_count = 0
+    for log, (outcome, response_text) in zip(logs, results):
+        log.attempts += 1
+        log.response_raw = response_text
+        log.claimed_at = None
+        log.next_attempt_at = None
+        if outcome == DELIVERY_SENT:
+            log.status = 'sent'
+            sent_count += 1
+        elif outcome == DELIVERY_FAILED:
+            log.status = 'failed'
+        elif log.attempts >= MAX_ATTEMPTS:
+            log.status = 'error'
+            logger.error(f"SMS {log.id} to {log.phone} gave up after {log.attempts} attempts: {response_text}")
+        else:
+            log.status = 'pending'
+            log.next_attempt_at = now + retry_delay(log.attempts)
+
+    SMSLog.objects.bulk_update(
+        logs, ['status', 'response_raw', 'attempts', 'next_attempt_at', 'claimed_at'], batch_size=500
+    )
+    return sent_count
+
+
+def dispatch_sms_outbox(now=None, batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Claims and sends every sendable outbox row, batch by batch.
+    Returns the number of SMS accepted by the gateway.
+    """
+    now = now or timezone.now()
+    sent_count = 0
+    while True:
+        logs = claim_outbox_batch(now, limit=batch_size)
+        if not logs:
+            break
+        sent_count += _send_batch(logs, now)
+        if len(logs) < batch_size:
+            break
+    return sent_count
@@ -0,0 +1,18 @@
+"""
+Optional native Postgres range partitioning of the Notification table.
+
+With NOTIFICATION_PARTITIONING enabled and the table converted (see the
+notification_partitions management command), notifications live in one
+partition per calendar month of created_at. Once every row in a month is
+past the longest retention window the whole partition is archived and
+dropped, which is instant compared with deleting the rows one batch at a
+time. Months are created ahead of time by the retention task. The converted
+table keeps its identity sequence; see auditlogs.archive for the mechanics.
+"""
+from auditlogs.archive import MonthlyPartitions
+
+from .models import Notification
+
+notification_partitions = MonthlyPartitions(
+    Notification, 'created_at', 'NOTIFICATION_PARTITIONING', 'notification_search_idx'
+)
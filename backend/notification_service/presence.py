@@ -0,0 +1,66 @@
+"""
+Tracks which users currently hold a notification WebSocket.
+
+NotificationConsumer increments a per-user connection counter in the shared
+cache on connect and decrements it on disconnect. Broadcasts look the
+counters up with one get_many and skip users with no live socket; the DB row
+remains the source of truth and is fetched when they next open the app.
+
+Counters expire after PRESENCE_TTL so a crashed ASGI server can't pin users
+as online forever; a stale counter only costs an unneeded push.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL = 24 * 60 * 60
+
+
+def _key(user_id):
+    return f"notifications:presence:{user_id}"
+
+
+def presence_enabled():
+    return getattr(settings, 'NOTIFICATION_PRESENCE_TRACKING', False)
+
+
+def user_connected(user_id):
+    key = _key(user_id)
+    try:
+        cache.add(key, 0, PRESENCE_TTL)
+        cache.incr(key)
+        cache.touch(key, PRESENCE_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to record presence for user {user_id}: {e}")
+
+
+def user_disconnected(user_id):
+    key = _key(user_id)
+    try:
+        if cache.decr(key) <= 0:
+            cache.delete(key)
+    except ValueError:
+        # Counter already expired.
+        pass
+    except Exception as e:
+        logger.warning(f"Failed to clear presence for user {user_id}: {e}")
+
+
+def online_user_ids(user_ids):
+    """
+    Returns the subset of user_ids with at least one open notification
+    socket. With presence tracking disabled (or the cache unreachable) every
+    user is assumed online.
+    """
+    user_ids = set(user_ids)
+    if not presence_enabled() or not user_ids:
+        return user_ids
+    try:
+        counts = cache.get_many([_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.warning(f"Presence lookup failed, broadcasting to all {len(user_ids)} users: {e}")
+        return user_ids
+    return {user_id for user_id in user_ids if (counts.get(_key(user_id)) or 0) > 0}
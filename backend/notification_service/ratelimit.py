@@ -0,0 +1,76 @@
+"""
+Token buckets shared by every process through the default cache.
+
+A bucket holds up to `capacity` tokens and regains one every `interval_ms`
+milliseconds. With the Redis cache backend the refill-and-take is a single
+Lua script run on the Redis clock, so web processes and Celery workers on
+any number of hosts draw from one bucket and can never overdraw it. Other
+cache backends (LocMem in development and tests) use a process-local lock
+instead.
+
+Used by the SMS gateway client (gateway.py) and the OTP request limits
+(otp_service/ratelimit.py).
+"""
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+
+# KEYS[1]: bucket hash. ARGV: capacity, refill interval (ms). Uses the Redis
+# server clock so workers with skewed clocks share one timeline.
+# Returns {1, 0} when a token was taken, else {0, ms until the next token}.
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) / interval)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = math.ceil((1 - tokens) * interval)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * interval))
+return {allowed, wait}
+"""
+
+_local_lock = threading.Lock()
+
+
+def _take_redis(backend, name, capacity, interval_ms):
+    key = backend.make_key(name)
+    client = backend._cache.get_client(key, write=True)
+    allowed, wait = client.eval(_TAKE_SCRIPT, 1, key, capacity, interval_ms)
+    return bool(allowed), int(wait)
+
+
+def _take_local(backend, name, capacity, interval_ms):
+    now_ms = time.time() * 1000
+    with _local_lock:
+        tokens, ts = backend.get(name) or (capacity, now_ms)
+        tokens = min(capacity, tokens + max(0, now_ms - ts) / interval_ms)
+        allowed = tokens >= 1
+        wait = 0 if allowed else int((1 - tokens) * interval_ms) + 1
+        if allowed:
+            tokens -= 1
+        backend.set(name, (tokens, now_ms), max(1, capacity * interval_ms / 1000))
+    return allowed, wait
+
+
+def take_token(name, capacity, interval_ms):
+    """
+    Takes a token from the shared bucket `name`. Returns (allowed,
+    milliseconds until the next token). Raises if the cache is unreachable;
+    callers decide whether to fail open or closed.
+    """
+    backend = caches['default']
+    take = _take_redis if isinstance(backend, RedisCache) else _take_local
+    return take(backend, name, capacity, interval_ms)
@@ -0,0 +1,131 @@
+"""
+Retention for Notification and SMSLog rows.
+
+Each table has per-type retention windows in days (NOTIFICATION_RETENTION_DAYS
+keyed by notification_type, SMSLOG_RETENTION_DAYS keyed by reminder_type
+prefix, 'default' for anything else, None to keep forever). The daily
+archive task copies expired rows into gzipped NDJSON files in the default
+storage (see auditlogs.archive), one file per batch and calendar month of
+created_at:
+
+    archives/notifications/2025/03/20250901T023000-0001.ndjson.gz
+
+and then deletes them.
+
+Batches walk the primary key from the oldest row. ids grow with created_at,
+so the expired rows are at the front of the index and each batch is a short
+range scan without a dedicated retention index.
+
+SMS still in the outbox ('pending' or 'sending') is never archived.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from auditlogs.archive import BATCH_SIZE, archive_partitions, archive_rows
+
+from .counters import decrement_unread_many
+from .models import Notification, SMSLog
+from .partitions import notification_partitions
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_WINDOWS = {'default': 180}
+SMSLOG_WINDOWS = {'default': 365}
+
+
+def notification_windows():
+    return getattr(settings, 'NOTIFICATION_RETENTION_DAYS', NOTIFICATION_WINDOWS)
+
+
+def smslog_windows():
+    return getattr(settings, 'SMSLOG_RETENTION_DAYS', SMSLOG_WINDOWS)
+
+
+def expired_filter(field, windows, now, prefix=False):
+    """
+    Q matching rows past their window. With `prefix`, keys match the start of
+    the field and the longest matching key wins ('ASSIGNMENT' covers
+    'ASSIGNMENT_CHART_12' unless that has a key of its own).
+    """
+    lookup = f'{field}__startswith' if prefix else field
+    keys = [key for key in windows if key != 'default']
+    expired = Q(pk__in=[])
+    for key in keys:
+        days = windows[key]
+        if days is None:
+            continue
+        match = Q(**{lookup: key})
+        if prefix:
+            for longer in keys:
+                if longer != key and longer.startswith(key):
+                    match &= ~Q(**{lookup: longer})
+        expired |= match & Q(created_at__lt=now - timedelta(days=days))
+
+    default = windows.get('default')
+    if default is not None:
+        other = Q(created_at__lt=now - timedelta(days=default))
+        for key in keys:
+            other &= ~Q(**{lookup: key})
+        expired |= other
+    return expired
+
+
+def _unread_per_user(rows):
+    return Counter(row['user_id'] for row in rows if not row['is_read'])
+
+
+def archive_notification_partitions(now, run_stamp, batch_size=BATCH_SIZE):
+    """
+    Archives and drops whole monthly partitions older than the longest
+    notification window. Returns the number of rows archived.
+    """
+    windows = list(notification_windows().values())
+    if not windows or None in windows:
+        return 0
+
+    def take_off_unread(in_month):
+        unread = in_month.filter(is_read=False).values('user_id').annotate(count=Count('id'))
+        decrement_unread_many({row['user_id']: row['count'] for row in unread})
+
+    return archive_partitions(
+        notification_partitions, now - timedelta(days=max(windows)), 'notifications', run_stamp, batch_size,
+        before_drop=take_off_unread,
+    )
+
+
+def archive_expired(now=None, batch_size=BATCH_SIZE):
+    """
+    Archives and deletes every Notification and SMSLog row past its
+    retention window. Returns {'notifications': n, 'sms_logs': n}.
+    """
+    now = now or timezone.now()
+    run_stamp = f"{timezone.localtime(now):%Y%m%dT%H%M%S}"
+
+    notifications = 0
+    if notification_partitions.enabled() and notification_partitions.is_partitioned():
+        notification_partitions.ensure_partitions(now)
+        notifications += archive_notification_partitions(now, run_stamp, batch_size)
+
+    notifications += archive_rows(
+        Notification,
+        expired_filter('notification_type', notification_windows(), now),
+        'notifications',
+        run_stamp,
+        batch_size,
+        # Deleting unread notifications must take them off the bell count.
+        before_delete=lambda rows: decrement_unread_many(_unread_per_user(rows)),
+    )
+    sms_logs = archive_rows(
+        SMSLog,
+        expired_filter('reminder_type', smslog_windows(), now, prefix=True) & ~Q(status__in=['pending', 'sending']),
+        'sms_logs',
+        run_stamp,
+        batch_size,
+    )
+    logger.info(f"Archived {notifications} notifications and {sms_logs} SMS logs")
+    return {'notifications': notifications, 'sms_logs': sms_logs}
@@ -0,0 +1,324 @@
+"""
+Dispatch queue for duty reminder SMS.
+
+Instead of scanning every upcoming duty each minute, reminders are
+materialized as ScheduledReminder rows when a duty is saved, its chart is
+approved or the office's notification settings change. A lightweight
+poller then claims rows whose due_at has passed with
+SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers never pick the same
+reminder and the cost per tick depends only on how many reminders are due.
+"""
+import logging
+import threading
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ScheduledReminder, OfficeNotificationSetting
+from .sms_templates import SMSTemplateRenderer
+from .tasks import (
+    NOTIFIABLE_SHIFT_TYPES,
+    DEFAULT_ADVANCE_REMINDER_TEMPLATE,
+    DEFAULT_DAILY_REMINDER_TEMPLATE,
+    DEFAULT_DAILY_REMINDER_TIME,
+    existing_reminder_keys,
+    queue_reminder_batch,
+    render_sms_template,
+)
+
+logger = logging.getLogger(__name__)
+
+ADVANCE_REMINDER = '1_HOUR'
+DAILY_REMINDER = 'DAILY_10AM'
+
+REMINDER_TITLES = {
+    ADVANCE_REMINDER: "Upcoming Duty Reminder",
+    DAILY_REMINDER: "Today's Duty Reminder",
+}
+
+# How far ahead the periodic safety net re-materializes reminders.
+UPCOMING_HORIZON_DAYS = 8
+# Rows claimed per poll; the poller keeps claiming until fewer are returned.
+DISPATCH_BATCH_SIZE = 500
+# A claim older than this is assumed to belong to a crashed worker.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+MATERIALIZE_CHUNK_SIZE = 500
+
+_pending = threading.local()
+
+
+def _parse_time(value, default):
+    if not value:
+        return default
+    try:
+        h, m, s = map(int, value.split(':'))
+        return time(h, m, s)
+    except Exception:
+        return default
+
+
+def compute_reminders(duty, setting):
+    """
+    Returns the unsaved ScheduledReminder rows a duty should have given its
+    office's notification setting: the advance reminder for schedules enabled
+    in schedule_configs and the daily reminder on the duty day.
+    """
+    reminders = []
+    start_time = duty.schedule.start_time
+    duty_start_dt = timezone.make_aware(datetime.combine(duty.date, start_time))
+
+    # Advance reminder: only for schedules explicitly enabled in schedule_configs.
+    schedule_configs = getattr(setting, 'schedule_configs', None) or {}
+    sch_config = schedule_configs.get(str(duty.schedule_id))
+    if sch_config and sch_config.get('enabled', False):
+        days_before = 1
+        try:
+            days_before = int(sch_config.get('advance_reminder_days', days_before))
+        except (ValueError, TypeError):
+            pass
+        dispatch_time = _parse_time(sch_config.get('advance_reminder_time'), time(18, 0, 0))
+        dispatch_date = duty.date - timedelta(days=days_before)
+        reminders.append(ScheduledReminder(
+            duty_id=duty.id,
+            user_id=duty.user_id,
+            reminder_type=ADVANCE_REMINDER,
+            due_at=timezone.make_aware(datetime.combine(dispatch_date, dispatch_time)),
+            expires_at=duty_start_dt,
+            template=sch_config.get('advance_reminder_template', DEFAULT_ADVANCE_REMINDER_TEMPLATE),
+            advance_days=days_before,
+        ))
+
+    # Daily reminder: on the duty day, for shifts starting after the daily time.
+    enable_daily = getattr(setting, 'enable_daily_reminder', True) if setting else True
+    daily_time = getattr(setting, 'daily_reminder_time', DEFAULT_DAILY_REMINDER_TIME) if setting else DEFAULT_DAILY_REMINDER_TIME
+    if enable_daily and start_time >= daily_time:
+        reminders.append(ScheduledReminder(
+            duty_id=duty.id,
+            user_id=duty.user_id,
+            reminder_type=DAILY_REMINDER,
+            due_at=timezone.make_aware(datetime.combine(duty.date, daily_time)),
+            expires_at=timezone.make_aware(datetime.combine(duty.date + timedelta(days=1), time.min)),
+            template=(getattr(setting, 'daily_reminder_template', None) if setting else None) or DEFAULT_DAILY_REMINDER_TEMPLATE,
+        ))
+
+    return reminders
+
+
+def _materialize_chunk(duty_ids):
+    from duties.models import Duty
+
+    duties = list(
+        Duty.objects.filter(
+            id__in=duty_ids,
+            date__gte=timezone.localdate(),
+            user__isnull=False,
+            schedule__isnull=False,
+            schedule__shift_type__in=NOTIFIABLE_SHIFT_TYPES,
+            duty_chart__status='approved',
+        ).select_related('schedule')
+    )
+    office_ids = {d.office_id for d in duties}
+    settings_by_office = {
+        s.office_id: s for s in OfficeNotificationSetting.objects.filter(office_id__in=office_ids)
+    }
+
+    desired = {}
+    for duty in duties:
+        for reminder in compute_reminders(duty, settings_by_office.get(duty.office_id)):
+            desired[(reminder.duty_id, reminder.reminder_type)] = reminder
+
+    existing = {
+        (r.duty_id, r.reminder_type): r
+        for r in ScheduledReminder.objects.filter(duty_id__in=duty_ids)
+    }
+
+    # Reminders already claimed or sent are left alone; only pending rows
+    # follow the duty/settings.
+    stale_ids = [
+        r.id for key, r in existing.items()
+        if r.status == 'scheduled' and key not in desired
+    ]
+    to_create, to_update = [], []
+    update_fields = ['user_id', 'due_at', 'expires_at', 'template', 'advance_days']
+    for key, reminder in desired.items():
+        current = existing.get(key)
+        if current is None:
+            to_create.append(reminder)
+        elif current.status == 'scheduled':
+            if any(getattr(current, f) != getattr(reminder, f) for f in update_fields):
+                for f in update_fields:
+                    setattr(current, f, getattr(reminder, f))
+                to_update.append(current)
+
+    if stale_ids:
+        ScheduledReminder.objects.filter(id__in=stale_ids, status='scheduled').delete()
+    if to_update:
+        ScheduledReminder.objects.bulk_update(to_update, ['user', 'due_at', 'expires_at', 'template', 'advance_days'])
+    if to_create:
+        ScheduledReminder.objects.bulk_create(to_create, ignore_conflicts=True)
+    return len(to_create) + len(to_update)
+
+
+def schedule_reminders_for_duties(duty_ids):
+    """
+    (Re)materializes reminders for the given duties. Safe to call repeatedly:
+    pending rows are updated in place and rows that no longer apply are removed.
+    """
+    duty_ids = list({i for i in duty_ids if i is not None})
+    changed = 0
+    for i in range(0, len(duty_ids), MATERIALIZE_CHUNK_SIZE):
+        changed += _materialize_chunk(duty_ids[i:i + MATERIALIZE_CHUNK_SIZE])
+    return changed
+
+
+def schedule_reminders_for_chart(chart_id):
+    from duties.models import Duty
+    duty_ids = Duty.objects.filter(
+        duty_chart_id=chart_id, date__gte=timezone.localdate()
+    ).values_list('id', flat=True)
+    return schedule_reminders_for_duties(list(duty_ids))
+
+
+def schedule_reminders_for_office(office_id):
+    from duties.models import Duty
+    duty_ids = Duty.objects.filter(
+        office_id=office_id, date__gte=timezone.localdate()
+    ).values_list('id', flat=True)
+    return schedule_reminders_for_duties(list(duty_ids))
+
+
+def schedule_upcoming_reminders(days=UPCOMING_HORIZON_DAYS):
+    from duties.models import Duty
+    today = timezone.localdate()
+    duty_ids = Duty.objects.filter(
+        date__range=[today, today + timedelta(days=days - 1)],
+        duty_chart__status='approved',
+    ).values_list('id', flat=True)
+    return schedule_reminders_for_duties(list(duty_ids))
+
+
+def queue_duty_reminders(duty_id):
+    """
+    Schedules reminder materialization for a duty once the current
+    transaction commits. Saves within one transaction (e.g. bulk_upsert)
+    are coalesced into a single batch.
+    """
+    pending = getattr(_pending, 'duty_ids', None)
+    if pending is None:
+        pending = _pending.duty_ids = set()
+    pending.add(duty_id)
+    transaction.on_commit(_flush_queued_duty_reminders)
+
+
+def _flush_queued_duty_reminders():
+    duty_ids = getattr(_pending, 'duty_ids', None)
+    if not duty_ids:
+        return
+    _pending.duty_ids = set()
+    try:
+        schedule_reminders_for_duties(duty_ids)
+    except Exception as e:
+        logger.error(f"Failed to materialize reminders for duties {sorted(duty_ids)}: {e}")
+
+
+def claim_due_reminders(now=None, limit=DISPATCH_BATCH_SIZE):
+    """
+    Atomically claims up to `limit` due reminders and returns their ids.
+    Rows locked by another worker are skipped rather than waited on.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        ids = list(
+            ScheduledReminder.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status='scheduled') | Q(status='claimed', claimed_at__lt=now - CLAIM_TIMEOUT),
+                due_at__lte=now,
+            )
+            .order_by('due_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            ScheduledReminder.objects.filter(id__in=ids).update(status='claimed', claimed_at=now)
+    return ids
+
+
+def _send_claimed(reminder_ids, now):
+    reminders = list(
+        ScheduledReminder.objects.filter(id__in=reminder_ids).select_related(
+            'user', 'duty__schedule', 'duty__office', 'duty__duty_chart'
+        )
+    )
+    sent_keys = existing_reminder_keys(
+        [r.duty_id for r in reminders], {r.reminder_type for r in reminders}
+    )
+
+    renderer = SMSTemplateRenderer()
+    entries, queued_ids, skipped_ids = [], [], []
+    for reminder in reminders:
+        duty = reminder.duty
+        user = reminder.user
+        key = (user.id, duty.id, reminder.reminder_type)
+        if (
+            key in sent_keys
+            or reminder.expires_at <= now
+            or not getattr(user, 'phone_number', None)
+            or not duty.schedule
+            or not duty.duty_chart
+            or duty.duty_chart.status != 'approved'
+        ):
+            skipped_ids.append(reminder.id)
+            continue
+
+        dispatch_time = None
+        if reminder.advance_days is not None:
+            dispatch_time = timezone.localtime(reminder.due_at).time()
+        entries.append({
+            'user': user,
+            'duty': duty,
+            'reminder_type': reminder.reminder_type,
+            'title': REMINDER_TITLES.get(reminder.reminder_type, "Duty Reminder"),
+            'message': render_sms_template(
+                reminder.template, duty, user,
+                advance_days=reminder.advance_days,
+                dispatch_time=dispatch_time,
+                renderer=renderer,
+            ),
+        })
+        queued_ids.append(reminder.id)
+        sent_keys.add(key)
+
+    if skipped_ids:
+        ScheduledReminder.objects.filter(id__in=skipped_ids).update(status='skipped')
+
+    try:
+        sent_count = queue_reminder_batch(entries)
+    except Exception as e:
+        # Leave the rows claimed: once CLAIM_TIMEOUT passes a later tick
+        # claims them again, and reminders already logged are skipped then.
+        logger.error(f"Error queueing {len(entries)} scheduled reminders, will retry: {e}")
+        return 0
+
+    # A reminder is done once queue_reminder_batch has taken it; rows
+    # dropped there as duplicates were already sent by another path.
+    if queued_ids:
+        ScheduledReminder.objects.filter(id__in=queued_ids).update(status='sent')
+    return sent_count
+
+
+def dispatch_due_reminders(now=None, batch_size=DISPATCH_BATCH_SIZE):
+    """
+    Claims and sends every reminder due at `now`, batch by batch.
+    Returns the number of reminders sent.
+    """
+    now = now or timezone.now()
+    sent_count = 0
+    while True:
+        ids = claim_due_reminders(now, limit=batch_size)
+        if not ids:
+            break
+        sent_count += _send_claimed(ids, now)
+        if len(ids) < batch_size:
+            break
+    return sent_count
@@ -1,11 +1,30 @@
 from rest_framework import serializers
-from .models import Notification, SMSLog, OfficeNotificationSetting
+from .models import Notification, SMSLog, OfficeNotificationSetting, BroadcastNotice
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = '__all__'
 
+class NotificationFeedSerializer(serializers.Serializer):
+    """A personal notification or a broadcast notice in a user's merged feed."""
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    message = serializers.CharField()
+    notification_type = serializers.CharField()
+    link = serializers.CharField(allow_null=True)
+    is_read = serializers.BooleanField()
+    created_at = serializers.DateTimeField()
+    is_broadcast = serializers.BooleanField()
+
+class BroadcastNoticeSerializer(serializers.ModelSerializer):
+    is_read = serializers.BooleanField(default=False, read_only=True)
+    is_broadcast = serializers.BooleanField(default=True, read_only=True)
+
+    class Meta:
+        model = BroadcastNotice
+        fields = ['id', 'title', 'message', 'notification_type', 'link', 'is_read', 'created_at', 'is_broadcast']
+
 class SMSLogSerializer(serializers.ModelSerializer):
     user_full_name = serializers.SerializerMethodField()
     
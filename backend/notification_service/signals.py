@@ -1,35 +1,37 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.db import transaction
-from duties.models import Duty
-from .tasks import async_send_sms
-from .utils import create_dashboard_notification
+from duties.models import Duty, DutyChart
+from .models import OfficeNotificationSetting
 import logging
-import threading
+from contextvars import ContextVar
 
 logger = logging.getLogger(__name__)
 
-_thread_locals = threading.local()
+# Per context, not per thread, so suppression in one async request never
+# silences another running on the same thread.
+_skip_duty_notifications = ContextVar('skip_duty_notifications', default=False)
 
 class suppress_duty_notifications:
     """
     Context manager to temporarily suppress duty assignment notifications.
-    Useful during bulk imports.
+    Useful during bulk imports. Nested blocks restore the outer state.
     """
     def __enter__(self):
-        _thread_locals.skip_duty_notifications = True
+        self._token = _skip_duty_notifications.set(True)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        _thread_locals.skip_duty_notifications = False
+        _skip_duty_notifications.reset(self._token)
 
 @receiver(post_save, sender=Duty)
 def notify_duty_assignment(sender, instance, created, **kwargs):
     """
     Signal to notify user when a duty is assigned.
-    Includes idempotency check and transactional safety.
+    Includes idempotency check and transactional safety; notifications for
+    the same user and chart are coalesced into one message.
     """
-    if getattr(_thread_locals, 'skip_duty_notifications', False):
+    if _skip_duty_notifications.get():
         logger.debug(f"Skipping notification for Duty {instance.id} (Suppressed)")
         return
 
@@ -42,8 +44,9 @@ def notify_duty_assignment(sender, instance, created, **kwargs):
                 logger.info(f"Skipping notification for Duty {instance.id}: Chart status is '{instance.duty_chart.status}' (must be 'approved').")
                 return
 
-            logger.info(f"Triggering assignment notification for Duty {instance.id} (Schedule: {instance.schedule.name})")
-            # Transactional Safety: Wait for the Duty save to be committed
+            logger.info(f"Buffering assignment notification for Duty {instance.id} (Schedule: {instance.schedule.name})")
+            # Transactional Safety: Wait for the Duty save to be committed;
+            # assignments are then coalesced per user and chart (see coalesce.py).
             transaction.on_commit(lambda: _handle_duty_assignment_notification(instance))
         else:
             reason = "No user" if not instance.user else "No schedule"
@@ -53,94 +56,48 @@ def notify_duty_assignment(sender, instance, created, **kwargs):
 
 def _handle_duty_assignment_notification(instance):
     try:
-        from .models import SMSLog
-        from django.db import IntegrityError
-        
-        user = instance.user
-        if not user: return
-        
-        schedule = getattr(instance, 'schedule', None)
-        duty_name = schedule.name if schedule and hasattr(schedule, 'name') else "Duty"
-        
-        # Ensure date is available and formatted
-        duty_date = "Unknown Date"
-        if instance.date:
-            try:
-                import nepali_datetime
-                duty_date = nepali_datetime.date.from_datetime_date(instance.date).strftime("%Y-%m-%d")
-            except Exception:
-                duty_date = str(instance.date)
-
-        full_name = getattr(user, 'full_name', user.username)
-
-        chart_name = "Duty Chart"
-        if instance.duty_chart and instance.duty_chart.name:
-            chart_name = instance.duty_chart.name
-
-        # Custom Message
-        office_name = instance.office.name if instance.office else "Unknown Office"
-        sms_message = f'Dear {full_name}, You have been assigned to duty chart "{chart_name}" at "{office_name}" for the "{duty_name}" on {duty_date}. Please visit https://dutychart.ntc.net.np for the detail.'
-
-        # 1. SMS Notification logic
-        if getattr(user, 'phone_number', None):
-            # Idempotency: Try to create the SMSLog entry first
-            try:
-                log = SMSLog.objects.create(
-                    user=user,
-                    duty=instance,
-                    phone=user.phone_number,
-                    message=sms_message,
-                    reminder_type='ASSIGNMENT',
-                    status='pending'
-                )
-
-                # Mirror the SMS as an in-app dashboard notification.
-                # Placed after the SMSLog create so the unique constraint
-                # (user, duty, reminder_type) also dedupes the notification.
-                create_dashboard_notification(
-                    user,
-                    title="New Duty Assignment",
-                    message=sms_message,
-                    notification_type='ASSIGNMENT',
-                    link='/my-duties'
-                )
-
-                # Use a direct background thread for immediate delivery without Celery overhead for single assignments
-                def trigger_sms_task():
-                    try:
-                        from .utils import send_sms
-                        success, response = send_sms(user.phone_number, sms_message, user=user, log_id=log.id)
-                        if success:
-                            logger.info(f"Assignment SMS sent successfully to {user.username}")
-                        else:
-                            logger.error(f"Assignment SMS failed for {user.username}: {response}")
-                    except Exception as e:
-                        logger.error(f"Fatal error in SMS thread for {user.username}: {e}")
-
-                from .utils import run_in_background
-                run_in_background(trigger_sms_task)
-
-            except IntegrityError:
-                # Already exists, skip sending again
-                logger.debug(f"Assignment SMS already sent/queued for user {user.username}, duty {instance.id}")
-                return
-        else:
-            logger.warning(f"User {user.username} has no phone number for SMS notification.")
-            # No SMS possible, but the user should still see it on the dashboard.
-            # Dedupe manually since there is no SMSLog row to enforce uniqueness.
-            from .models import Notification
-            already_notified = Notification.objects.filter(
-                user=user,
-                notification_type='ASSIGNMENT',
-                message=sms_message
-            ).exists()
-            if not already_notified:
-                create_dashboard_notification(
-                    user,
-                    title="New Duty Assignment",
-                    message=sms_message,
-                    notification_type='ASSIGNMENT',
-                    link='/my-duties'
-                )
+        from .coalesce import buffer_assignment
+        buffer_assignment(instance)
     except Exception as e:
         logger.exception(f"Error in _handle_duty_assignment_notification for Duty {instance.id}")
+
+
+@receiver(post_save, sender=Duty)
+def schedule_duty_reminders(sender, instance, **kwargs):
+    """
+    Keeps the duty's ScheduledReminder rows in step with its date, schedule
+    and chart. Not affected by suppress_duty_notifications: bulk imports
+    still need their reminders, they only skip the assignment SMS.
+    """
+    from .scheduler import queue_duty_reminders
+    queue_duty_reminders(instance.pk)
+
+
+@receiver(post_save, sender=DutyChart)
+def schedule_chart_reminders(sender, instance, **kwargs):
+    """Materializes reminders for all upcoming duties once a chart is approved."""
+    if instance.status != 'approved':
+        return
+    from .scheduler import schedule_reminders_for_chart
+
+    def materialize():
+        try:
+            schedule_reminders_for_chart(instance.pk)
+        except Exception as e:
+            logger.error(f"Failed to materialize reminders for Chart {instance.pk}: {e}")
+
+    transaction.on_commit(materialize)
+
+
+@receiver(post_save, sender=OfficeNotificationSetting)
+def reschedule_office_reminders(sender, instance, **kwargs):
+    """Recomputes pending reminders when an office's notification settings change."""
+    from .scheduler import schedule_reminders_for_office
+
+    def materialize():
+        try:
+            schedule_reminders_for_office(instance.office_id)
+        except Exception as e:
+            logger.error(f"Failed to reschedule reminders for Office {instance.office_id}: {e}")
+
+    transaction.on_commit(materialize)
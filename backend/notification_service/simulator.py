@@ -0,0 +1,112 @@
+"""
+Local stand-in for the NTC SMS and OTP gateways.
+
+With SMS_GATEWAY_BACKEND = 'simulated' the gateway clients keep their real
+code paths (connection pool, token bucket, circuit breaker, retries), but
+their requests.Session is mounted with SimulatedGatewayAdapter, which
+answers locally instead of opening a socket:
+
+- the SMS endpoint replies "0" (accepted) or "-33" (rejected),
+- /sendotp replies with a fresh transactionId,
+- /verifyotp accepts SMS_SIMULATOR['otp_code'],
+- every call sleeps for the configured latency (plus jitter), fails with
+  HTTP 503 at the configured error rate, and is refused with HTTP 503 when
+  calls exceed the gateway's own rate limit.
+
+Used for load tests and local development; nothing leaves the process.
+"""
+import json
+import random
+import time
+import uuid
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+from django.conf import settings
+
+from .gateway import TokenBucket
+
+SIMULATED_OTP_URL = "http://otp.simulated"
+
+DEFAULTS = {
+    'latency_ms': 80,
+    'jitter_ms': 40,
+    'error_rate': 0.0,
+    'reject_rate': 0.0,
+    'rate_per_second': None,
+    'otp_code': '123456',
+}
+
+
+def simulation_enabled():
+    return getattr(settings, 'SMS_GATEWAY_BACKEND', 'ntc') == 'simulated'
+
+
+class SimulatedGatewayAdapter(BaseAdapter):
+    def __init__(self, latency_ms=80, jitter_ms=40, error_rate=0.0, reject_rate=0.0,
+                 rate_per_second=None, otp_code='123456', seed=None):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.reject_rate = reject_rate
+        self.otp_code = str(otp_code)
+        self.limiter = TokenBucket(rate_per_second, rate_per_second) if rate_per_second else None
+        self._random = random.Random(seed)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(**{**DEFAULTS, **getattr(settings, 'SMS_SIMULATOR', {})})
+
+    def _respond(self, request, status_code, body):
+        response = requests.Response()
+        response.status_code = status_code
+        response.url = request.url
+        response.request = request
+        response.encoding = 'utf-8'
+        if isinstance(body, dict):
+            response.headers['Content-Type'] = 'application/json'
+            body = json.dumps(body)
+        response._content = body.encode('utf-8')
+        return response
+
+    def _latency(self):
+        jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        return max(self.latency_ms + jitter, 0) / 1000
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        latency = self._latency()
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        if read_timeout is not None and latency > read_timeout:
+            time.sleep(read_timeout)
+            raise requests.exceptions.ReadTimeout(f"Simulated gateway timed out after {read_timeout}s", request=request)
+        time.sleep(latency)
+
+        if self.limiter and not self.limiter.acquire(timeout=0):
+            return self._respond(request, 503, "Simulated gateway overloaded")
+        if self._random.random() < self.error_rate:
+            return self._respond(request, 503, "Simulated gateway error")
+
+        path = urlparse(request.url).path.rstrip('/')
+        if path.endswith('/sendotp'):
+            return self._respond(request, 200, {"transactionId": uuid.uuid4().hex[:25].upper()})
+        if path.endswith('/verifyotp'):
+            payload = json.loads(request.body or b'{}')
+            if str(payload.get('otp')) == self.otp_code:
+                return self._respond(request, 200, {"message": "OTP verified"})
+            return self._respond(request, 400, {"message": "Invalid OTP"})
+        if self._random.random() < self.reject_rate:
+            return self._respond(request, 200, "-33")
+        return self._respond(request, 200, "0")
+
+    def close(self):
+        pass
+
+
+def mount_simulator(session):
+    """Routes every request made through `session` to the simulator."""
+    adapter = SimulatedGatewayAdapter.from_settings()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return adapter
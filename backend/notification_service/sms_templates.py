@@ -0,0 +1,114 @@
+"""
+Compiled SMS templates.
+
+Reminder templates use {{placeholder}} fields. A template is split into
+literal and field segments once and cached by its text, so rendering is a
+lookup per field and a single join instead of one str.replace per known
+field. Only the fields a template actually uses are computed.
+
+A reminder run renders hundreds of duties that share a handful of dates and
+schedules, so SMSTemplateRenderer memoizes the date- and schedule-derived
+fields (BS date, formatted shift times) for the lifetime of one renderer.
+Create one per run.
+"""
+import re
+from functools import lru_cache
+
+try:
+    import nepali_datetime
+except ImportError:
+    nepali_datetime = None
+
+PLACEHOLDER = re.compile(r'\{\{(\w+)\}\}')
+
+FIELDS = frozenset({
+    'employee_name', 'shift_name', 'chart_name', 'start_time', 'end_time', 'date_ad', 'date_bs',
+    'office_name', 'advance_minutes', 'advance_days', 'dispatch_time',
+})
+
+
+@lru_cache(maxsize=512)
+def compile_template(template_str):
+    """
+    Returns the template as a tuple alternating literal text and field names
+    (literals at even indices, fields at odd ones). Unknown placeholders are
+    kept as literal text.
+    """
+    segments = ['']
+    for i, part in enumerate(PLACEHOLDER.split(template_str)):
+        if i % 2 and part in FIELDS:
+            segments += [part, '']
+        elif i % 2:
+            segments[-1] += f"{{{{{part}}}}}"
+        else:
+            segments[-1] += part
+    return tuple(segments)
+
+
+def _format_time(value):
+    if not value:
+        return ""
+    try:
+        return value.strftime("%I:%M %p")
+    except Exception:
+        return str(value)
+
+
+def _optional(value):
+    return str(value) if value is not None else ""
+
+
+class SMSTemplateRenderer:
+    def __init__(self):
+        self._bs_dates = {}
+        self._shift_times = {}
+
+    def date_bs(self, date):
+        if date not in self._bs_dates:
+            try:
+                self._bs_dates[date] = str(nepali_datetime.date.from_datetime_date(date)).replace("-", "/")
+            except Exception:
+                self._bs_dates[date] = ""
+        return self._bs_dates[date]
+
+    def shift_times(self, schedule):
+        if schedule is None:
+            return "", ""
+        key = (schedule.pk, schedule.start_time, schedule.end_time)
+        if key not in self._shift_times:
+            self._shift_times[key] = (_format_time(schedule.start_time), _format_time(schedule.end_time))
+        return self._shift_times[key]
+
+    def _field(self, name, duty, user, advance_minutes, advance_days, dispatch_time):
+        if name == 'employee_name':
+            return getattr(user, 'full_name', user.username)
+        if name == 'shift_name':
+            return duty.schedule.name if duty.schedule else ""
+        if name == 'chart_name':
+            return duty.duty_chart.name if duty.duty_chart else ""
+        if name == 'start_time':
+            return self.shift_times(duty.schedule)[0]
+        if name == 'end_time':
+            return self.shift_times(duty.schedule)[1]
+        if name == 'date_ad':
+            return str(duty.date)
+        if name == 'date_bs':
+            return self.date_bs(duty.date)
+        if name == 'office_name':
+            return duty.office.name if duty.office else ""
+        if name == 'advance_minutes':
+            return _optional(advance_minutes)
+        if name == 'advance_days':
+            return _optional(advance_days)
+        return _optional(dispatch_time)
+
+    def render(self, template_str, duty, user, advance_minutes=None, advance_days=None, dispatch_time=None):
+        if not template_str:
+            return ""
+        segments = compile_template(template_str)
+        if len(segments) == 1:
+            return segments[0]
+        parts = list(segments)
+        for i in range(1, len(parts), 2):
+            parts[i] = str(self._field(parts[i], duty, user, advance_minutes, advance_days, dispatch_time))
+        return ''.join(parts)
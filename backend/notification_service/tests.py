@@ -6,7 +6,7 @@ from django.contrib.auth import get_user_model
 from duties.models import DutyChart, Duty, Schedule
 from org.models import WorkingOffice
 from notification_service.models import SMSLog
-from notification_service.tasks import send_duty_reminders, send_daily_duty_reminders
+from notification_service.scheduler import dispatch_due_reminders
 from notification_service.signals import suppress_duty_notifications
 
 User = get_user_model()
@@ -35,7 +35,7 @@ class NotificationLogicTest(TransactionTestCase):
             office=self.office
         )
 
-    @patch('notification_service.utils.requests.get')
+    @patch('notification_service.gateway.requests.Session.get')
     def test_assignment_signal_respects_approval_status(self, mock_get):
         """Test that individual duty assignment signals only send SMS if chart is approved."""
         mock_get.return_value.status_code = 200
@@ -81,10 +81,11 @@ class NotificationLogicTest(TransactionTestCase):
         # Verify SMS Log exists
         self.assertTrue(SMSLog.objects.filter(user=self.user, reminder_type='ASSIGNMENT').exists())
 
-    @patch('notification_service.utils.send_sms')
-    def test_periodic_reminders_respect_approval_status(self, mock_send):
-        """Test that periodic tasks only send reminders for approved charts."""
-        mock_send.return_value = (True, "0")
+    @patch('notification_service.gateway.requests.Session.get')
+    def test_periodic_reminders_respect_approval_status(self, mock_get):
+        """Test that reminders are only dispatched for approved charts."""
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.text = "0"
 
         # Use aware datetimes to match task logic
         test_now = timezone.now()
@@ -130,8 +131,8 @@ class NotificationLogicTest(TransactionTestCase):
                 duty_chart=draft_chart
             )
 
-            # Run 1-hour reminder task
-            send_duty_reminders()
+            # Draft charts get no reminders to dispatch.
+            dispatch_due_reminders()
             self.assertFalse(SMSLog.objects.filter(reminder_type='1_HOUR').exists())
 
             # 2. Duty in APPROVED chart
@@ -148,14 +149,15 @@ class NotificationLogicTest(TransactionTestCase):
                 duty_chart=approved_chart
             )
 
-            # Run 1-hour reminder task
-            send_duty_reminders()
+            # The approved duty's reminder was materialized on save and is due.
+            dispatch_due_reminders()
             self.assertTrue(SMSLog.objects.filter(reminder_type='1_HOUR').exists())
 
-    @patch('notification_service.utils.send_sms')
-    def test_daily_10am_reminder_logic(self, mock_send):
+    @patch('notification_service.gateway.requests.Session.get')
+    def test_daily_10am_reminder_logic(self, mock_get):
         """Test the 10 AM reminder logic."""
-        mock_send.return_value = (True, "0")
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.text = "0"
         today = timezone.localdate()
 
         approved_chart = DutyChart.objects.create(
@@ -184,9 +186,12 @@ class NotificationLogicTest(TransactionTestCase):
         )
         Duty.objects.create(user=self.user, schedule=morning_schedule_2, date=today, duty_chart=approved_chart)
 
-        # Run 10 AM reminder task
-        send_daily_duty_reminders()
-        
+        # Dispatch just after the daily reminder time.
+        from notification_service.tasks import DEFAULT_DAILY_REMINDER_TIME
+        dispatch_due_reminders(
+            now=timezone.make_aware(datetime.combine(today, DEFAULT_DAILY_REMINDER_TIME)) + timedelta(minutes=1)
+        )
+
         daily_logs = SMSLog.objects.filter(reminder_type='DAILY_10AM')
         self.assertEqual(daily_logs.count(), 1)
         self.assertIn("Night Shift", daily_logs[0].message)
@@ -223,3 +228,695 @@ class NotificationLogicTest(TransactionTestCase):
             ""
         )
 
+
+
+class ScheduledReminderTest(TransactionTestCase):
+    def setUp(self):
+        self.office = WorkingOffice.objects.create(name="Dispatch Office")
+        self.user = User.objects.create_user(
+            username="dispatchuser",
+            password="password123",
+            phone_number="+9779800000001",
+            full_name="Dispatch User",
+            is_activated=True,
+            office=self.office
+        )
+        self.schedule = Schedule.objects.create(
+            name="Evening Shift",
+            start_time=time(19, 0),
+            end_time=time(23, 0),
+            shift_type="Shift",
+            office=self.office
+        )
+        self.duty_date = timezone.localdate() + timedelta(days=2)
+        self.chart = DutyChart.objects.create(
+            office=self.office,
+            effective_date=timezone.localdate(),
+            status='draft',
+            name="Dispatch Chart"
+        )
+
+    def _enable_advance_reminder(self):
+        from notification_service.models import OfficeNotificationSetting
+        OfficeNotificationSetting.objects.create(
+            office=self.office,
+            schedule_configs={
+                str(self.schedule.id): {
+                    "enabled": True,
+                    "advance_reminder_days": 1,
+                    "advance_reminder_time": "18:00:00"
+                }
+            }
+        )
+
+    @patch('notification_service.gateway.requests.Session.get')
+    def test_reminders_materialized_on_approval_and_dispatched_once(self, mock_get):
+        from notification_service.models import ScheduledReminder
+        from notification_service.scheduler import dispatch_due_reminders
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.text = "0"
+
+        self._enable_advance_reminder()
+        duty = Duty.objects.create(
+            user=self.user, office=self.office, schedule=self.schedule,
+            date=self.duty_date, duty_chart=self.chart
+        )
+        # Draft charts get no reminders.
+        self.assertFalse(ScheduledReminder.objects.exists())
+
+        self.chart.status = 'approved'
+        self.chart.save()
+        reminders = {r.reminder_type: r for r in ScheduledReminder.objects.filter(duty=duty)}
+        self.assertEqual(set(reminders), {'1_HOUR', 'DAILY_10AM'})
+        advance_due = timezone.make_aware(datetime.combine(self.duty_date - timedelta(days=1), time(18, 0)))
+        self.assertEqual(reminders['1_HOUR'].due_at, advance_due)
+
+        # Nothing is due yet.
+        self.assertEqual(dispatch_due_reminders(now=advance_due - timedelta(minutes=1)), 0)
+
+        self.assertEqual(dispatch_due_reminders(now=advance_due + timedelta(minutes=1)), 1)
+        self.assertEqual(SMSLog.objects.get(duty=duty, reminder_type='1_HOUR').status, 'sent')
+
+        # Already sent: a second tick is a no-op.
+        self.assertEqual(dispatch_due_reminders(now=advance_due + timedelta(minutes=2)), 0)
+        self.assertEqual(ScheduledReminder.objects.get(duty=duty, reminder_type='1_HOUR').status, 'sent')
+
+    def test_failed_batch_leaves_reminders_claimed_for_retry(self):
+        from notification_service.models import ScheduledReminder
+        from notification_service.scheduler import CLAIM_TIMEOUT
+
+        self._enable_advance_reminder()
+        self.chart.status = 'approved'
+        self.chart.save()
+        duty = Duty.objects.create(
+            user=self.user, office=self.office, schedule=self.schedule,
+            date=self.duty_date, duty_chart=self.chart
+        )
+        due = timezone.make_aware(datetime.combine(self.duty_date - timedelta(days=1), time(18, 0)))
+
+        with patch('notification_service.scheduler.queue_reminder_batch', side_effect=RuntimeError("db down")):
+            self.assertEqual(dispatch_due_reminders(now=due + timedelta(minutes=1)), 0)
+        reminder = ScheduledReminder.objects.get(duty=duty, reminder_type='1_HOUR')
+        self.assertEqual(reminder.status, 'claimed')
+        self.assertFalse(SMSLog.objects.filter(duty=duty, reminder_type='1_HOUR').exists())
+
+        # Once the claim times out a later tick sends it.
+        with patch('notification_service.outbox.wake_sms_dispatcher'):
+            self.assertEqual(dispatch_due_reminders(now=due + CLAIM_TIMEOUT + timedelta(minutes=2)), 1)
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.status, 'sent')
+
+    @patch('notification_service.gateway.requests.Session.get')
+    def test_settings_change_reschedules_pending_reminders(self, mock_get):
+        from notification_service.models import ScheduledReminder, OfficeNotificationSetting
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.text = "0"
+
+        self.chart.status = 'approved'
+        self.chart.save()
+        duty = Duty.objects.create(
+            user=self.user, office=self.office, schedule=self.schedule,
+            date=self.duty_date, duty_chart=self.chart
+        )
+        self.assertEqual(
+            list(ScheduledReminder.objects.filter(duty=duty).values_list('reminder_type', flat=True)),
+            ['DAILY_10AM']
+        )
+
+        self._enable_advance_reminder()
+        self.assertTrue(ScheduledReminder.objects.filter(duty=duty, reminder_type='1_HOUR').exists())
+
+        setting = OfficeNotificationSetting.objects.get(office=self.office)
+        setting.schedule_configs = {}
+        setting.save()
+        self.assertFalse(ScheduledReminder.objects.filter(duty=duty, reminder_type='1_HOUR').exists())
+
+    @patch('notification_service.outbox.wake_sms_dispatcher')
+    def test_reminder_batch_skips_already_sent_keys(self, mock_wake):
+        """Reminder runs preload sent keys and queue the rest in the outbox."""
+        from notification_service.models import Notification
+        self.chart.status = 'approved'
+        self.chart.save()
+        with suppress_duty_notifications():
+            duties = [
+                Duty.objects.create(
+                    user=self.user, office=self.office, schedule=self.schedule,
+                    date=timezone.localdate(), duty_chart=self.chart
+                ),
+                Duty.objects.create(
+                    user=self.user, office=self.office, schedule=self.schedule,
+                    date=timezone.localdate() + timedelta(days=1), duty_chart=self.chart
+                ),
+            ]
+        SMSLog.objects.create(
+            user=self.user, duty=duties[0], phone=self.user.phone_number,
+            message="already sent", reminder_type='DAILY_10AM', status='sent'
+        )
+
+        from notification_service.tasks import queue_reminder_batch, existing_reminder_keys
+        sent_keys = existing_reminder_keys([d.id for d in duties], ['DAILY_10AM'])
+        entries = [
+            {'user': self.user, 'duty': d, 'reminder_type': 'DAILY_10AM', 'title': "Today's Duty Reminder", 'message': f"Reminder {d.id}"}
+            for d in duties if (self.user.id, d.id, 'DAILY_10AM') not in sent_keys
+        ]
+        self.assertEqual(queue_reminder_batch(entries), 1)
+        self.assertEqual(SMSLog.objects.filter(reminder_type='DAILY_10AM').count(), 2)
+        self.assertEqual(Notification.objects.filter(user=self.user, notification_type='REMINDER').count(), 1)
+        self.assertEqual(SMSLog.objects.filter(reminder_type='DAILY_10AM', status='pending').count(), 1)
+        self.assertEqual(mock_wake.call_count, 1)
+
+
+class SMSOutboxTest(TestCase):
+    def _queue(self, count):
+        return [
+            SMSLog.objects.create(phone=f"+97798000000{i:02d}", message=f"msg {i}", status='pending')
+            for i in range(count)
+        ]
+
+    def test_migration_expires_rows_left_pending_before_the_outbox(self):
+        from importlib import import_module
+        from django.apps import apps
+        from notification_service.outbox import claim_outbox_batch
+        migration = import_module('notification_service.migrations.0016_expire_pre_outbox_sms')
+
+        stale, fresh = self._queue(2)
+        SMSLog.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(days=120))
+        migration.expire_pre_outbox_rows(apps, None)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        self.assertEqual([log.id for log in claim_outbox_batch()], [fresh.id])
+
+    @patch('notification_service.outbox.get_sms_gateway')
+    def test_dispatch_records_outcomes_in_one_pass(self, mock_gateway):
+        from notification_service.outbox import dispatch_sms_outbox
+        sent, rejected = self._queue(2)
+        mock_gateway.return_value.deliver.side_effect = lambda phone, message: (
+            ('sent', "0") if message == sent.message else ('failed', "Gateway Error: -33")
+        )
+        self.assertEqual(dispatch_sms_outbox(batch_size=1), 1)
+        sent.refresh_from_db()
+        rejected.refresh_from_db()
+        self.assertEqual((sent.status, sent.attempts), ('sent', 1))
+        self.assertEqual((rejected.status, rejected.response_raw), ('failed', "Gateway Error: -33"))
+        # Nothing left to claim.
+        self.assertEqual(dispatch_sms_outbox(), 0)
+
+    @patch('notification_service.outbox.get_sms_gateway')
+    def test_transient_errors_back_off_then_give_up(self, mock_gateway):
+        from notification_service import outbox
+        mock_gateway.return_value.deliver.return_value = ('retry', "HTTP 503: busy")
+        log, = self._queue(1)
+        now = timezone.now()
+
+        outbox.dispatch_sms_outbox(now=now)
+        log.refresh_from_db()
+        self.assertEqual((log.status, log.attempts), ('pending', 1))
+        self.assertEqual(log.next_attempt_at, now + outbox.RETRY_BASE_DELAY)
+
+        # Not due yet.
+        self.assertEqual(outbox.claim_outbox_batch(now=now + timedelta(seconds=10)), [])
+
+        for _ in range(outbox.MAX_ATTEMPTS - 1):
+            log.refresh_from_db()
+            outbox.dispatch_sms_outbox(now=log.next_attempt_at)
+        log.refresh_from_db()
+        self.assertEqual((log.status, log.attempts), ('error', outbox.MAX_ATTEMPTS))
+
+    def test_stale_claims_are_reclaimed(self):
+        from notification_service.outbox import claim_outbox_batch, CLAIM_TIMEOUT
+        log, = self._queue(1)
+        now = timezone.now()
+        self.assertEqual([l.id for l in claim_outbox_batch(now=now)], [log.id])
+        self.assertEqual(claim_outbox_batch(now=now + timedelta(minutes=1)), [])
+        self.assertEqual([l.id for l in claim_outbox_batch(now=now + CLAIM_TIMEOUT + timedelta(seconds=1))], [log.id])
+
+
+
+class BulkAssignmentNotificationTest(TestCase):
+    def setUp(self):
+        self.office = WorkingOffice.objects.create(name="Bulk Office")
+        self.chart = DutyChart.objects.create(
+            office=self.office, effective_date=timezone.localdate(), status='approved', name="Bulk Chart"
+        )
+        self.schedules = [
+            Schedule.objects.create(name=name, start_time=time(9, 0), end_time=time(17, 0), shift_type="Shift", office=self.office)
+            for name in ("Morning", "Evening")
+        ]
+
+    def _users(self, start, count):
+        users = []
+        with suppress_duty_notifications():
+            for i in range(start, start + count):
+                user = User.objects.create_user(
+                    username=f"bulk{i}", password="password123", email=f"bulk{i}@example.com",
+                    employee_id=f"BULK{i}", phone_number=f"+97798100000{i:02d}",
+                    full_name=f"Bulk {i}", office=self.office
+                )
+                for schedule in self.schedules:
+                    Duty.objects.create(user=user, office=self.office, schedule=schedule,
+                                        date=timezone.localdate(), duty_chart=self.chart)
+                users.append(user)
+        return users
+
+    def test_query_count_does_not_grow_with_assignees(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from notification_service.models import Notification
+        from notification_service.utils import send_bulk_assignment_notification
+
+        def mark_previously_notified(user):
+            # Re-notifying a user rewrites their row instead of adding one.
+            SMSLog.objects.create(user=user, phone="old", message="old",
+                                  reminder_type=f'ASSIGNMENT_CHART_{self.chart.id}', status='sent')
+
+        small_users = self._users(0, 2)
+        mark_previously_notified(small_users[0])
+        with CaptureQueriesContext(connection) as small:
+            send_bulk_assignment_notification(small_users, self.chart)
+        large_users = self._users(2, 8)
+        mark_previously_notified(large_users[0])
+        with CaptureQueriesContext(connection) as large:
+            send_bulk_assignment_notification(large_users, self.chart)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+        logs = SMSLog.objects.filter(reminder_type=f'ASSIGNMENT_CHART_{self.chart.id}')
+        self.assertEqual(logs.count(), 10)
+        self.assertEqual(set(logs.values_list('status', flat=True)), {'pending'})
+        self.assertIn('"Evening, Morning"', logs.get(user=large_users[0]).message)
+        self.assertEqual(Notification.objects.filter(notification_type='ASSIGNMENT').count(), 10)
+
+
+class BroadcastPipelineTest(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f"ws{i}", password="password123", email=f"ws{i}@example.com",
+                                     employee_id=f"WS{i}", full_name=f"WS {i}")
+            for i in range(3)
+        ]
+
+    @patch('notification_service.utils.get_channel_layer')
+    def test_bulk_broadcast_serializes_once_and_skips_offline_users(self, mock_layer):
+        from django.core.cache import cache
+        from django.test import override_settings
+        from notification_service import presence
+        from notification_service.models import Notification
+        from notification_service.serializers import NotificationSerializer
+        from notification_service.utils import broadcast_notifications
+
+        sent = []
+
+        async def group_send(group, message):
+            sent.append((group, message))
+
+        mock_layer.return_value.group_send = group_send
+        cache.clear()
+        notifications = Notification.objects.bulk_create([
+            Notification(user=user, title="Update", message="Deployed", notification_type='SYSTEM')
+            for user in self.users
+        ])
+        presence.user_connected(self.users[0].id)
+        presence.user_connected(self.users[2].id)
+        presence.user_disconnected(self.users[2].id)
+
+        with override_settings(NOTIFICATION_PRESENCE_TRACKING=True), \
+                patch('notification_service.utils.NotificationSerializer', wraps=NotificationSerializer) as serializer:
+            broadcast_notifications(notifications)
+        self.assertEqual(serializer.call_count, 1)
+        self.assertEqual([group for group, _ in sent], [f"user_{self.users[0].id}"])
+        self.assertEqual(sent[0][1]['message']['id'], notifications[0].id)
+
+        # Without presence tracking everyone gets the push.
+        sent.clear()
+        broadcast_notifications(notifications)
+        self.assertEqual(sorted(m['message']['id'] for _, m in sent), sorted(n.id for n in notifications))
+
+
+class BroadcastNoticeTest(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.users = [
+            User.objects.create_user(username=f"bc{i}", password="password123", email=f"bc{i}@example.com",
+                                     employee_id=f"BC{i}", full_name=f"BC {i}")
+            for i in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_broadcast_is_stored_once_and_merged_into_feed(self):
+        from notification_service.models import BroadcastNotice, BroadcastNoticeRead, Notification
+        from notification_service.utils import create_broadcast_notice, create_dashboard_notification
+
+        create_dashboard_notification(self.users[0], "Personal", "Just for you", notification_type='ASSIGNMENT')
+        notice = create_broadcast_notice("Update", "New release", link="/about")
+        self.assertEqual(BroadcastNotice.objects.count(), 1)
+        self.assertEqual(Notification.objects.count(), 1)
+
+        response = self.client.get('/api/v1/notifications/')
+        results = response.data['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual([(r['title'], r['is_broadcast'], r['is_read']) for r in results],
+                         [("Update", True, False), ("Personal", False, False)])
+        self.assertEqual(self.client.get('/api/v1/notifications/unread_count/').data['count'], 2)
+
+        self.client.post(f'/api/v1/notifications/broadcasts/{notice.id}/mark_read/')
+        self.assertEqual(self.client.get('/api/v1/notifications/unread_count/').data['count'], 1)
+        # Read state is per user and only stored for users who dismissed it.
+        self.assertEqual(BroadcastNoticeRead.objects.count(), 1)
+        from notification_service.counters import unread_total
+        self.assertEqual(unread_total(self.users[1]), 1)
+
+        self.client.post('/api/v1/notifications/mark_all_read/')
+        self.assertEqual(self.client.get('/api/v1/notifications/unread_count/').data['count'], 0)
+
+    def test_feed_pages_by_cursor_across_personal_and_broadcast_rows(self):
+        from notification_service.models import Notification
+        from notification_service.utils import create_broadcast_notice
+
+        same_moment = timezone.now() + timedelta(minutes=1)
+        for i in range(4):
+            Notification.objects.create(user=self.users[0], title=f"P{i}", message="m", is_read=i % 2 == 0)
+        notice = create_broadcast_notice("B", "m")
+        # Ties on created_at are broken by kind and id, so nothing is skipped.
+        Notification.objects.filter(title__in=["P2", "P3"]).update(created_at=same_moment)
+        type(notice).objects.filter(id=notice.id).update(created_at=same_moment)
+
+        titles, url = [], '/api/v1/notifications/?page_size=2'
+        with self.assertNumQueries(3):  # one UNION per page, no COUNT
+            while url:
+                response = self.client.get(url)
+                self.assertIsNone(response.data['previous'])
+                titles += [r['title'] for r in response.data['results']]
+                url = response.data['next']
+        self.assertEqual(titles, ["B", "P3", "P2", "P1", "P0"])
+
+        unread = self.client.get('/api/v1/notifications/?unread=true').data['results']
+        self.assertEqual([r['title'] for r in unread], ["B", "P3", "P1"])
+        self.assertEqual(self.client.get('/api/v1/notifications/?cursor=garbage').status_code, 404)
+
+
+    def test_concurrent_mark_read_decrements_the_counter_once(self):
+        from notification_service.models import Notification, NotificationCounter
+        from notification_service.utils import create_dashboard_notification
+        from notification_service.views import NotificationViewSet
+
+        create_dashboard_notification(self.users[0], "One", "First")
+        create_dashboard_notification(self.users[0], "Two", "Second")
+        # Both requests loaded the notification before either marked it read.
+        stale = Notification.objects.get(title="One")
+        with patch.object(NotificationViewSet, 'get_object', return_value=stale):
+            for _ in range(2):
+                self.client.post(f'/api/v1/notifications/{stale.id}/mark_read/')
+        self.assertEqual(NotificationCounter.objects.get(user=self.users[0]).unread, 1)
+        self.assertTrue(Notification.objects.get(title="One").is_read)
+
+class UnreadCounterPushTest(TransactionTestCase):
+    def test_counts_are_pushed_on_connect_and_on_change(self):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from rest_framework.test import APIClient
+        from notification_service.consumers import NotificationConsumer
+        from notification_service.models import NotificationCounter
+        from notification_service.utils import create_dashboard_notification
+
+        user = User.objects.create_user(username="counter", password="password123", email="counter@example.com",
+                                        employee_id="CNT1", full_name="Counter User")
+        first = create_dashboard_notification(user, "One", "First")
+        self.assertEqual(NotificationCounter.objects.get(user=user).unread, 1)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        async def scenario():
+            communicator = WebsocketCommunicator(NotificationConsumer.as_asgi(), "/ws/notifications/")
+            communicator.scope["user"] = user
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            received = [await communicator.receive_json_from()]
+
+            await database_sync_to_async(create_dashboard_notification)(user, "Two", "Second")
+            received.append(await communicator.receive_json_from())
+            received.append(await communicator.receive_json_from())
+
+            await database_sync_to_async(client.post)(f'/api/v1/notifications/{first.id}/mark_read/')
+            received.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return received
+
+        from channels.db import database_sync_to_async
+        on_connect, pushed, after_create, after_read = async_to_sync(scenario)()
+        self.assertEqual(on_connect, {"type": "unread_count", "count": 1})
+        self.assertEqual(pushed['title'], "Two")
+        self.assertEqual(after_create, {"type": "unread_count", "count": 2})
+        self.assertEqual(after_read, {"type": "unread_count", "count": 1})
+
+class RetentionTest(TestCase):
+    def test_expired_rows_are_archived_per_type_and_counters_adjusted(self):
+        import gzip, json, os, tempfile
+        from django.test import override_settings
+        from notification_service.models import Notification, NotificationCounter
+        from notification_service.retention import archive_expired
+        from notification_service.utils import create_dashboard_notification
+
+        user = User.objects.create_user(username="ret", password="password123", email="ret@example.com",
+                                        employee_id="RET1", full_name="Retention User")
+        now = timezone.now()
+        for title, kind in [("old reminder", 'REMINDER'), ("old assignment", 'ASSIGNMENT'), ("new reminder", 'REMINDER')]:
+            create_dashboard_notification(user, title, "m", notification_type=kind)
+        Notification.objects.exclude(title="new reminder").update(created_at=now - timedelta(days=100))
+        for reminder_type, status in [('1_HOUR', 'sent'), ('ASSIGNMENT_CHART_1', 'sent'), ('DAILY_10AM', 'pending')]:
+            log = SMSLog.objects.create(user=user, phone="+9779800000000", message="m",
+                                        reminder_type=reminder_type, status=status)
+            SMSLog.objects.filter(id=log.id).update(created_at=now - timedelta(days=100))
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root,
+            NOTIFICATION_RETENTION_DAYS={'default': 180, 'REMINDER': 60},
+            SMSLOG_RETENTION_DAYS={'default': 365, '1_HOUR': 90, 'DAILY': 90},
+        ):
+            self.assertEqual(archive_expired(now), {'notifications': 1, 'sms_logs': 1})
+            month = f"{timezone.localtime(now - timedelta(days=100)):%Y/%m}"
+            directory = os.path.join(media_root, 'archives', 'notifications', *month.split('/'))
+            (archive,) = os.listdir(directory)
+            with gzip.open(os.path.join(directory, archive), 'rt') as f:
+                rows = [json.loads(line) for line in f]
+
+        self.assertEqual([row['title'] for row in rows], ["old reminder"])
+        self.assertEqual(
+            set(Notification.objects.values_list('title', flat=True)), {"old assignment", "new reminder"}
+        )
+        # Assignment SMS falls back to the default window; pending SMS is never archived.
+        self.assertEqual(set(SMSLog.objects.values_list('reminder_type', flat=True)), {'ASSIGNMENT_CHART_1', 'DAILY_10AM'})
+        self.assertEqual(NotificationCounter.objects.get(user=user).unread, 2)
+
+
+class SMSTemplateRendererTest(TestCase):
+    def test_compiled_template_matches_placeholders_and_memoizes_dates(self):
+        from notification_service.sms_templates import SMSTemplateRenderer, compile_template
+
+        office = WorkingOffice(name="Kathmandu")
+        schedule = Schedule(id=7, name="Night", start_time=time(21, 0), end_time=time(6, 0), office=office)
+        chart = DutyChart(name="Ops", office=office)
+        user = User(username="tpl", full_name="Template User")
+        template = "{{employee_name}}: {{shift_name}} ({{start_time}}-{{end_time}}) on {{date_bs}} {{unknown}} {{advance_days}}"
+        self.assertEqual(compile_template(template)[0], "")
+        self.assertIn("{{unknown}}", "".join(compile_template(template)[::2]))
+
+        renderer = SMSTemplateRenderer()
+        with patch('notification_service.sms_templates.nepali_datetime') as mock_nepali:
+            mock_nepali.date.from_datetime_date.return_value = "2081-06-01"
+            messages = [
+                renderer.render(template, Duty(date=timezone.localdate(), schedule=schedule, office=office,
+                                               duty_chart=chart), user, advance_days=1)
+                for _ in range(3)
+            ]
+        self.assertEqual(mock_nepali.date.from_datetime_date.call_count, 1)
+        self.assertEqual(messages[0], "Template User: Night (09:00 PM-06:00 AM) on 2081/06/01 {{unknown}} 1")
+        self.assertEqual(renderer.render("No fields", None, user), "No fields")
+
+
+class AssignmentCoalescingTest(TestCase):
+    @patch('notification_service.gateway.requests.Session.get')
+    def test_cell_by_cell_edits_send_one_combined_message(self, mock_get):
+        from django.test import override_settings
+        from notification_service.coalesce import flush_due_assignments
+        from notification_service.models import AssignmentEvent, Notification
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.text = "0"
+
+        office = WorkingOffice.objects.create(name="Coalesce Office")
+        user = User.objects.create_user(username="coalesce", password="password123", email="coalesce@example.com",
+                                        employee_id="COA1", phone_number="+9779800000001", full_name="Coalesce User",
+                                        is_activated=True, office=office)
+        schedule = Schedule.objects.create(name="Day", start_time=time(9, 0), end_time=time(17, 0),
+                                           shift_type="Shift", office=office)
+        chart = DutyChart.objects.create(office=office, effective_date=timezone.localdate(), status='approved',
+                                         name="Coalesced Chart")
+
+        with override_settings(ASSIGNMENT_COALESCE_SECONDS=60):
+            duties = []
+            for offset in range(3):
+                with self.captureOnCommitCallbacks(execute=True):
+                    duties.append(Duty.objects.create(user=user, office=office, schedule=schedule, duty_chart=chart,
+                                                      date=timezone.localdate() + timedelta(days=offset)))
+            with self.captureOnCommitCallbacks(execute=True):
+                duties[0].save()  # re-saving doesn't announce twice
+
+            self.assertEqual(AssignmentEvent.objects.filter(status='buffered').count(), 3)
+            self.assertEqual(len(set(AssignmentEvent.objects.values_list('due_at', flat=True))), 1)
+            self.assertEqual(flush_due_assignments(), 0)
+            self.assertFalse(SMSLog.objects.filter(reminder_type='ASSIGNMENT').exists())
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(flush_due_assignments(timezone.now() + timedelta(minutes=2)), 1)
+
+        (log,) = SMSLog.objects.filter(reminder_type='ASSIGNMENT')
+        self.assertEqual((log.reminder_type, log.duty_id, log.status), ('ASSIGNMENT', duties[0].id, 'sent'))
+        self.assertIn('for the period', log.message)
+        self.assertEqual(Notification.objects.filter(user=user, notification_type='ASSIGNMENT').count(), 1)
+
+
+class SMSGatewayClientTest(TestCase):
+    def _client(self, **kwargs):
+        from notification_service.gateway import SMSGatewayClient
+        options = dict(
+            base_url="http://gateway.test/send/", username="u", password="secret",
+            system_id="1", rate_per_second=1000, burst=1000, failure_threshold=2, reset_timeout=60
+        )
+        options.update(kwargs)
+        return SMSGatewayClient(**options)
+
+    def test_success_and_failure_codes(self):
+        client = self._client()
+        with patch.object(client.session, 'get') as mock_get:
+            mock_get.return_value.status_code = 200
+            mock_get.return_value.text = "0"
+            self.assertEqual(client.send("+9779800000000", "hi"), (True, "0"))
+            mock_get.return_value.text = "-33"
+            self.assertEqual(client.send("+9779800000000", "hi"), (False, "Gateway Error: -33"))
+        snapshot = client.metrics.snapshot()
+        self.assertEqual(snapshot['sent'], 1)
+        self.assertEqual(snapshot['failed'], 1)
+
+    def test_circuit_opens_after_repeated_errors(self):
+        client = self._client()
+        with patch.object(client.session, 'get', side_effect=ConnectionError("down")) as mock_get:
+            client.send("+9779800000000", "hi")
+            client.send("+9779800000000", "hi")
+            success, response = client.send("+9779800000000", "hi")
+        self.assertFalse(success)
+        self.assertIn("circuit open", response)
+        # The third call never reached the gateway.
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_rate_limiter_times_out_when_empty(self):
+        from notification_service.gateway import TokenBucket
+        bucket = TokenBucket(rate=1, capacity=1)
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertFalse(bucket.acquire(timeout=0))
+
+    def test_shared_state_is_seen_by_every_client(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        first = self._client(shared_state=True, rate_per_second=1, burst=1, acquire_timeout=0)
+        second = self._client(shared_state=True, rate_per_second=1, burst=1, acquire_timeout=0)
+        with patch.object(first.session, 'get', side_effect=ConnectionError("down")):
+            first.send("+9779800000000", "hi")
+        # The second client finds the bucket already drained by the first.
+        with patch.object(second.session, 'get') as mock_get:
+            self.assertIn("rate limit", second.send("+9779800000000", "hi")[1])
+        mock_get.assert_not_called()
+
+        cache.clear()
+        with patch.object(first.session, 'get', side_effect=ConnectionError("down")):
+            first.rate_limiter.capacity = second.rate_limiter.capacity = 10
+            first.send("+9779800000000", "hi")
+            second.send("+9779800000000", "hi")
+        self.assertEqual(first.circuit.state, 'open')
+        self.assertIn("circuit open", first.send("+9779800000000", "hi")[1])
+        snapshot = second.metrics.snapshot()
+        self.assertEqual((snapshot['error'], snapshot['rejected'], snapshot['throttled']), (2, 1, 0))
+        self.assertEqual(snapshot['latency_ms']['p50'], 25)
+
+    @patch('notification_service.utils.get_sms_gateway')
+    def test_send_sms_updates_log_once(self, mock_gateway):
+        from notification_service.utils import send_sms
+        mock_gateway.return_value.send.return_value = (True, "0")
+        log = SMSLog.objects.create(phone="+9779800000000", message="hi", status='pending')
+        with self.assertNumQueries(1):
+            self.assertEqual(send_sms("+9779800000000", "hi", log_id=log.id), (True, "0"))
+        log.refresh_from_db()
+        self.assertEqual(log.status, 'sent')
+
+
+class GatewaySimulatorTest(TestCase):
+    def test_simulated_backend_serves_sms_and_otp_without_network(self):
+        from django.test import override_settings
+        from notification_service.gateway import SMSGatewayClient, DELIVERY_SENT, DELIVERY_FAILED, DELIVERY_RETRY
+        from notification_service.simulator import SimulatedGatewayAdapter
+        import otp_service.utils as otp_utils
+
+        from django.core.cache import cache
+        cache.clear()
+        self.addCleanup(cache.clear)
+        simulator = {'latency_ms': 0, 'jitter_ms': 0, 'otp_code': '4321'}
+        with override_settings(SMS_GATEWAY_BACKEND='simulated', SMS_SIMULATOR=simulator, NTC_OTP_URL=None), \
+                patch('requests.adapters.HTTPAdapter.send', side_effect=AssertionError("network used")):
+            client = SMSGatewayClient.from_settings()
+            self.assertEqual(client.deliver("+9779800000000", "hi")[0], DELIVERY_SENT)
+
+            otp_utils._session = None
+            success, data, _ = otp_utils.send_otp_ntc("+9779800000000")
+            self.assertTrue(success)
+            self.assertTrue(otp_utils.validate_otp_ntc(data['seq_no'], '4321', "9800000000")[0])
+            self.assertFalse(otp_utils.validate_otp_ntc(data['seq_no'], '0000', "9800000000")[0])
+            otp_utils._session = None
+
+        client.session.mount('http://', SimulatedGatewayAdapter(latency_ms=0, jitter_ms=0, reject_rate=1.0))
+        self.assertEqual(client.deliver("+9779800000000", "hi")[0], DELIVERY_FAILED)
+        client.session.mount('http://', SimulatedGatewayAdapter(latency_ms=0, jitter_ms=0, rate_per_second=1))
+        outcomes = [client.deliver("+9779800000000", "hi")[0] for _ in range(2)]
+        self.assertEqual(outcomes, [DELIVERY_SENT, DELIVERY_RETRY])
+
+
+class BackgroundRunnerTest(TestCase):
+    def test_full_queue_falls_back_and_drain_runs_queued_work(self):
+        import threading
+        from notification_service.background import BackgroundRunner
+        runner = BackgroundRunner(workers=1, queue_size=1, submit_timeout=0)
+        release = threading.Event()
+        started = threading.Event()
+        ran, fallback = [], []
+
+        def blocking():
+            started.set()
+            release.wait(5)
+
+        def failing():
+            raise ValueError("boom")
+
+        runner.submit(blocking)
+        self.assertTrue(started.wait(5))
+        runner.submit(failing)  # fills the queue
+        runner.submit(lambda: ran.append('queued'), fallback=lambda: fallback.append('celery'))
+        runner.submit(lambda: ran.append('caller'))  # no fallback: runs inline
+        self.assertEqual(fallback, ['celery'])
+        self.assertEqual(ran, ['caller'])
+
+        release.set()
+        runner.drain(timeout=5)
+        snapshot = runner.snapshot()
+        self.assertEqual((snapshot['fallback'], snapshot['caller_ran']), (1, 1))
+        self.assertEqual(snapshot['tasks']['BackgroundRunnerTest.test_full_queue_falls_back_and_drain_runs_queued_work.<locals>.failing']['errors'], 1)
+        self.assertEqual(snapshot['queue_depth'], 0)
+
+        # After draining, work runs in the caller instead of being dropped.
+        runner.submit(lambda: ran.append('late'))
+        self.assertEqual(ran, ['caller', 'late'])
+
+    def test_sigterm_drain_is_installed_at_startup(self):
+        import signal
+        from notification_service import background
+        # Installed by NotificationServiceConfig.ready() on the main thread,
+        # before any worker thread creates the runner.
+        self.assertTrue(background._hooks_installed)
+        self.assertEqual(signal.getsignal(signal.SIGTERM).__qualname__, 'install_shutdown_hooks.<locals>.on_sigterm')
@@ -1,118 +1,135 @@
-import requests
-import os
+import asyncio
 import logging
-from django.conf import settings
 from django.db import transaction
+from rest_framework import serializers
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from .models import SMSLog, Notification
-from .serializers import NotificationSerializer
+from auditlogs.bulk import audited_bulk_create
+from .models import SMSLog, Notification, BroadcastNotice
+from .serializers import NotificationSerializer, BroadcastNoticeSerializer
+from .gateway import get_sms_gateway
+from .outbox import wake_sms_dispatcher
+from .presence import online_user_ids
+from .counters import increment_unread
 
 logger = logging.getLogger(__name__)
 
-def run_in_background(task):
+def run_in_background(task, fallback=None):
     """
-    Runs task in a daemon thread, closing the thread's DB connections when it
-    finishes so they don't linger until garbage collection and exhaust the
-    Postgres connection slots. Runs synchronously under tests (where closing
-    would wipe the in-memory test database).
+    Runs task on the process-wide bounded background runner (see
+    background.py). fallback, typically a Celery .delay(), is used instead
+    when the runner's queue is full. Runs synchronously under tests.
     """
-    import sys
-    import threading
-
-    if 'test' in sys.argv:
-        task()
-        return
-
-    def runner():
-        from django.db import connections
-        try:
-            task()
-        finally:
-            connections.close_all()
-
-    threading.Thread(target=runner, daemon=True).start()
+    from .background import submit
+    submit(task, fallback=fallback)
 
 def send_sms(phone, message, user=None, log_id=None):
     """
-    Sends SMS using the NTC SMS Gateway.
+    Sends SMS through the shared NTC SMS gateway client and records the
+    outcome on the SMSLog row (one write per send when log_id is given).
     Returns: (success: bool, response_text: str)
     """
-    # Gateway URL structure:
-    # http://10.26.204.149:8080/updatedsmssender-1.0-SNAPSHOT/updatedsmssender/?username=...&password=...&cellNo=...&message=...&encoding=E
-    
-    base_url = getattr(settings, "NTC_SMS_URL", "http://10.26.192.122:42399/updatedsmssender-1.0-SNAPSHOT/updatedsmssender/")
-    params = {
-        "username": getattr(settings, "NTC_SMS_USERNAME", "NtcSmsSender"),
-        "password": getattr(settings, "NTC_SMS_PASSWORD", ""),
-        "cellNo": phone,
-        "message": message,
-        "encoding": "E",
-        "systemId": getattr(settings, "NTC_SMS_SYSTEM_ID", "1")
-    }
-    
-    if log_id:
-        try:
-            log = SMSLog.objects.get(id=log_id)
-            log.status = 'sending'
-            log.save()
-        except SMSLog.DoesNotExist:
-            log = SMSLog.objects.create(
-                user=user,
-                phone=phone,
-                message=message,
-                reminder_type='GENERAL',
-                status='sending'
-            )
-    else:
-        log = SMSLog.objects.create(
+    if not log_id:
+        log_id = SMSLog.objects.create(
             user=user,
             phone=phone,
             message=message,
             reminder_type='GENERAL',
             status='sending'
-        )
-    
+        ).id
+
     try:
-        print(f"DEBUG: Sending SMS to {base_url} with params {params}")
-        response = requests.get(base_url, params=params, timeout=10)
-        print(f"DEBUG: SMS Gateway Response Status: {response.status_code}")
-        print(f"DEBUG: SMS Gateway Raw Response: {response.text}")
-        log.response_raw = response.text
-        # NTC Gateway returns '0' for success. Other codes (like -33) are failures.
-        if response.status_code == 200 and response.text.strip() == "0":
-            log.status = 'sent'
-            log.save()
-            return True, response.text
-        else:
-            log.status = 'failed'
-            log.save()
-            error_msg = f"Gateway Error: {response.text}" if response.status_code == 200 else f"HTTP {response.status_code}: {response.text}"
-            return False, error_msg
+        success, response_text = get_sms_gateway().send(phone, message)
+        status = 'sent' if success else 'failed'
     except Exception as e:
-        log.status = 'error'
-        log.response_raw = str(e)
-        log.save()
-        return False, str(e)
+        success, response_text, status = False, str(e), 'error'
+
+    updated = SMSLog.objects.filter(id=log_id).update(status=status, response_raw=response_text)
+    if not updated:
+        SMSLog.objects.create(
+            user=user,
+            phone=phone,
+            message=message,
+            reminder_type='GENERAL',
+            status=status,
+            response_raw=response_text
+        )
+    return success, response_text
+
+# Concurrent group_send calls per event-loop entry when broadcasting.
+BROADCAST_CONCURRENCY = 100
 
 def broadcast_notification(notification):
     """
     Pushes a notification to the user's real-time WebSocket channel.
     Never raises: delivery is best-effort, the DB row is the source of truth.
     """
+    broadcast_notifications([notification])
+
+def serialize_notifications(notifications):
+    """
+    Serializes notifications, running NotificationSerializer once per
+    distinct message template (title, message, type, link) and copying the
+    per-row fields onto that payload for the rest. Bulk fan-outs send the
+    same text to every user, so this is one serializer call per batch.
+    """
+    datetime_field = serializers.DateTimeField()
+    templates = {}
+    payloads = []
+    for notification in notifications:
+        key = (notification.title, notification.message, notification.notification_type, notification.link, notification.is_read)
+        template = templates.get(key)
+        if template is None:
+            template = templates[key] = dict(NotificationSerializer(notification).data)
+        payloads.append({
+            **template,
+            'id': notification.pk,
+            'user': notification.user_id,
+            'created_at': datetime_field.to_representation(notification.created_at),
+        })
+    return payloads
+
+def send_group_messages(messages):
+    """
+    Sends (group, message) pairs inside a single event-loop entry, running
+    the group_send calls concurrently in chunks. Raises on channel layer
+    errors; callers decide how best-effort they are.
+    """
+    channel_layer = get_channel_layer()
+    if not channel_layer or not messages:
+        return
+
+    async def send_all():
+        for i in range(0, len(messages), BROADCAST_CONCURRENCY):
+            await asyncio.gather(*(
+                channel_layer.group_send(group, message)
+                for group, message in messages[i:i + BROADCAST_CONCURRENCY]
+            ))
+
+    async_to_sync(send_all)()
+
+def broadcast_notifications(notifications):
+    """
+    Pushes many notifications over WebSocket inside a single event-loop
+    entry. Users without an open notification socket are skipped (see
+    presence.py), payloads are serialized once per template and the
+    group_send calls run concurrently. Best-effort like broadcast_notification.
+    """
+    if not notifications:
+        return
     try:
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            serializer = NotificationSerializer(notification)
-            async_to_sync(channel_layer.group_send)(
-                f"user_{notification.user_id}",
-                {
-                    "type": "notification_message",
-                    "message": serializer.data
-                }
-            )
+        if not get_channel_layer():
+            return
+        online = online_user_ids(n.user_id for n in notifications)
+        notifications = [n for n in notifications if n.user_id in online]
+        if not notifications:
+            return
+        send_group_messages([
+            (f"user_{notification.user_id}", {"type": "notification_message", "message": payload})
+            for notification, payload in zip(notifications, serialize_notifications(notifications))
+        ])
     except Exception as e:
-        logger.error(f"Failed to broadcast notification {notification.pk}: {e}")
+        logger.error(f"Failed to broadcast {len(notifications)} notifications: {e}")
 
 import re
 
@@ -141,6 +158,37 @@ def clean_notification_message(message):
     cleaned = re.sub(r'\s*\.\s*\.', '.', cleaned)
     return cleaned.strip()
 
+BROADCAST_GROUP = "broadcast"
+
+def create_broadcast_notice(title, message, notification_type='SYSTEM', link=None, created_by=None):
+    """
+    Posts a system-wide notice: one BroadcastNotice row and, after commit,
+    one message to the broadcast channel group that every
+    NotificationConsumer joins. O(1) writes regardless of user count.
+    """
+    notice = BroadcastNotice.objects.create(
+        title=title,
+        message=clean_notification_message(message),
+        notification_type=notification_type,
+        link=link,
+        created_by=created_by
+    )
+
+    def push():
+        try:
+            channel_layer = get_channel_layer()
+            if channel_layer:
+                async_to_sync(channel_layer.group_send)(
+                    BROADCAST_GROUP,
+                    {"type": "notification_message", "message": BroadcastNoticeSerializer(notice).data}
+                )
+        except Exception as e:
+            logger.error(f"Failed to push broadcast notice {notice.pk}: {e}")
+
+    transaction.on_commit(push)
+    return notice
+
+
 def create_dashboard_notification(user, title, message, notification_type='SYSTEM', link=None):
     """
     Creates an in-app dashboard notification for a single user.
@@ -158,6 +206,7 @@ def create_dashboard_notification(user, title, message, notification_type='SYSTE
         # Push over WebSocket only once the row is committed (runs
         # immediately under autocommit, e.g. in threads/Celery tasks).
         transaction.on_commit(lambda: broadcast_notification(notification))
+        increment_unread([notification.user_id])
         return notification
     except Exception as e:
         logger.error(f"Failed to create dashboard notification for {getattr(user, 'username', user)}: {e}")
@@ -181,107 +230,184 @@ def create_bulk_dashboard_notifications(users, title, message, notification_type
             )
             for user in users
         ]
-        created = Notification.objects.bulk_create(notifications, batch_size=500)
-        def broadcast_all():
-            for notification in created:
-                broadcast_notification(notification)
-        transaction.on_commit(broadcast_all)
+        created = audited_bulk_create(
+            Notification, notifications, batch_size=500, summary="NOTIFICATION: Created dashboard notifications"
+        )
+        transaction.on_commit(lambda: broadcast_notifications(created))
+        increment_unread([n.user_id for n in created])
         return created
     except Exception as e:
         logger.error(f"Failed to bulk-create dashboard notifications: {e}")
         return []
 
-def send_bulk_assignment_notification(users, chart, date_range_str=None):
+
+def create_personalized_dashboard_notifications(items, notification_type='SYSTEM', link=None):
+    """
+    Creates one dashboard notification per (user, title, message) item with a
+    single bulk_create and one coalesced broadcast after commit.
+    """
+    try:
+        notifications = [
+            Notification(
+                user=user,
+                title=title,
+                message=clean_notification_message(message),
+                notification_type=notification_type,
+                link=link
+            )
+            for user, title, message in items
+        ]
+        if not notifications:
+            return []
+        created = audited_bulk_create(
+            Notification, notifications, batch_size=500, summary="NOTIFICATION: Created dashboard notifications"
+        )
+        transaction.on_commit(lambda: broadcast_notifications(created))
+        increment_unread([n.user_id for n in created])
+        return created
+    except Exception as e:
+        logger.error(f"Failed to bulk-create personalized dashboard notifications: {e}")
+        return []
+
+def queue_chart_sms(messages, reminder_type):
+    """
+    Upserts one outbox SMSLog row per (user, message) pair for a chart-level
+    notification and wakes the SMS dispatcher once.
+
+    Chart-level rows have duty=None, which Postgres treats as distinct in the
+    (user, duty, reminder_type) unique constraint, so existing rows are loaded
+    in one query and rewritten with bulk_update instead of relying on
+    ON CONFLICT. Returns the number of rows queued.
+    """
+    messages = [(user, message) for user, message in messages if getattr(user, 'phone_number', None)]
+    if not messages:
+        return 0
+
+    existing = {}
+    for log in SMSLog.objects.filter(
+        user_id__in=[user.id for user, _ in messages], duty=None, reminder_type=reminder_type
+    ).order_by('id'):
+        existing.setdefault(log.user_id, log)
+
+    to_update, to_create = [], []
+    for user, message in messages:
+        log = existing.get(user.id)
+        if log is None:
+            to_create.append(SMSLog(
+                user=user,
+                duty=None,
+                reminder_type=reminder_type,
+                phone=user.phone_number,
+                message=message,
+                status='pending'
+            ))
+            continue
+        log.phone = user.phone_number
+        log.message = message
+        log.status = 'pending'
+        log.attempts = 0
+        log.next_attempt_at = None
+        log.claimed_at = None
+        to_update.append(log)
+
+    with transaction.atomic():
+        if to_update:
+            SMSLog.objects.bulk_update(
+                to_update, ['phone', 'message', 'status', 'attempts', 'next_attempt_at', 'claimed_at'], batch_size=500
+            )
+        if to_create:
+            SMSLog.objects.bulk_create(to_create, batch_size=500)
+
+    # The rows are the outbox; one dispatcher run sends the whole batch.
+    wake_sms_dispatcher()
+    return len(to_update) + len(to_create)
+
+
+def chart_assignment_message(full_name, chart_name, shift_str, office_name, period=None):
+    """The SMS announcing several assignments in one chart, optionally for a period."""
+    if period:
+        return f'Dear {full_name}, You have been assigned to duty chart "{chart_name}" for the "{shift_str}" at "{office_name}" for the period {period}. Please visit https://dutychart.ntc.net.np for details.'
+    return f'Dear {full_name}, You have been assigned to duty chart "{chart_name}" for the "{shift_str}" at "{office_name}". Please visit https://dutychart.ntc.net.np for details.'
+
+
+def send_bulk_assignment_notification(users, chart, date_range_str=None, date_ranges=None):
     """
-    Sends a single SMS to each user in the list regarding their assignments in the chart.
-    If date_range_str is provided, it's included in the message.
+    Queues a single SMS and dashboard notification to each user in the list
+    regarding their assignments in the chart.
+    If date_range_str is provided, it's included in the message; date_ranges
+    ({user_id: str}) gives each user their own period instead.
     """
-    from .models import SMSLog
-    
+    from duties.models import Duty
+
+    users = [u for u in users if u is not None]
     if not users or not chart:
         return
-    
+
     chart_name = chart.name or "Duty Chart"
     office_name = chart.office.name if chart.office else "Unknown Office"
-    
+
+    # Unique shift names per user in this chart, in one grouped query.
+    shifts_by_user = {}
+    for user_id, shift_name in (
+        Duty.objects.filter(duty_chart=chart, user_id__in=[u.id for u in users])
+        .values_list('user_id', 'schedule__name')
+        .order_by('user_id', 'schedule__name')
+        .distinct()
+    ):
+        shifts_by_user.setdefault(user_id, []).append(shift_name)
+
+    notifications, messages = [], []
     for user in users:
         full_name = getattr(user, 'full_name', user.username)
-
-        # Get unique shift names for this user in this chart
-        from duties.models import Duty
-        user_shifts = list(Duty.objects.filter(user=user, duty_chart=chart).values_list('schedule__name', flat=True).distinct())
+        user_shifts = [name for name in shifts_by_user.get(user.id, []) if name]
         shift_str = ", ".join(user_shifts) if user_shifts else "Duty"
+        period = (date_ranges or {}).get(user.id, date_range_str)
 
-        if date_range_str:
-            sms_message = f'Dear {full_name}, You have been assigned to duty chart "{chart_name}" for the "{shift_str}" at "{office_name}" for the period {date_range_str}. Please visit https://dutychart.ntc.net.np for details.'
-        else:
-            sms_message = f'Dear {full_name}, You have been assigned to duty chart "{chart_name}" for the "{shift_str}" at "{office_name}". Please visit https://dutychart.ntc.net.np for details.'
-
-        create_dashboard_notification(
-            user,
-            title="New Duty Chart Assignment",
-            message=sms_message,
-            notification_type='ASSIGNMENT',
-            link='/my-duties'
-        )
+        sms_message = chart_assignment_message(full_name, chart_name, shift_str, office_name, period)
 
-        if not getattr(user, 'phone_number', None):
+        notifications.append((user, "New Duty Chart Assignment", sms_message))
+        if getattr(user, 'phone_number', None):
+            messages.append((user, sms_message))
+        else:
             logger.warning(f"User {user.username} has no phone number for bulk SMS notification.")
-            continue
 
-        # Create log
-        # We include the chart ID in the reminder_type to satisfy the uniqueness constraint
-        # (user, duty, reminder_type) since duty is None for bulk notifications.
-        # Create or update log
-        # We include the chart ID in the reminder_type to satisfy the uniqueness constraint
-        # (user, duty, reminder_type) since duty is None for bulk notifications.
-        # We handle potential duplicates manually to avoid MultipleObjectsReturned
-        from django.db.models import Q
-        log = SMSLog.objects.filter(
-            user=user,
-            duty=None,
-            reminder_type=f'ASSIGNMENT_CHART_{chart.id}'
-        ).first()
-        
-        if log:
-            log.phone = user.phone_number
-            log.message = sms_message
-            log.status = 'pending'
-            log.save()
-        else:
-            log = SMSLog.objects.create(
-                user=user,
-                duty=None,
-                reminder_type=f'ASSIGNMENT_CHART_{chart.id}',
-                phone=user.phone_number,
-                message=sms_message,
-                status='pending'
-            )
-        
-        # Send in background
-        def trigger_sms_task(u, msg, lid):
-            try:
-                success, response = send_sms(u.phone_number, msg, user=u, log_id=lid)
-                if success:
-                    logger.info(f"Bulk Assignment SMS sent successfully to {u.username}")
-                else:
-                    logger.error(f"Bulk Assignment SMS failed for {u.username}: {response}")
-            except Exception as e:
-                logger.error(f"Fatal error in bulk SMS thread for {u.username}: {e}")
+    create_personalized_dashboard_notifications(notifications, notification_type='ASSIGNMENT', link='/my-duties')
+    # We include the chart ID in the reminder_type to satisfy the uniqueness constraint
+    # (user, duty, reminder_type) since duty is None for bulk notifications.
+    queue_chart_sms(messages, f'ASSIGNMENT_CHART_{chart.id}')
+
 
-        run_in_background(lambda u=user, msg=sms_message, lid=log.id: trigger_sms_task(u, msg, lid))
+def notify_chart_assignees(chart, user_ids, date_ranges=None):
+    """
+    Runs send_bulk_assignment_notification for the given users off the
+    request thread, so approving or filling a large chart returns without
+    waiting on the fan-out. Falls back to Celery when the runner is busy.
+    """
+    from django.contrib.auth import get_user_model
+    from .tasks import send_chart_assignment_notifications
+
+    user_ids = list(user_ids)
+    if not user_ids or not chart:
+        return
+
+    def fan_out():
+        users = list(get_user_model().objects.filter(id__in=user_ids))
+        send_bulk_assignment_notification(users, chart, date_ranges=date_ranges)
+
+    run_in_background(
+        fan_out,
+        fallback=lambda: send_chart_assignment_notifications.delay(chart.id, user_ids, date_ranges),
+    )
 
 
 def send_pool_addition_notification(users, chart):
     """
-    Sends an SMS to each user newly added to a duty chart's standby pool.
+    Queues an SMS to each user newly added to a duty chart's standby pool.
 
     Pool members are curated standby employees (not assigned to a specific
     duty), so the message and reminder_type differ from
     send_bulk_assignment_notification.
     """
-    from .models import SMSLog
-
     if not users or not chart:
         return
 
@@ -293,6 +419,7 @@ def send_pool_addition_notification(users, chart):
     chart_name = chart.name or "Duty Chart"
     office_name = chart.office.name if chart.office else "Unknown Office"
 
+    notifications, messages = [], []
     for user in users:
         full_name = getattr(user, 'full_name', user.username)
 
@@ -302,50 +429,13 @@ def send_pool_addition_notification(users, chart):
             f'Please visit https://dutychart.ntc.net.np for details.'
         )
 
-        create_dashboard_notification(
-            user,
-            title="Added to Standby Pool",
-            message=sms_message,
-            notification_type='ASSIGNMENT',
-            link='/my-duties'
-        )
-
-        if not getattr(user, 'phone_number', None):
-            logger.warning(f"User {user.username} has no phone number for pool SMS notification.")
-            continue
-
-        # reminder_type carries the chart ID so the (user, duty, reminder_type)
-        # uniqueness constraint holds with duty=None for pool notifications.
-        reminder_type = f'POOL_CHART_{chart.id}'
-        log = SMSLog.objects.filter(
-            user=user,
-            duty=None,
-            reminder_type=reminder_type
-        ).first()
-
-        if log:
-            log.phone = user.phone_number
-            log.message = sms_message
-            log.status = 'pending'
-            log.save()
+        notifications.append((user, "Added to Standby Pool", sms_message))
+        if getattr(user, 'phone_number', None):
+            messages.append((user, sms_message))
         else:
-            log = SMSLog.objects.create(
-                user=user,
-                duty=None,
-                reminder_type=reminder_type,
-                phone=user.phone_number,
-                message=sms_message,
-                status='pending'
-            )
+            logger.warning(f"User {user.username} has no phone number for pool SMS notification.")
 
-        def trigger_sms_task(u, msg, lid):
-            try:
-                success, response = send_sms(u.phone_number, msg, user=u, log_id=lid)
-                if success:
-                    logger.info(f"Pool addition SMS sent successfully to {u.username}")
-                else:
-                    logger.error(f"Pool addition SMS failed for {u.username}: {response}")
-            except Exception as e:
-                logger.error(f"Fatal error in pool SMS thread for {u.username}: {e}")
-
-        run_in_background(lambda u=user, msg=sms_message, lid=log.id: trigger_sms_task(u, msg, lid))
+    create_personalized_dashboard_notifications(notifications, notification_type='ASSIGNMENT', link='/my-duties')
+    # reminder_type carries the chart ID so the (user, duty, reminder_type)
+    # uniqueness constraint holds with duty=None for pool notifications.
+    queue_chart_sms(messages, f'POOL_CHART_{chart.id}')
@@ -1,15 +1,92 @@
-from django.db.models import Q
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, permissions, pagination
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from django_filters.rest_framework import DjangoFilterBackend
+from django_filters import rest_framework as django_filters
 from .models import Notification, SMSLog, OfficeNotificationSetting
-from .serializers import NotificationSerializer, SMSLogSerializer, OfficeNotificationSettingSerializer
+from .serializers import NotificationSerializer, NotificationFeedSerializer, SMSLogSerializer, OfficeNotificationSettingSerializer
+from auditlogs.bulk import audited_update, record_bulk_audit
+from auditlogs.export import export_response, requested_format
+from auditlogs.pagination import RankedKeysetPagination
+from auditlogs.search import ranked_search
+from auditlogs.views import day_start
+from . import counters, feed
 
 class StandardResultsSetPagination(pagination.PageNumberPagination):
     page_size = 15
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+class LogSearchPagination(RankedKeysetPagination):
+    page_size = 15
+    time_field = 'created_at'
+
+
+class NotificationFeedPagination(pagination.BasePagination):
+    """
+    Forward-only keyset pagination for the notification feed on
+    (created_at, is_broadcast, id). No COUNT(*) and no OFFSET: the opaque
+    cursor carries the position of the last row returned, so every page
+    costs the same however deep it is.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 15
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, is_broadcast, row_id = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError
+            return created_at, bool(is_broadcast), int(row_id)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, position):
+        created_at, is_broadcast, row_id = position
+        payload = json.dumps([created_at.isoformat(), int(is_broadcast), row_id])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def paginate_rows(self, fetch, request):
+        """fetch(after) returns the ordered queryset starting after the cursor."""
+        self.request = request
+        size = self.get_page_size(request)
+        rows = feed.feed_rows(fetch(self.decode_cursor(request))[:size + 1])
+        self.has_next = len(rows) > size
+        self.rows = rows[:size]
+        return self.rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(feed.feed_position(self.rows[-1])))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'previous': None, 'results': data})
+
+
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     queryset = Notification.objects.all()
@@ -25,22 +102,65 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         return Response({'detail': 'Method "POST" not allowed.'}, status=405)
 
+    def list(self, request, *args, **kwargs):
+        # Personal notifications merged with system-wide broadcast notices,
+        # keyset-paginated; ?unread=true limits the feed to unread items.
+        unread_only = request.query_params.get('unread') in ('1', 'true', 'True')
+        paginator = NotificationFeedPagination()
+        rows = paginator.paginate_rows(
+            lambda after: feed.notification_feed(request.user, after=after, unread_only=unread_only),
+            request
+        )
+        return paginator.get_paginated_response(NotificationFeedSerializer(rows, many=True).data)
+
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        with transaction.atomic():
+            # Conditional UPDATE: of two concurrent calls only one flips the
+            # row, so the unread counter is decremented exactly once.
+            updated = Notification.objects.filter(
+                pk=notification.pk, user=request.user, is_read=False
+            ).update(is_read=True)
+            if updated == 1:
+                counters.decrement_unread(request.user.id)
+                record_bulk_audit(
+                    Notification, 'UPDATE', [notification.pk],
+                    f"NOTIFICATION: Marked notification as read for {request.user.username}"
+                )
+        return Response({'status': 'notification marked as read'})
+
+    @action(detail=False, methods=['post'], url_path=r'broadcasts/(?P<notice_id>\d+)/mark_read')
+    def mark_broadcast_read(self, request, notice_id=None):
+        notice = feed.visible_broadcasts(request.user).filter(id=notice_id).first()
+        if notice is None:
+            return Response({'detail': 'Not found.'}, status=404)
+        feed.mark_broadcasts_read(request.user, [notice])
+        counters.push_unread_counts([request.user.id])
         return Response({'status': 'notification marked as read'})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        self.get_queryset().filter(is_read=False).update(is_read=True)
+        with transaction.atomic():
+            audited_update(
+                self.get_queryset().filter(is_read=False), {'is_read': True},
+                summary=f"NOTIFICATION: Marked all notifications as read for {request.user.username}"
+            )
+            feed.mark_broadcasts_read(request.user, feed.unread_broadcasts(request.user))
+            counters.reset_unread(request.user.id)
         return Response({'status': 'all notifications marked as read'})
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Personal notifications matching ?q=, best match first."""
+        queryset = ranked_search(self.get_queryset(), Notification.SEARCH_FIELDS, request.query_params.get('q', ''))
+        paginator = LogSearchPagination()
+        rows = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(NotificationSerializer(rows, many=True).data)
+
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'count': count})
+        return Response({'count': counters.unread_total(request.user)})
 
     @action(detail=False, methods=['post'])
     def broadcast_changelog(self, request):
@@ -55,20 +175,43 @@ class NotificationViewSet(viewsets.ModelViewSet):
         message = f"A new system update ({version}) has been deployed. Click here to view what's new."
         link = "/about?showChangelog=true"
         
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        active_users = User.objects.filter(is_active=True)
-        
-        from .utils import create_bulk_dashboard_notifications
-        create_bulk_dashboard_notifications(
-            users=active_users,
+        from .utils import create_broadcast_notice
+        create_broadcast_notice(
             title=title,
             message=message,
             notification_type='SYSTEM',
-            link=link
+            link=link,
+            created_by=request.user
         )
         return Response({'status': f'changelog notification broadcasted for version {version}'})
 
+class SMSLogFilter(django_filters.FilterSet):
+    # Range predicates on created_at, as in AuditLogFilter, so its index applies.
+    start_date = django_filters.DateFilter(method='filter_start_date')
+    end_date = django_filters.DateFilter(method='filter_end_date')
+
+    def filter_start_date(self, queryset, name, value):
+        return queryset.filter(created_at__gte=day_start(value))
+
+    def filter_end_date(self, queryset, name, value):
+        return queryset.filter(created_at__lt=day_start(value + timedelta(days=1)))
+
+    class Meta:
+        model = SMSLog
+        fields = ['status', 'reminder_type', 'phone', 'user', 'start_date', 'end_date']
+
+SMSLOG_EXPORT_COLUMNS = [
+    ('created_at', 'created_at'),
+    ('phone', 'phone'),
+    ('recipient_name', 'recipient_name'),
+    ('recipient_username', 'recipient_username'),
+    ('reminder_type', 'reminder_type'),
+    ('status', 'status'),
+    ('attempts', 'attempts'),
+    ('duty_id', 'duty_id'),
+    ('message', 'message'),
+]
+
 class SMSLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Super Admins to view all sent SMS logs.
@@ -77,19 +220,48 @@ class SMSLogViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = SMSLog.objects.all()
     permission_classes = [permissions.IsAdminUser]
     pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = SMSLogFilter
+
+    def search_text(self):
+        return self.request.query_params.get('search', '').strip() if self.request else ''
 
     def get_queryset(self):
         queryset = SMSLog.objects.all().select_related('user')
-        search = self.request.query_params.get('search', None)
+        search = self.search_text()
         if search:
-            queryset = queryset.filter(
-                Q(phone__icontains=search) |
-                Q(message__icontains=search) |
-                Q(user__full_name__icontains=search) |
-                Q(user__username__icontains=search)
-            )
+            # Full-text search over the denormalized recipient columns, no joins.
+            # Search results keep page-number pagination and a count (the
+            # SMS logs page pages by number), best match first.
+            queryset = ranked_search(queryset, SMSLog.SEARCH_FIELDS, search).order_by('-rank', '-created_at', '-id')
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Streams every SMS log matching the list filters as CSV or NDJSON (?export_format=)."""
+        export_format = requested_format(request)
+        queryset = self.filter_queryset(SMSLog.objects.all())
+        search = self.search_text()
+        if search:
+            queryset = ranked_search(queryset, SMSLog.SEARCH_FIELDS, search)
+        return export_response(queryset.order_by('-created_at', '-id'), SMSLOG_EXPORT_COLUMNS, export_format, 'sms-logs')
+
+    @action(detail=False, methods=['get'])
+    def gateway_metrics(self, request):
+        """Send counters, circuit state and latency percentiles of the SMS gateway, across all processes."""
+        from .gateway import get_sms_gateway
+        client = get_sms_gateway()
+        return Response({
+            'circuit': client.circuit.state,
+            **client.metrics.snapshot(),
+        })
+
+    @action(detail=False, methods=['get'])
+    def background_metrics(self, request):
+        """Queue depth, fallbacks and per-task timings of this process's background runner."""
+        from .background import get_background_runner
+        return Response(get_background_runner().snapshot())
+
 
 class IsSuperAdminOrNetworkAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -10,6 +10,7 @@ import pandas as pd
 import logging
 from django.conf import settings
 from django.utils.dateparse import parse_date
+from auditlogs.bulk import audited_update
 from users.permissions import SuperAdminOrReadOnly
 from authentication.permissions import HasMobileAPIToken
 from .models import Directorate, Department, Office, SystemSetting, AccountingOffice, CCOffice, WorkingOffice, Holiday
@@ -66,8 +67,10 @@ class DirectorateViewSet(viewsets.ModelViewSet):
     @transaction.atomic
     def perform_update(self, serializer):
         directorate_instance = serializer.save()
-        WorkingOffice.objects.filter(directorate=directorate_instance).update(
-            name=directorate_instance.directorate
+        audited_update(
+            WorkingOffice.objects.filter(directorate=directorate_instance),
+            {'name': directorate_instance.directorate},
+            summary=f"CONFIGURATION: Renamed working offices of directorate '{directorate_instance.directorate}'"
         )
 
 class DepartmentViewSet(viewsets.ModelViewSet):
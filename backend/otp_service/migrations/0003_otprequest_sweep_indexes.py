@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-19 05:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otp_service', '0002_alter_otprequest_purpose'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otprequest',
+            index=models.Index(fields=['status', 'expires_at'], name='otprequest_status_exp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otprequest',
+            index=models.Index(fields=['created_at'], name='otprequest_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-19 06:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otp_service', '0003_otprequest_sweep_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='otprequest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('validated', 'Validated'), ('expired', 'Expired'), ('consumed', 'Consumed'), ('failed', 'Failed to send')], default='pending', max_length=20),
+        ),
+    ]
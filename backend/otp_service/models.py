@@ -19,6 +19,7 @@ class OTPRequest(models.Model):
         ('validated', 'Validated'),
         ('expired', 'Expired'),
         ('consumed', 'Consumed'),
+        ('failed', 'Failed to send'),
     )
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -42,6 +43,13 @@ class OTPRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Used by the periodic sweeper (see retention.py).
+            models.Index(fields=['status', 'expires_at'], name='otprequest_status_exp_idx'),
+            models.Index(fields=['created_at'], name='otprequest_created_idx'),
+        ]
+
     def is_expired(self):
         return timezone.now() > self.expires_at
 
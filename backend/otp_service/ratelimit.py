@@ -0,0 +1,41 @@
+"""
+Token-bucket rate limiting for OTP requests.
+
+Each bucket (one per user, one per client IP) holds up to `capacity` tokens
+and regains one every `refill_seconds`; an OTP request takes one token from
+each bucket and is refused while either is empty. The buckets are shared by
+all workers (see notification_service/ratelimit.py), so concurrent requests
+can never overdraw them.
+
+The buckets are sized with OTP_RATE_LIMITS:
+
+    OTP_RATE_LIMITS = {'user': (3, 30), 'ip': (20, 10)}  # (capacity, refill_seconds)
+"""
+import logging
+
+from django.conf import settings
+
+from notification_service.ratelimit import take_token as take_shared_token
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMITS = {'user': (3, 30), 'ip': (20, 10)}
+
+
+def _limits(scope):
+    return getattr(settings, 'OTP_RATE_LIMITS', DEFAULT_LIMITS)[scope]
+
+
+def take_token(scope, identifier):
+    """
+    Takes a token from the `scope` bucket of `identifier`. Returns
+    (allowed, retry_after_seconds). Fails open, with a warning, if the cache
+    is unreachable.
+    """
+    capacity, refill_seconds = _limits(scope)
+    try:
+        allowed, wait = take_shared_token(f'otp-bucket:{scope}:{identifier}', capacity, int(refill_seconds * 1000))
+    except Exception as e:
+        logger.warning(f"OTP rate limiter unavailable, allowing request: {e}")
+        return True, 0
+    return allowed, -(-wait // 1000)
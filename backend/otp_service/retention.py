@@ -0,0 +1,51 @@
+"""
+Periodic cleanup of OTPRequest rows.
+
+sweep_otp_requests marks pending requests past expires_at as 'expired'
+(validated ones are left alone: signup completion accepts them after
+expires_at), then deletes requests created more than OTP_RETENTION_HOURS ago.
+Both steps work in batches of primary keys so a large backlog never holds
+long locks or one huge transaction.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import OTPRequest
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def _in_batches(queryset, apply, batch_size):
+    total = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += apply(OTPRequest.objects.filter(pk__in=ids))
+        if len(ids) < batch_size:
+            return total
+
+
+def sweep_otp_requests(now=None, batch_size=BATCH_SIZE):
+    """Returns (expired, deleted) row counts."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=getattr(settings, 'OTP_RETENTION_HOURS', 24))
+
+    expired = _in_batches(
+        OTPRequest.objects.filter(status='pending', expires_at__lt=now),
+        lambda batch: batch.update(status='expired', updated_at=now),
+        batch_size,
+    )
+    deleted = _in_batches(
+        OTPRequest.objects.filter(created_at__lt=cutoff),
+        lambda batch: batch.delete()[0],
+        batch_size,
+    )
+    if expired or deleted:
+        logger.info(f"OTP sweep: expired {expired}, deleted {deleted} requests")
+    return expired, deleted
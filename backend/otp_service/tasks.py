@@ -1,5 +1,7 @@
 from celery import shared_task
+from django.db import transaction
 import logging
+import sys
 from .utils import send_otp_ntc, send_otp_email
 from .models import OTPRequest
 from django.contrib.auth import get_user_model
@@ -7,11 +9,17 @@ from django.contrib.auth import get_user_model
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
-@shared_task(autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
-def send_otp_task(user_id, request_id, phone, channel, purpose="verification"):
+def _mark_failed(request_id):
+    """Lets the validate view tell the user to request a new OTP instead of waiting."""
+    OTPRequest.objects.filter(id=request_id, status='pending').update(status='failed')
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=3)
+def send_otp_task(self, user_id, request_id, phone, channel, purpose="verification"):
     """
     Asynchronous task to send OTP via SMS (NTC) or Email.
-    Updates the OTPRequest with the sequence number/transaction ID upon success.
+    Updates the OTPRequest with the sequence number/transaction ID upon success,
+    and marks it 'failed' when the OTP could not be sent.
     """
     try:
         otp_req = OTPRequest.objects.get(id=request_id)
@@ -19,6 +27,32 @@ def send_otp_task(user_id, request_id, phone, channel, purpose="verification"):
         logger.error(f"OTPRequest {request_id} not found.")
         return False
 
+    try:
+        sent = _send(otp_req, phone, channel, purpose)
+    except Exception:
+        # Retried by Celery; only the last attempt gives up on the request.
+        if self.request.retries >= self.max_retries:
+            _mark_failed(otp_req.id)
+        raise
+    if not sent:
+        _mark_failed(otp_req.id)
+    return sent
+
+
+def send_otp_in_process(user_id, request_id, phone, channel, purpose):
+    """
+    Runs send_otp_task without Celery. Nothing retries it here, so any error
+    marks the request failed.
+    """
+    try:
+        return send_otp_task(user_id, request_id, phone, channel, purpose)
+    except Exception as e:
+        logger.error(f"Failed to send OTP for request {request_id}: {e}")
+        _mark_failed(request_id)
+        return False
+
+
+def _send(otp_req, phone, channel, purpose):
     if channel == 'sms_ntc':
         success, data, error = send_otp_ntc(phone)
         if success:
@@ -38,7 +72,7 @@ def send_otp_task(user_id, request_id, phone, channel, purpose="verification"):
         # but views.py handles it for now.
         otp_code = otp_req.otp_code
         if not otp_code:
-             logger.error(f"OTP code missing for email request {request_id}")
+             logger.error(f"OTP code missing for email request {otp_req.id}")
              return False
              
         success, error = send_otp_email(otp_req.user.email, otp_code, purpose)
@@ -50,3 +84,34 @@ def send_otp_task(user_id, request_id, phone, channel, purpose="verification"):
             return False
 
     return False
+
+@shared_task
+def sweep_otp_requests():
+    """Expires overdue OTP requests and purges old ones (see retention.py)."""
+    from .retention import sweep_otp_requests as sweep
+    return sweep()
+
+def enqueue_otp(user_id, request_id, phone, channel, purpose):
+    """
+    Hands the send to a Celery worker once the OTPRequest row is committed,
+    so the request returns without waiting on the gateway. Falls back to the
+    in-process background runner if the broker is unreachable; runs
+    synchronously under tests.
+    """
+    args = (user_id, str(request_id), phone, channel, purpose)
+
+    def dispatch():
+        if 'test' in sys.argv:
+            send_otp_in_process(*args)
+        else:
+            _queue_otp(args)
+
+    transaction.on_commit(dispatch)
+
+def _queue_otp(args):
+    try:
+        send_otp_task.delay(*args)
+    except Exception as e:
+        logger.warning(f"Could not queue OTP request {args[1]}, sending in-process: {e}")
+        from notification_service.utils import run_in_background
+        run_in_background(lambda: send_otp_in_process(*args))
@@ -1,3 +1,95 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User
+from .models import OTPRequest
+from .retention import sweep_otp_requests
+
+
+@patch('otp_service.views.verify_recaptcha', return_value=(True, None))
+@override_settings(OTP_RATE_LIMITS={'user': (2, 60), 'ip': (3, 60)})
+class RequestOTPTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='otpuser', email='otp@example.com', employee_id='OTP-1', password='x',
+            phone_number='9800000001'
+        )
+        self.client = APIClient()
+
+    def request_otp(self, username='otpuser'):
+        return self.client.post('/api/v1/otp/request/', {'username': username, 'purpose': 'change_password'})
+
+    @patch('otp_service.tasks.send_otp_ntc', return_value=(True, {'seq_no': 'SEQ-1'}, None))
+    def test_otp_is_sent_after_commit_and_rate_limited(self, send, _recaptcha):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.request_otp()
+        self.assertEqual(response.status_code, 202)
+        send.assert_not_called()
+        for callback in callbacks:
+            callback()
+        self.assertEqual(OTPRequest.objects.get(id=response.data['request_id']).seq_no, 'SEQ-1')
+
+        self.assertEqual(self.request_otp().status_code, 202)
+        response = self.request_otp()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+        # The third request used the IP's last token; unknown accounts are throttled too.
+        self.assertEqual(self.request_otp('nobody').status_code, 429)
+
+    @patch('otp_service.tasks.send_otp_ntc', return_value=(False, {}, 'gateway down'))
+    def test_failed_send_tells_the_user_to_request_a_new_otp(self, send, _recaptcha):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.request_otp()
+        self.assertEqual(response.status_code, 202)
+        otp_req = OTPRequest.objects.get(id=response.data['request_id'])
+        self.assertEqual((otp_req.status, otp_req.seq_no), ('failed', None))
+
+        response = self.client.post('/api/v1/otp/validate/', {'request_id': str(otp_req.id), 'otp': '123456'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("request a new one", response.data['message'])
+
+    @patch('otp_service.tasks.send_otp_ntc', side_effect=ConnectionError("gateway down"))
+    @patch('otp_service.tasks.send_otp_task.delay', side_effect=ConnectionError("broker down"))
+    def test_in_process_fallback_marks_the_request_failed_on_error(self, delay, send, _recaptcha):
+        from .tasks import _queue_otp
+        otp_req = OTPRequest.objects.create(
+            user=self.user, phone=self.user.phone_number, channel='sms_ntc', purpose='change_password',
+            status='pending', expires_at=timezone.now() + timedelta(minutes=5)
+        )
+        _queue_otp((self.user.id, str(otp_req.id), otp_req.phone, 'sms_ntc', 'change_password'))
+        delay.assert_called_once()
+        otp_req.refresh_from_db()
+        self.assertEqual(otp_req.status, 'failed')
+
+
+class SweepOTPRequestsTest(TestCase):
+    def test_sweep_expires_pending_and_purges_old_requests(self):
+        user = User.objects.create_user(
+            username='sweep', email='sweep@example.com', employee_id='SWEEP-1', password='x'
+        )
+        now = timezone.now()
+
+        def make(status, expires_in, age_hours=0):
+            otp = OTPRequest.objects.create(
+                user=user, channel='sms_ntc', purpose='signup', status=status,
+                expires_at=now + timedelta(minutes=expires_in)
+            )
+            OTPRequest.objects.filter(pk=otp.pk).update(created_at=now - timedelta(hours=age_hours))
+            return otp.pk
+
+        overdue = make('pending', -1)
+        fresh = make('pending', 5)
+        validated = make('validated', -1)
+        old = make('consumed', -60, age_hours=48)
+
+        self.assertEqual(sweep_otp_requests(now, batch_size=1), (1, 1))
+        statuses = dict(OTPRequest.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {overdue: 'expired', fresh: 'pending', validated: 'validated'})
+        self.assertNotIn(old, statuses)
@@ -3,6 +3,28 @@ import json
 from django.conf import settings
 from django.core.mail import send_mail
 
+_session = None
+
+def _otp_session():
+    """
+    Shared keep-alive session for the OTP gateway; routed to the local
+    simulator when SMS_GATEWAY_BACKEND is 'simulated'.
+    """
+    global _session
+    if _session is None:
+        from notification_service.simulator import simulation_enabled, mount_simulator
+        session = requests.Session()
+        if simulation_enabled():
+            mount_simulator(session)
+        _session = session
+    return _session
+
+def _otp_base_url():
+    from notification_service.simulator import simulation_enabled, SIMULATED_OTP_URL
+    if simulation_enabled() and not settings.NTC_OTP_URL:
+        return SIMULATED_OTP_URL
+    return settings.NTC_OTP_URL.rstrip('/')
+
 def send_otp_email(email, otp_code, purpose="verification"):
     """
     Sends OTP via Email.
@@ -39,7 +61,7 @@ def send_otp_ntc(phone):
         else:
             phone = clean_phone
         
-    base_url = settings.NTC_OTP_URL.rstrip('/')
+    base_url = _otp_base_url()
     url = f"{base_url}/sendotp"
     payload = {
         "mobileNumber": phone,
@@ -49,7 +71,7 @@ def send_otp_ntc(phone):
     try:
         print(f"DEBUG: Sending OTP request to {url}")
         print(f"DEBUG: Payload: {json.dumps(payload)}")
-        response = requests.post(url, json=payload, timeout=10)
+        response = _otp_session().post(url, json=payload, timeout=10)
         print(f"DEBUG: OTP Gateway Response Status: {response.status_code}")
         print(f"DEBUG: OTP Gateway Raw Response: {response.text}")
         
@@ -81,7 +103,7 @@ def validate_otp_ntc(seq_no, otp, phone=None):
     """
     Validates OTP via the new OTP API using transactionId (passed as seq_no).
     """
-    base_url = settings.NTC_OTP_URL.rstrip('/')
+    base_url = _otp_base_url()
     url = f"{base_url}/verifyotp"
     
     if phone:
@@ -105,7 +127,7 @@ def validate_otp_ntc(seq_no, otp, phone=None):
                 return True, "Success (Mock)"
             return False, "Invalid Mock OTP"
 
-        response = requests.post(url, json=payload, timeout=10)
+        response = _otp_session().post(url, json=payload, timeout=10)
         print(f"DEBUG: OTP Validate Response Status: {response.status_code}")
         print(f"DEBUG: OTP Validate Raw Response: {response.text}")
         
@@ -14,7 +14,8 @@ from .serializers import (
     UserLookupSerializer, SignupCompleteSerializer
 )
 from .utils import send_otp_ntc, validate_otp_ntc
-from .tasks import send_otp_task
+from .ratelimit import take_token
+from .tasks import enqueue_otp
 from django.utils import timezone
 from datetime import timedelta
 import random
@@ -23,6 +24,7 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from authentication.recaptcha import verify_recaptcha
 from authentication.permissions import validate_mobile_session_token
+from auditlogs.middleware import get_client_ip
 
 
 def _is_mobile_request(request):
@@ -36,6 +38,14 @@ def _is_mobile_request(request):
     )
     return bool(session_token and validate_mobile_session_token(session_token, secret))
 
+def _too_many_requests(retry_after):
+    response = Response(
+        {"message": "Please wait before requesting another OTP."},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
 User = get_user_model()
 
 class UserLookupView(APIView):
@@ -123,6 +133,11 @@ class RequestOTPView(APIView):
         serializer = RequestOTPSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Per-IP bucket first, so probing many accounts from one client is throttled too.
+        allowed, retry_after = take_token('ip', get_client_ip(request))
+        if not allowed:
+            return _too_many_requests(retry_after)
             
         username = serializer.validated_data.get('username')
         email = serializer.validated_data.get('email')
@@ -169,11 +184,10 @@ class RequestOTPView(APIView):
             # though forgot_password above already gives specific ones as requested
             return Response({"message": "If an account exists, an OTP has been sent."}, status=status.HTTP_200_OK)
             
-        # 2. Rate Limiting Check (Basic) - FR-13 / 8.2
-        # Check active cooldown
-        last_request = OTPRequest.objects.filter(user=user, created_at__gte=timezone.now() - timedelta(seconds=30)).first()
-        if last_request:
-             return Response({"message": "Please wait before requesting another OTP."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        # 2. Rate Limiting - FR-13 / 8.2: token bucket per user (see ratelimit.py)
+        allowed, retry_after = take_token('user', user.id)
+        if not allowed:
+            return _too_many_requests(retry_after)
 
         # 3. Queue Task
         phone_number = user.phone_number
@@ -191,9 +205,10 @@ class RequestOTPView(APIView):
             status='pending'
         )
 
-        send_otp_task(user.id, str(otp_req.id), phone_number, channel, purpose)
+        # Sent by a worker after commit so the response never waits on the gateway.
+        enqueue_otp(user.id, otp_req.id, phone_number, channel, purpose)
         
-        response_data = {"message": "OTP sent successfully."}
+        response_data = {"message": "OTP is being sent."}
         
         # Returning request_id as a safe reference
         response_data['request_id'] = otp_req.id
@@ -204,7 +219,7 @@ class RequestOTPView(APIView):
              masked = "*" * (len(phone_number) - 3) + visible
              response_data['masked_phone'] = masked
 
-        return Response(response_data, status=status.HTTP_200_OK)
+        return Response(response_data, status=status.HTTP_202_ACCEPTED)
 
 class ValidateOTPView(APIView):
     permission_classes = []
@@ -239,6 +254,9 @@ class ValidateOTPView(APIView):
             otp_req.save()
             return Response({"message": "OTP has expired"}, status=status.HTTP_400_BAD_REQUEST)
 
+        if otp_req.status == 'failed':
+            return Response({"message": "We couldn't send your OTP. Please request a new one."}, status=status.HTTP_400_BAD_REQUEST)
+
         if otp_req.status != 'pending':
              return Response({"message": "OTP is invalid or already used"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -247,7 +265,8 @@ class ValidateOTPView(APIView):
             # Delegate to NTC
             # We use the stored seq_no
             if not otp_req.seq_no:
-                return Response({"message": "System error: Missing sequence number for NTC validation."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                # The OTP is sent in the background; the gateway reference arrives with it.
+                return Response({"message": "OTP is still being sent. Please try again in a moment."}, status=status.HTTP_409_CONFLICT)
                 
             success, msg = validate_otp_ntc(otp_req.seq_no, otp, phone=otp_req.phone)
             if success:
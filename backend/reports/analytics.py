@@ -0,0 +1,169 @@
+# reports/analytics.py
+"""
+Columnar duty analytics.
+
+Duties are loaded once into parallel NumPy arrays (user index, date ordinal,
+schedule start/end minutes) so shift hours, per-user totals, rolling-window
+workload and per-day head counts are computed with vectorised operations
+instead of per-row datetime arithmetic.
+"""
+import datetime
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _time_to_minutes(t):
+    if t is None:
+        return -1
+    return t.hour * 60 + t.minute
+
+
+class DutyArrays:
+    """
+    Parallel arrays describing a set of duties, one position per duty.
+
+    user_index points into user_ids (-1 for unassigned duties) and
+    start_minutes/end_minutes are -1 when the duty has no schedule.
+    """
+
+    def __init__(self, user_ids, user_index, date_ordinal, start_minutes, end_minutes):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.user_index = np.asarray(user_index, dtype=np.int64)
+        self.date_ordinal = np.asarray(date_ordinal, dtype=np.int64)
+        self.start_minutes = np.asarray(start_minutes, dtype=np.int64)
+        self.end_minutes = np.asarray(end_minutes, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.date_ordinal)
+
+    @property
+    def has_schedule(self):
+        return (self.start_minutes >= 0) & (self.end_minutes >= 0)
+
+    @property
+    def is_assigned(self):
+        return self.user_index >= 0
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds the arrays from (user_id, date, start_time, end_time) tuples,
+        e.g. the output of Duty.objects.values_list(...).
+        """
+        user_pos = {}
+        user_ids, user_index, date_ordinal, start_minutes, end_minutes = [], [], [], [], []
+        for user_id, date, start_time, end_time in rows:
+            if user_id is None:
+                user_index.append(-1)
+            else:
+                pos = user_pos.get(user_id)
+                if pos is None:
+                    pos = user_pos[user_id] = len(user_ids)
+                    user_ids.append(user_id)
+                user_index.append(pos)
+            date_ordinal.append(date.toordinal())
+            start_minutes.append(_time_to_minutes(start_time))
+            end_minutes.append(_time_to_minutes(end_time))
+        return cls(user_ids, user_index, date_ordinal, start_minutes, end_minutes)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Loads a Duty queryset column-wise without instantiating models."""
+        rows = queryset.values_list('user_id', 'date', 'schedule__start_time', 'schedule__end_time')
+        return cls.from_rows(rows.iterator(chunk_size=5000))
+
+    @classmethod
+    def from_duties(cls, duties):
+        """Builds the arrays from already-fetched Duty instances, preserving order."""
+        return cls.from_rows(
+            (
+                d.user_id,
+                d.date,
+                d.schedule.start_time if d.schedule else None,
+                d.schedule.end_time if d.schedule else None,
+            )
+            for d in duties
+        )
+
+
+def shift_hours(arrays):
+    """
+    Duration in hours of every duty. An end time at or before the start time
+    wraps past midnight, so a 22:00-06:00 shift is 8 hours and identical
+    start/end times count as a full day. Duties without a schedule are 0.
+    """
+    span = np.mod(arrays.end_minutes - arrays.start_minutes, MINUTES_PER_DAY)
+    span = np.where(span == 0, MINUTES_PER_DAY, span)
+    return np.where(arrays.has_schedule, span / 60.0, 0.0)
+
+
+def per_user_totals(arrays, hours=None):
+    """
+    Returns (duty_counts, hour_totals), both indexed like arrays.user_ids.
+    Unassigned duties are ignored.
+    """
+    if hours is None:
+        hours = shift_hours(arrays)
+    mask = arrays.is_assigned
+    n_users = len(arrays.user_ids)
+    counts = np.bincount(arrays.user_index[mask], minlength=n_users)
+    totals = np.bincount(arrays.user_index[mask], weights=hours[mask], minlength=n_users)
+    return counts, totals
+
+
+def daily_user_hours(arrays, hours=None):
+    """
+    Dense users x days matrix of hours worked, plus the ordinal of column 0.
+    """
+    if hours is None:
+        hours = shift_hours(arrays)
+    mask = arrays.is_assigned
+    n_users = len(arrays.user_ids)
+    if not mask.any():
+        return np.zeros((n_users, 0)), None
+    ordinals = arrays.date_ordinal[mask]
+    first_day = int(ordinals.min())
+    n_days = int(ordinals.max()) - first_day + 1
+    flat = arrays.user_index[mask] * n_days + (ordinals - first_day)
+    matrix = np.bincount(flat, weights=hours[mask], minlength=n_users * n_days)
+    return matrix.reshape(n_users, n_days), first_day
+
+
+def rolling_window_hours(arrays, window_days, hours=None):
+    """
+    Hours each user worked in the window_days days ending on each day.
+    Returns (matrix, first_day_ordinal) where matrix[u, d] covers days
+    d - window_days + 1 .. d.
+    """
+    if window_days < 1:
+        raise ValueError("window_days must be at least 1")
+    daily, first_day = daily_user_hours(arrays, hours)
+    n_days = daily.shape[1]
+    cumulative = np.zeros((daily.shape[0], n_days + 1))
+    np.cumsum(daily, axis=1, out=cumulative[:, 1:])
+    upper = np.arange(1, n_days + 1)
+    lower = np.maximum(upper - window_days, 0)
+    return cumulative[:, upper] - cumulative[:, lower], first_day
+
+
+def daily_head_counts(arrays):
+    """
+    Number of distinct users on duty per day.
+    Returns (date_ordinals, head_counts) for days that have any assigned duty.
+    """
+    mask = arrays.is_assigned
+    if not mask.any():
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    ordinals = arrays.date_ordinal[mask]
+    first_day = int(ordinals.min())
+    n_days = int(ordinals.max()) - first_day + 1
+    pairs = np.unique(arrays.user_index[mask] * n_days + (ordinals - first_day))
+    counts = np.bincount(pairs % n_days, minlength=n_days)
+    days = np.nonzero(counts)[0]
+    return days + first_day, counts[days]
+
+
+def ordinal_to_iso(ordinal):
+    return datetime.date.fromordinal(int(ordinal)).isoformat()
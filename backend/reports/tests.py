@@ -1,3 +1,58 @@
-from django.test import TestCase
+from datetime import date, time
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from reports.analytics import (
+    DutyArrays,
+    shift_hours,
+    per_user_totals,
+    rolling_window_hours,
+    daily_head_counts,
+    ordinal_to_iso,
+)
+
+
+class DutyAnalyticsTest(SimpleTestCase):
+    def setUp(self):
+        self.arrays = DutyArrays.from_rows([
+            (10, date(2026, 5, 1), time(9, 0), time(17, 0)),    # 8h
+            (10, date(2026, 5, 2), time(22, 0), time(6, 0)),    # 8h overnight
+            (20, date(2026, 5, 1), time(6, 0), time(14, 0)),    # 8h
+            (20, date(2026, 5, 1), time(14, 0), time(20, 0)),   # 6h, same day
+            (None, date(2026, 5, 3), time(9, 0), time(17, 0)),  # unassigned
+            (10, date(2026, 5, 4), None, None),                 # no schedule
+        ])
+
+    def test_shift_hours_wraps_overnight(self):
+        hours = shift_hours(self.arrays)
+        self.assertEqual(hours.tolist(), [8.0, 8.0, 8.0, 6.0, 8.0, 0.0])
+
+    def test_identical_start_and_end_is_a_full_day(self):
+        arrays = DutyArrays.from_rows([(1, date(2026, 5, 1), time(8, 0), time(8, 0))])
+        self.assertEqual(shift_hours(arrays).tolist(), [24.0])
+
+    def test_per_user_totals_skip_unassigned(self):
+        counts, totals = per_user_totals(self.arrays)
+        self.assertEqual(self.arrays.user_ids.tolist(), [10, 20])
+        self.assertEqual(counts.tolist(), [3, 2])
+        self.assertEqual(totals.tolist(), [16.0, 14.0])
+
+    def test_rolling_window_hours(self):
+        rolling, first_day = rolling_window_hours(self.arrays, 2)
+        self.assertEqual(ordinal_to_iso(first_day), "2026-05-01")
+        # Days 05-01 .. 05-04
+        self.assertEqual(rolling[0].tolist(), [8.0, 16.0, 8.0, 0.0])
+        self.assertEqual(rolling[1].tolist(), [14.0, 14.0, 0.0, 0.0])
+
+    def test_daily_head_counts_are_distinct_users(self):
+        days, counts = daily_head_counts(self.arrays)
+        self.assertEqual([ordinal_to_iso(d) for d in days], ["2026-05-01", "2026-05-02", "2026-05-04"])
+        self.assertEqual(counts.tolist(), [2, 1, 1])
+
+    def test_empty_input(self):
+        arrays = DutyArrays.from_rows([])
+        counts, totals = per_user_totals(arrays)
+        self.assertEqual(len(counts), 0)
+        rolling, first_day = rolling_window_hours(arrays, 7)
+        self.assertIsNone(first_day)
+        self.assertEqual(len(daily_head_counts(arrays)[0]), 0)
@@ -6,6 +6,7 @@ from .views import (
     DutyReportNewFileView,
     DutyOptionsView,
     SummaryReportView,
+    WorkloadReportView,
     OfficeAdoptionReportView,
 )
 
@@ -15,5 +16,6 @@ urlpatterns = [
     path("duties/file-new/", DutyReportNewFileView.as_view(), name="report-file-new"),
     path("duties/options/", DutyOptionsView.as_view(), name="report-duty-options"),
     path("summary/", SummaryReportView.as_view(), name="report-summary"),
+    path("workload/", WorkloadReportView.as_view(), name="report-workload"),
     path("duties/adoption/", OfficeAdoptionReportView.as_view(), name="report-adoption"),
 ]
\ No newline at end of file
@@ -20,6 +20,14 @@ from openpyxl.styles import Font, Alignment, Border, Side
 
 from duties.models import Duty, DutyChart
 from .permissions import IsAdminOrSelf
+from .analytics import (
+    DutyArrays,
+    shift_hours,
+    per_user_totals,
+    rolling_window_hours,
+    daily_head_counts,
+    ordinal_to_iso,
+)
 from users.permissions import user_has_permission_slug, get_allowed_office_ids
 import requests
 
@@ -126,6 +134,44 @@ def _parse_user_ids(request):
     return out
 
 
+# ---------------------------
+# Helper: Scope duties for summary/workload reports
+# ---------------------------
+def _filter_report_duties(request, qs):
+    """
+    Applies the date range, office permission scope and the optional
+    office/user/schedule filters shared by the summary and workload reports.
+    """
+    office_id = request.GET.get("office_id")
+    user_id = request.GET.get("user_id")
+    user_ids = request.GET.get("user_ids")
+    schedule_id = request.GET.get("schedule_id")
+
+    qs = qs.filter(date__range=[request.GET.get("date_from"), request.GET.get("date_to")])
+
+    # Permission check
+    can_see_any_office = request.user.is_staff or user_has_permission_slug(request.user, "duties.create_any_office_chart")
+    if not can_see_any_office:
+        allowed_offices = get_allowed_office_ids(request.user)
+        qs = qs.filter(office_id__in=allowed_offices)
+
+    if office_id and office_id != "all":
+        qs = qs.filter(office_id=office_id)
+
+    if user_id:
+        qs = qs.filter(user_id=user_id)
+
+    if user_ids:
+        uid_list = [int(u) for u in user_ids.split(",") if u.strip().isdigit()]
+        if uid_list:
+            qs = qs.filter(user_id__in=uid_list)
+
+    if schedule_id and schedule_id != "all":
+        qs = qs.filter(schedule_id=schedule_id)
+
+    return qs
+
+
 # ---------------------------
 # Duty options (dropdown)
 # ---------------------------
@@ -897,12 +943,8 @@ class SummaryReportView(APIView):
     permission_classes = [IsAdminOrSelf]
 
     def get(self, request):
-        office_id = request.GET.get("office_id")
         date_from = request.GET.get("date_from")
         date_to = request.GET.get("date_to")
-        user_id = request.GET.get("user_id")
-        user_ids = request.GET.get("user_ids")
-        schedule_id = request.GET.get("schedule_id")
 
         if not (date_from and date_to):
             return Response({"error": "Date range is required"}, status=400)
@@ -916,36 +958,20 @@ class SummaryReportView(APIView):
             "schedule", 
             "office", 
             "duty_chart"
-        ).filter(
-            date__range=[date_from, date_to]
         )
+        qs = _filter_report_duties(request, qs)
+        duties = list(qs)
 
-        # Permission check
-        can_see_any_office = request.user.is_staff or user_has_permission_slug(request.user, "duties.create_any_office_chart")
-        if not can_see_any_office:
-            allowed_offices = get_allowed_office_ids(request.user)
-            qs = qs.filter(office_id__in=allowed_offices)
-
-        if office_id and office_id != "all":
-            qs = qs.filter(office_id=office_id)
-        
-        if user_id:
-            qs = qs.filter(user_id=user_id)
-        
-        if user_ids:
-            try:
-                uid_list = [int(u) for u in user_ids.split(",") if u.strip().isdigit()]
-                if uid_list:
-                    qs = qs.filter(user_id__in=uid_list)
-            except:
-                pass
-
-        if schedule_id and schedule_id != "all":
-            qs = qs.filter(schedule_id=schedule_id)
+        # Shift hours are computed for all rows at once; the loop below only
+        # does the per-chart bookkeeping.
+        duty_arrays = DutyArrays.from_duties(duties)
+        hours = shift_hours(duty_arrays)
+        _, user_hour_totals = per_user_totals(duty_arrays, hours)
+        hours_by_user_id = dict(zip(duty_arrays.user_ids.tolist(), user_hour_totals.tolist()))
 
         # Aggregate data
         summary = {}
-        for d in qs:
+        for d, duty_hours in zip(duties, hours.tolist()):
             if not d.user: continue
             uid = d.user.id
             if uid not in summary:
@@ -955,7 +981,7 @@ class SummaryReportView(APIView):
                     "employee_id": d.user.employee_id,
                     "office_name": d.office.name if d.office else "-",
                     "total_duties": 0,
-                    "total_hours": 0.0,
+                    "total_hours": hours_by_user_id.get(uid, 0.0),
                     "chart_breakdown": {}, # { chart_name: { shift_name: count } }
                     "dates": []
                 }
@@ -978,16 +1004,10 @@ class SummaryReportView(APIView):
             
             summary[uid]["chart_breakdown"][chart_name]["total_duties"] += 1
             
-            # Calculate hours and count shift
+            # Add hours and count shift
             if d.schedule:
                 s = d.schedule
-                start = datetime.datetime.combine(datetime.date.today(), s.start_time)
-                end = datetime.datetime.combine(datetime.date.today(), s.end_time)
-                if end <= start:
-                    end += datetime.timedelta(days=1)
-                hours = (end - start).total_seconds() / 3600
-                summary[uid]["total_hours"] += hours
-                summary[uid]["chart_breakdown"][chart_name]["total_hours"] += hours
+                summary[uid]["chart_breakdown"][chart_name]["total_hours"] += duty_hours
                 
                 # Count by shift name under the chart
                 summary[uid]["chart_breakdown"][chart_name]["shifts"].setdefault(s.name, 0)
@@ -1006,6 +1026,65 @@ class SummaryReportView(APIView):
         return Response(result)
 
 
+class WorkloadReportView(APIView):
+    """
+    Per-user workload for a date range: total duties and hours plus the
+    busiest rolling window (default 7 days), and per-day head counts.
+    """
+    permission_classes = [IsAdminOrSelf]
+
+    def get(self, request):
+        date_from = request.GET.get("date_from")
+        date_to = request.GET.get("date_to")
+
+        if not (date_from and date_to):
+            return Response({"error": "Date range is required"}, status=400)
+
+        try:
+            window_days = int(request.GET.get("window_days", 7))
+        except (TypeError, ValueError):
+            return Response({"error": "window_days must be an integer"}, status=400)
+        if window_days < 1:
+            return Response({"error": "window_days must be at least 1"}, status=400)
+
+        qs = _filter_report_duties(request, Duty.objects.all())
+        duty_arrays = DutyArrays.from_queryset(qs)
+
+        hours = shift_hours(duty_arrays)
+        counts, totals = per_user_totals(duty_arrays, hours)
+        rolling, first_day = rolling_window_hours(duty_arrays, window_days, hours)
+        day_ordinals, head_counts = daily_head_counts(duty_arrays)
+
+        users_by_id = {
+            u["id"]: u
+            for u in User.objects.filter(id__in=duty_arrays.user_ids.tolist()).values("id", "full_name", "employee_id")
+        }
+
+        results = []
+        for idx, uid in enumerate(duty_arrays.user_ids.tolist()):
+            user = users_by_id.get(uid, {})
+            peak_day = int(rolling[idx].argmax()) if rolling.shape[1] else None
+            results.append({
+                "user_id": uid,
+                "full_name": user.get("full_name"),
+                "employee_id": user.get("employee_id"),
+                "total_duties": int(counts[idx]),
+                "total_hours": round(float(totals[idx]), 2),
+                "peak_window_hours": round(float(rolling[idx, peak_day]), 2) if peak_day is not None else 0.0,
+                "peak_window_end": ordinal_to_iso(first_day + peak_day) if peak_day is not None else None,
+            })
+        results.sort(key=lambda x: x["total_hours"], reverse=True)
+
+        return Response({
+            "window_days": window_days,
+            "users": results,
+            "daily_head_counts": [
+                {"date": ordinal_to_iso(day), "head_count": int(count)}
+                for day, count in zip(day_ordinals.tolist(), head_counts.tolist())
+            ],
+        })
+
+
 class OfficeAdoptionReportView(APIView):
     permission_classes = [IsAdminOrSelf]
 
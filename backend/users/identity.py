@@ -0,0 +1,125 @@
+"""
+Cached user identities for token authentication.
+
+CookieJWTAuthentication and the WebSocket JWTAuthMiddleware resolve the
+token's user id through cached_user instead of fetching the User row on
+every request. The cache holds the user's column values (never the password
+hash) for USER_IDENTITY_CACHE_SECONDS, stamped with the user's identity
+version. User.save and delete bump that version once the transaction
+commits, so a stale entry is never served after a change. Both keys are read
+in one cache round trip.
+
+MeView's response is cached the same way (me_snapshot). Its key also
+includes a global RBAC version, bumped whenever roles or permissions change,
+and a global org version, bumped whenever offices, positions or the org
+hierarchy change (the snapshot carries office and position names and the
+manageable offices).
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.fields.files import FieldFile
+
+RBAC_VERSION_KEY = 'rbac-version'
+ORG_VERSION_KEY = 'org-version'
+
+
+def _version_key(user_id):
+    return f'user-identity-version:{user_id}'
+
+
+def _identity_key(user_id):
+    return f'user-identity:{user_id}'
+
+
+def _ttl():
+    return getattr(settings, 'USER_IDENTITY_CACHE_SECONDS', 300)
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def _get_version(key, current=None):
+    """Returns the version stored under key, minting one if it was evicted."""
+    if current is None:
+        cache.add(key, _new_version(), None)
+        current = cache.get(key)
+    return current
+
+
+def identity_version(user_id):
+    return _get_version(_version_key(user_id))
+
+
+def rbac_version():
+    return _get_version(RBAC_VERSION_KEY)
+
+
+def org_version():
+    return _get_version(ORG_VERSION_KEY)
+
+
+def bump_identity_version(user_id):
+    """Invalidates the cached identity and /me snapshot of a user after commit."""
+    transaction.on_commit(lambda: cache.set(_version_key(user_id), _new_version(), None))
+
+
+def bump_rbac_version():
+    """Invalidates every /me snapshot after commit (roles or permissions changed)."""
+    transaction.on_commit(lambda: cache.set(RBAC_VERSION_KEY, _new_version(), None))
+
+
+def bump_org_version():
+    """Invalidates every /me snapshot after commit (offices, positions or hierarchy changed)."""
+    transaction.on_commit(lambda: cache.set(ORG_VERSION_KEY, _new_version(), None))
+
+
+def _identity_fields(model):
+    return [field for field in model._meta.concrete_fields if field.attname != 'password']
+
+
+def cached_user(user_id):
+    """
+    The User with this id, from the cache when its identity version is
+    current. Raises User.DoesNotExist like objects.get. The password column
+    is deferred and loaded on first access.
+    """
+    from .models import User
+
+    version_key, identity_key = _version_key(user_id), _identity_key(user_id)
+    cached = cache.get_many([version_key, identity_key])
+    version = _get_version(version_key, cached.get(version_key))
+    identity = cached.get(identity_key)
+    fields = _identity_fields(User)
+    names = [field.attname for field in fields]
+
+    if identity and identity['version'] == version:
+        return User.from_db('default', names, identity['values'])
+
+    user = User.objects.only(*names).get(pk=user_id)
+    values = []
+    for name in names:
+        value = getattr(user, name)
+        # The image column holds the file name, not the FieldFile.
+        values.append(value.name if isinstance(value, FieldFile) else value)
+    cache.set(identity_key, {'version': version, 'values': values}, _ttl())
+    return user
+
+
+def me_snapshot(user, build):
+    """
+    Cached result of build(user), the /me payload, keyed by the user's
+    identity version and the RBAC and org versions.
+    """
+    version_keys = [_version_key(user.pk), RBAC_VERSION_KEY, ORG_VERSION_KEY]
+    current = cache.get_many(version_keys)
+    versions = [_get_version(key, current.get(key)) for key in version_keys]
+    key = f"me-snapshot:{user.pk}:{':'.join(versions)}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build(user)
+        cache.set(key, snapshot, _ttl())
+    return snapshot
@@ -7,6 +7,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
 from auditlogs.mixins import AuditableMixin
+from .identity import bump_identity_version
 
 class UserResponsibility(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -80,6 +81,8 @@ class User(AuditableMixin, AbstractUser):
             except User.DoesNotExist:
                 pass
         super().save(*args, **kwargs)
+        # Cached identities and /me snapshots of this user are now stale.
+        bump_identity_version(self.pk)
 
     def clean(self):
         super().clean()
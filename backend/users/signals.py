@@ -1,7 +1,9 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import User
-from notification_service.utils import send_sms, create_dashboard_notification
+from .identity import bump_identity_version, bump_org_version, bump_rbac_version
+from .models import User, Permission, Position, Role, RolePermission, UserPermission
+from org.models import AccountingOffice, CCOffice, Directorate, WorkingOffice
+from notification_service.utils import create_dashboard_notification
 import logging
 
 logger = logging.getLogger(__name__)
@@ -57,8 +59,8 @@ def send_user_status_sms(sender, instance, created, **kwargs):
 
 def _trigger_status_sms(user, message):
     """
-    Helper to send SMS in a background thread to avoid blocking the request.
-    Also mirrors the message as an in-app dashboard notification.
+    Helper to queue an SMS in the outbox so the request never waits on the
+    gateway. Also mirrors the message as an in-app dashboard notification.
     """
     create_dashboard_notification(
         user,
@@ -71,16 +73,37 @@ def _trigger_status_sms(user, message):
         logger.warning(f"Cannot send status SMS to {user.username}: No phone number.")
         return
 
-    def trigger():
-        try:
-            # Use the existing send_sms utility which also handles SMSLog
-            success, response = send_sms(user.phone_number, message, user=user)
-            if success:
-                logger.info(f"Status SMS sent successfully to {user.username}")
-            else:
-                logger.error(f"Status SMS failed for {user.username}: {response}")
-        except Exception as e:
-            logger.error(f"Error in background status SMS for {user.username}: {e}")
+    from notification_service.outbox import enqueue_sms
+    enqueue_sms(user, user.phone_number, message)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_identity(sender, instance, **kwargs):
+    bump_identity_version(instance.pk)
+
+@receiver(m2m_changed, sender=User.secondary_offices.through)
+def invalidate_secondary_offices(sender, instance, action, pk_set, **kwargs):
+    """Secondary offices are part of the /me snapshot."""
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, User):
+        bump_identity_version(instance.pk)
+    else:
+        for user_id in pk_set or ():
+            bump_identity_version(user_id)
+
+def invalidate_rbac(sender, **kwargs):
+    """Any role or permission change can alter every user's /me permissions."""
+    bump_rbac_version()
+
+for _model in (Permission, Role, RolePermission, UserPermission):
+    post_save.connect(invalidate_rbac, sender=_model, dispatch_uid=f'invalidate_rbac_save_{_model.__name__}')
+    post_delete.connect(invalidate_rbac, sender=_model, dispatch_uid=f'invalidate_rbac_delete_{_model.__name__}')
+
+def invalidate_org(sender, **kwargs):
+    """Office and position names and the office hierarchy are part of every /me snapshot."""
+    bump_org_version()
 
-    from notification_service.utils import run_in_background
-    run_in_background(trigger)
+for _model in (WorkingOffice, Position, Directorate, AccountingOffice, CCOffice):
+    post_save.connect(invalidate_org, sender=_model, dispatch_uid=f'invalidate_org_save_{_model.__name__}')
+    post_delete.connect(invalidate_org, sender=_model, dispatch_uid=f'invalidate_org_delete_{_model.__name__}')
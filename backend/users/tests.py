@@ -1,3 +1,82 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIRequestFactory, APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from authentication.authentication import CookieJWTAuthentication
+from .models import Permission, User, UserPermission
+
+
+class CachedIdentityTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user(
+                username='ident', email='ident@example.com', employee_id='IDENT-1', password='x',
+                full_name='Ident User'
+            )
+        self.token = str(AccessToken.for_user(self.user))
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        return CookieJWTAuthentication().authenticate(request)[0]
+
+    def test_repeat_authentication_uses_the_cache_until_the_user_is_saved(self):
+        self.assertEqual(self.authenticate().full_name, 'Ident User')
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual((user.pk, user.employee_id, user.office_id), (self.user.pk, 'IDENT-1', None))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.full_name = 'Renamed'
+            self.user.save()
+        self.assertEqual(self.authenticate().full_name, 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_me_snapshot_is_cached_and_revalidated_by_etag(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = client.get('/api/v1/auth/me/')
+        etag = response['ETag']
+        self.assertEqual(response.data['full_name'], 'Ident User')
+
+        with self.assertNumQueries(0):
+            response = client.get('/api/v1/auth/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Permission changes invalidate the snapshot.
+        with self.captureOnCommitCallbacks(execute=True):
+            permission = Permission.objects.create(slug='duties.view_chart', name='View chart')
+            UserPermission.objects.create(user=self.user, permission=permission)
+        response = client.get('/api/v1/auth/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['permissions'], ['duties.view_chart'])
+
+    def test_me_snapshot_follows_office_and_position_changes(self):
+        from org.models import WorkingOffice
+        from .models import Position
+
+        with self.captureOnCommitCallbacks(execute=True):
+            office = WorkingOffice.objects.create(name='Old Office')
+            position = Position.objects.create(name='Engineer', level=5)
+            self.user.office, self.user.position = office, position
+            self.user.save()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = client.get('/api/v1/auth/me/')
+        self.assertEqual((response.data['office_name'], response.data['position_name']), ('Old Office', 'Engineer'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            office.name = 'New Office'
+            office.save()
+            position.name = 'Senior Engineer'
+            position.save()
+        response = client.get('/api/v1/auth/me/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['office_name'], response.data['position_name']), ('New Office', 'Senior Engineer'))
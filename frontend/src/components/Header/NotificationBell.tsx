@@ -13,9 +13,7 @@ import { Separator } from "@/components/ui/separator";
 import api from "@/services/api";
 import { cn } from "@/lib/utils";
 
-// Primary delivery where WebSockets aren't available (e.g. a reverse proxy
-// that doesn't forward /ws/): a fast unread-count poll. 6 req/min stays well
-// under the 100/min per-user API throttle.
+// Fallback refresh of the unread count while the notification socket is not open.
 const POLL_INTERVAL_MS = 10_000;
 
 const buildWebSocketUrl = (token: string) => {
@@ -34,8 +32,12 @@ interface AppNotification {
   link: string | null;
   is_read: boolean;
   created_at: string;
+  // System-wide notices are stored once and share an id space of their own.
+  is_broadcast?: boolean;
 }
 
+const notificationKey = (n: AppNotification) => `${n.is_broadcast ? "b" : "n"}-${n.id}`;
+
 const typeIcon = (type: AppNotification["notification_type"]) => {
   switch (type) {
     case "ASSIGNMENT":
@@ -68,6 +70,7 @@ export const NotificationBell = () => {
   const [unreadCount, setUnreadCount] = useState(0);
   const [notifications, setNotifications] = useState<AppNotification[]>([]);
   const [loading, setLoading] = useState(false);
+  const [socketOpen, setSocketOpen] = useState(false);
 
   const openRef = useRef(false);
 
@@ -98,18 +101,27 @@ export const NotificationBell = () => {
       .finally(() => setLoading(false));
   }, []);
 
+  // The server pushes the unread count over the notification socket (once on
+  // connect and whenever it changes). Whenever the socket is disabled or not
+  // connected, poll for it instead, and refresh when the tab regains focus.
   useEffect(() => {
+    if (socketOpen) return;
     fetchUnreadCount();
     const interval = setInterval(fetchUnreadCount, POLL_INTERVAL_MS);
-    return () => clearInterval(interval);
-  }, [fetchUnreadCount]);
+    const onFocus = () => fetchUnreadCount();
+    window.addEventListener("focus", onFocus);
+    return () => {
+      clearInterval(interval);
+      window.removeEventListener("focus", onFocus);
+    };
+  }, [fetchUnreadCount, socketOpen]);
 
   // Real-time push: subscribe to the user's notification channel and
   // reconnect with backoff if the connection drops.
   // Disabled in production builds until the reverse proxy forwards /ws/
   // (set VITE_ENABLE_WS=true and rebuild once nginx is configured) —
   // attempting it just fills the console with browser-logged failures.
-  // Polling above delivers notifications either way.
+  // The polling above keeps the count current either way.
   useEffect(() => {
     if (!import.meta.env.DEV && import.meta.env.VITE_ENABLE_WS !== "true") return;
 
@@ -133,14 +145,24 @@ export const NotificationBell = () => {
         retryDelay = 1_000;
         everConnected = true;
         failedAttempts = 0;
+        setSocketOpen(true);
       };
 
       ws.onmessage = (event) => {
         try {
-          const notification = JSON.parse(event.data) as AppNotification;
-          setUnreadCount((prev) => prev + 1);
+          const data = JSON.parse(event.data);
+          if (data.type === "unread_count") {
+            setUnreadCount(data.count ?? 0);
+            return;
+          }
+          const notification = data as AppNotification;
+          // Personal notifications are followed by a pushed count; broadcast
+          // notices go to everyone at once, so count those locally.
+          if (notification.is_broadcast) setUnreadCount((prev) => prev + 1);
           setNotifications((prev) =>
-            prev.some((n) => n.id === notification.id) ? prev : [notification, ...prev]
+            prev.some((n) => notificationKey(n) === notificationKey(notification))
+              ? prev
+              : [notification, ...prev]
           );
         } catch (err) {
           console.error("Failed to parse pushed notification", err);
@@ -149,8 +171,9 @@ export const NotificationBell = () => {
 
       ws.onclose = () => {
         if (unmounted) return;
+        setSocketOpen(false);
         // The server/proxy doesn't support WebSockets at all (never connected
-        // once): stop trying, polling carries delivery. Transient drops on a
+        // once): stop trying, polling carries the count. Transient drops on a
         // previously working connection keep reconnecting indefinitely.
         if (!everConnected) {
           failedAttempts += 1;
@@ -179,11 +202,16 @@ export const NotificationBell = () => {
 
   const handleNotificationClick = (notification: AppNotification) => {
     if (!notification.is_read) {
+      const url = notification.is_broadcast
+        ? `notifications/broadcasts/${notification.id}/mark_read/`
+        : `notifications/${notification.id}/mark_read/`;
       api
-        .post(`notifications/${notification.id}/mark_read/`)
+        .post(url)
         .catch((err) => console.error("Failed to mark notification as read", err));
       setNotifications((prev) =>
-        prev.map((n) => (n.id === notification.id ? { ...n, is_read: true } : n))
+        prev.map((n) =>
+          notificationKey(n) === notificationKey(notification) ? { ...n, is_read: true } : n
+        )
       );
       setUnreadCount((prev) => Math.max(0, prev - 1));
     }
@@ -250,7 +278,7 @@ export const NotificationBell = () => {
             <div className="divide-y">
               {notifications.map((notification) => (
                 <button
-                  key={notification.id}
+                  key={notificationKey(notification)}
                   type="button"
                   onClick={() => handleNotificationClick(notification)}
                   className={cn(
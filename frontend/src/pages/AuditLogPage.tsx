@@ -30,8 +30,13 @@ import { Badge } from "@/components/ui/badge";
 import { Search, Loader2, Eye, ShieldAlert } from "lucide-react";
 import { PageHeader } from "@/components/PageHeader";
 
+const PAGE_SIZE = 15;
+
 export default function AuditLogPage() {
-    const [page, setPage] = useState(1);
+    // Keyset pages: cursors[i] fetches page i + 1 (undefined for the first page).
+    const [cursors, setCursors] = useState<(string | undefined)[]>([undefined]);
+    const page = cursors.length;
+    const resetPages = () => setCursors([undefined]);
     const [search, setSearch] = useState("");
     const [actionFilter, setActionFilter] = useState<string>("ALL");
     const [startDate, setStartDate] = useState<string>("");
@@ -48,15 +53,17 @@ export default function AuditLogPage() {
     useEffect(() => {
         const handler = setTimeout(() => {
             setDebouncedSearch(search);
-            setPage(1); // Reset to page 1 on search
+            resetPages(); // Reset to page 1 on search
         }, 500);
         return () => clearTimeout(handler);
     }, [search]);
 
     const { data, isLoading, isError } = useQuery({
-        queryKey: ["auditLogs", page, debouncedSearch, actionFilter, startDate, endDate],
+        queryKey: ["auditLogs", cursors[cursors.length - 1], debouncedSearch, actionFilter, startDate, endDate],
         queryFn: () => getAuditLogs({
-            page,
+            cursor: cursors[cursors.length - 1],
+            page_size: PAGE_SIZE,
+            include_total: true,
             search: debouncedSearch,
             action: actionFilter === "ALL" ? undefined : actionFilter,
             start_date: startDate || undefined,
@@ -64,6 +71,42 @@ export default function AuditLogPage() {
         }),
     });
 
+    const nextCursor = data?.next ? new URL(data.next).searchParams.get("cursor") ?? undefined : undefined;
+    const rowCount = data?.results?.length || 0;
+    const firstRow = (page - 1) * PAGE_SIZE + 1;
+
+    const renderPagination = () => (
+        <div className="flex items-center justify-between px-2">
+            <p className="text-xs text-slate-500 font-medium">
+                {rowCount > 0 ? `Showing ${firstRow} to ${firstRow + rowCount - 1}` : "Showing 0"}
+                {data?.count != null ? ` of ${data.count.toLocaleString()}` : ""} entries
+            </p>
+            <div className="flex items-center gap-1">
+                <Button
+                    variant="outline"
+                    size="sm"
+                    className="h-8 px-3 text-xs font-medium border-slate-200 text-slate-600 hover:text-primary hover:border-primary/50 hover:bg-primary/5"
+                    onClick={() => setCursors((c) => (c.length > 1 ? c.slice(0, -1) : c))}
+                    disabled={page === 1 || isLoading}
+                >
+                    &laquo; Prev
+                </Button>
+                <span className="h-8 min-w-8 px-2 inline-flex items-center justify-center rounded-md text-xs font-medium bg-primary text-white">
+                    {page}
+                </span>
+                <Button
+                    variant="outline"
+                    size="sm"
+                    className="h-8 px-3 text-xs font-medium border-slate-200 text-slate-600 hover:text-primary hover:border-primary/50 hover:bg-primary/5"
+                    onClick={() => nextCursor && setCursors((c) => [...c, nextCursor])}
+                    disabled={!nextCursor || isLoading}
+                >
+                    Next &raquo;
+                </Button>
+            </div>
+        </div>
+    );
+
     const getActionColor = (action: string) => {
         switch (action) {
             case "CREATE": return "default";
@@ -105,7 +148,7 @@ export default function AuditLogPage() {
                                     type="date"
                                     className="w-[140px] bg-slate-50/50 border-slate-200 text-xs"
                                     value={startDate}
-                                    onChange={(e) => { setStartDate(e.target.value); setPage(1); }}
+                                    onChange={(e) => { setStartDate(e.target.value); resetPages(); }}
                                     max={endDate || undefined}
                                 />
                                 <span className="text-slate-400">-</span>
@@ -113,12 +156,12 @@ export default function AuditLogPage() {
                                     type="date"
                                     className="w-[140px] bg-slate-50/50 border-slate-200 text-xs"
                                     value={endDate}
-                                    onChange={(e) => { setEndDate(e.target.value); setPage(1); }}
+                                    onChange={(e) => { setEndDate(e.target.value); resetPages(); }}
                                     min={startDate || undefined}
                                 />
                             </div>
 
-                            <Select value={actionFilter} onValueChange={(val) => { setActionFilter(val); setPage(1); }}>
+                            <Select value={actionFilter} onValueChange={(val) => { setActionFilter(val); resetPages(); }}>
                                 <SelectTrigger className="w-full md:w-[150px] bg-slate-50/50 border-slate-200 text-xs">
                                     <SelectValue placeholder="Action Type" />
                                 </SelectTrigger>
@@ -152,64 +195,7 @@ export default function AuditLogPage() {
                     <>
                         {/* Pagination Controls (Top) */}
                         <div className="space-y-1">
-                            <div className="flex items-center justify-between px-2">
-                                <p className="text-xs text-slate-500 font-medium">
-                                    Showing {((data?.results?.length || 0) > 0) ? (page - 1) * 15 + 1 : 0} to {Math.min(page * 15, data?.count || 0)} of {data?.count || 0} entries
-                                </p>
-                                <div className="flex items-center gap-1">
-                                    <Button
-                                        variant="outline"
-                                        size="sm"
-                                        className="h-8 px-3 text-xs font-medium border-slate-200 text-slate-600 hover:text-primary hover:border-primary/50 hover:bg-primary/5"
-                                        onClick={() => setPage((p) => Math.max(1, p - 1))}
-                                        disabled={page === 1 || isLoading}
-                                    >
-                                        &laquo; Prev
-                                    </Button>
-
-                                    {/* Page Numbers */}
-                                    {(() => {
-                                        const totalPages = Math.ceil((data?.count || 0) / 15) || 1;
-                                        const pages = [];
-                                        const maxVisible = 5;
-                                        let start = Math.max(1, page - Math.floor(maxVisible / 2));
-                                        let end = Math.min(totalPages, start + maxVisible - 1);
-
-                                        if (end - start + 1 < maxVisible) {
-                                            start = Math.max(1, end - maxVisible + 1);
-                                        }
-
-                                        for (let i = start; i <= end; i++) {
-                                            pages.push(
-                                                <Button
-                                                    key={i}
-                                                    variant={page === i ? "default" : "outline"}
-                                                    size="sm"
-                                                    className={`h-8 w-8 p-0 text-xs font-medium border-slate-200 ${page === i
-                                                        ? "bg-primary text-white hover:bg-primary/90 border-primary"
-                                                        : "text-slate-600 hover:text-primary hover:border-primary/50 hover:bg-primary/5"
-                                                        }`}
-                                                    onClick={() => setPage(i)}
-                                                    disabled={isLoading}
-                                                >
-                                                    {i}
-                                                </Button>
-                                            );
-                                        }
-                                        return pages;
-                                    })()}
-
-                                    <Button
-                                        variant="outline"
-                                        size="sm"
-                                        className="h-8 px-3 text-xs font-medium border-slate-200 text-slate-600 hover:text-primary hover:border-primary/50 hover:bg-primary/5"
-                                        onClick={() => setPage((p) => Math.min(Math.ceil((data?.count || 0) / 15) || 1, p + 1))}
-                                        disabled={page === (Math.ceil((data?.count || 0) / 15) || 1) || isLoading}
-                                    >
-                                        Next &raquo;
-                                    </Button>
-                                </div>
-                            </div>
+                            {renderPagination()}
 
                             <div className="rounded-xl border border-slate-200 bg-white shadow-sm overflow-hidden">
                                 <Table>
@@ -274,64 +260,7 @@ export default function AuditLogPage() {
                             </div>
 
                             {/* Pagination Controls (Bottom) */}
-                            <div className="flex items-center justify-between px-2">
-                                <p className="text-xs text-slate-500 font-medium">
-                                    Showing {((data?.results?.length || 0) > 0) ? (page - 1) * 15 + 1 : 0} to {Math.min(page * 15, data?.count || 0)} of {data?.count || 0} entries
-                                </p>
-                                <div className="flex items-center gap-1">
-                                    <Button
-                                        variant="outline"
-                                        size="sm"
-                                        className="h-8 px-3 text-xs font-medium border-slate-200 text-slate-600 hover:text-primary hover:border-primary/50 hover:bg-primary/5"
-                                        onClick={() => setPage((p) => Math.max(1, p - 1))}
-                                        disabled={page === 1 || isLoading}
-                                    >
-                                        &laquo; Prev
-                                    </Button>
-
-                                    {/* Page Numbers */}
-                                    {(() => {
-                                        const totalPages = Math.ceil((data?.count || 0) / 15) || 1;
-                                        const pages = [];
-                                        const maxVisible = 5;
-                                        let start = Math.max(1, page - Math.floor(maxVisible / 2));
-                                        let end = Math.min(totalPages, start + maxVisible - 1);
-
-                                        if (end - start + 1 < maxVisible) {
-                                            start = Math.max(1, end - maxVisible + 1);
-                                        }
-
-                                        for (let i = start; i <= end; i++) {
-                                            pages.push(
-                                                <Button
-                                                    key={i}
-                                                    variant={page === i ? "default" : "outline"}
-                                                    size="sm"
-                                                    className={`h-8 w-8 p-0 text-xs font-medium border-slate-200 ${page === i
-                                                        ? "bg-primary text-white hover:bg-primary/90 border-primary"
-                                                        : "text-slate-600 hover:text-primary hover:border-primary/50 hover:bg-primary/5"
-                                                        }`}
-                                                    onClick={() => setPage(i)}
-                                                    disabled={isLoading}
-                                                >
-                                                    {i}
-                                                </Button>
-                                            );
-                                        }
-                                        return pages;
-                                    })()}
-
-                                    <Button
-                                        variant="outline"
-                                        size="sm"
-                                        className="h-8 px-3 text-xs font-medium border-slate-200 text-slate-600 hover:text-primary hover:border-primary/50 hover:bg-primary/5"
-                                        onClick={() => setPage((p) => Math.min(Math.ceil((data?.count || 0) / 15) || 1, p + 1))}
-                                        disabled={page === (Math.ceil((data?.count || 0) / 15) || 1) || isLoading}
-                                    >
-                                        Next &raquo;
-                                    </Button>
-                                </div>
-                            </div>
+                            {renderPagination()}
                         </div>
                     </>
                 )}
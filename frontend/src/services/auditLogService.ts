@@ -17,13 +17,16 @@ export interface AuditLogItem {
 
 export interface AuditLogResponse {
     results: AuditLogItem[];
-    count: number;
+    // Approximate; only sent with include_total and never for searches.
+    count?: number;
     next: string | null;
     previous: string | null;
 }
 
 export const getAuditLogs = async (params: {
-    page?: number;
+    cursor?: string;
+    page_size?: number;
+    include_total?: boolean;
     search?: string;
     action?: string;
     entity_type?: string;